@@ -7,6 +7,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 from core.event_bus import bus, Event
+from core.tracing import tracer
 
 router = APIRouter(prefix="/api")
 
@@ -29,7 +30,7 @@ def _get_bot():
 
 @router.post("/chat/send")
 async def chat_send(body: ChatSendRequest):
-    # 取最后一条 user 消息作为输入
+    # 取最后一条 user 消息作为输入（多轮上下文由 LLM pipeline 的对话记忆维护）
     user_messages = [m for m in body.messages if m.role == "user"]
     if not user_messages:
         raise HTTPException(status_code=400, detail="messages must contain at least one user message")
@@ -37,12 +38,13 @@ async def chat_send(body: ChatSendRequest):
     if not text:
         raise HTTPException(status_code=400, detail="user message content must not be empty")
     bot = _get_bot()
+    trace = tracer.start("chat")
     bus.emit(Event.INTERRUPT)
-    # 等待 INTERRUPT handler 执行完毕（取消旧 task），再创建新 task，
-    # 避免新 task 被 interrupt handler 误取消
+    # INTERRUPT 处理函数在 emit 中同步执行，旧 task 此时已被取消；
+    # 让出一次事件循环，使旧 task 先处理取消、发出 LLM_DONE，再启动新 task
     await asyncio.sleep(0)
     bot._current_chat_task = asyncio.create_task(
-        bot.llm.generate(text, user_emotion="neutral")
+        bot.llm.generate(text, user_emotion="neutral", trace=trace)
     )
     return {"status": "ok"}
 
@@ -79,10 +81,11 @@ async def chat_stream(body: ChatSendRequest):
     bus.on(Event.LLM_DONE, on_done)
 
     # 打断当前生成，启动新 task（与 /chat/send 一致）
+    trace = tracer.start("chat")
     bus.emit(Event.INTERRUPT)
     await asyncio.sleep(0)
     bot._current_chat_task = asyncio.create_task(
-        bot.llm.generate(text, user_emotion="neutral")
+        bot.llm.generate(text, user_emotion="neutral", trace=trace)
     )
 
     async def stream_generator():
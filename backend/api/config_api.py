@@ -46,12 +46,37 @@ async def status():
     return {"status": "running"}
 
 
+@router.get("/llm/status")
+async def llm_status():
+    """返回 OpenClaw Gateway 健康状态、首 token 延迟统计，以及回复缓存的命中率与节省的延迟。"""
+    bot = _get_bot()
+    llm = getattr(bot, 'llm', None) if bot else None
+    return llm.stats() if llm and hasattr(llm, 'stats') else {"healthy": None}
+
+
+@router.get("/events/stats")
+async def event_bus_stats():
+    """返回事件总线各事件的发布次数，以及每个处理函数的队列深度、丢弃数与耗时。"""
+    from core.event_bus import bus
+    return bus.stats()
+
+
+@router.get("/metrics/latency")
+async def latency_metrics():
+    """返回每轮对话各阶段的延迟分位数（p50 / p95 / p99）：相对本轮开始，以及相对上一阶段。"""
+    from core.tracing import tracer
+    return tracer.stats()
+
+
 @router.get("/asr/status")
 async def asr_status():
-    """返回麦克风/VAD 是否正在采集。"""
+    """返回麦克风/VAD 是否正在采集、采集缓冲的溢出 / 停顿计数，以及噪声底与门限过滤率。"""
     bot = _get_bot()
     running = bot.is_mic_running if bot else False
-    return {"running": running}
+    mic = getattr(bot, 'mic', None) if bot else None
+    capture = mic.stats() if mic else None
+    vad = mic.vad.stats() if mic and hasattr(mic, 'vad') else None
+    return {"running": running, "capture": capture, "vad": vad}
 
 
 @router.post("/asr/start")
@@ -93,6 +118,16 @@ async def preview_tts(body: Optional[TTSConfig] = None):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/tts/cache")
+async def tts_cache_stats():
+    """返回 TTS 音频缓存的命中、未命中、淘汰统计；未启用时 enabled=false。"""
+    from pipeline.tts.audio_cache import get_tts_cache
+    cache = get_tts_cache(get_config().tts)
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
 # System Configuration Endpoints
 
 from pydantic import BaseModel, field_validator
@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus 文本格式的指标（见 core.metrics）。"""
+    import main as app_module
+    from core.metrics import render
+    return PlainTextResponse(
+        render(getattr(app_module, "bot", None)),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -1,15 +1,32 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import time
+from collections import deque
+
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from loguru import logger
 
+from config import get_config
 from core.event_bus import bus, Event
+from core.tracing import LatencyHistogram
 
 router = APIRouter()
 
-# 连接池
-_connections: set[WebSocket] = set()
+# 每个客户端的待发送队列上限
+_QUEUE_SIZE = 256
+# 单条消息发送超过此时长，或队列持续满超过此时长，视为卡死并断开该客户端
+_STUCK_S = 5.0
+# 同类消息只保留最新一条（排队期间被新消息替代）
+_COALESCE_TYPES = frozenset({"lip_sync", "asr_partial"})
+# 队列满时可以丢弃的消息：口型、增量识别很快会被后续消息覆盖，日志只供展示；
+# 其余（字幕、LLM 文本与句子、结束事件等）丢了前端状态就不完整，宁可断开让客户端重连
+_LOSSY_TYPES = frozenset({"lip_sync", "asr_partial", "log_entry"})
+
+# 单条消息的发送耗时
+send_ms = LatencyHistogram()
+_counters = {"dropped": 0, "coalesced": 0, "kicked": 0, "llm_deltas": 0, "llm_chunk_messages": 0}
 
 # 情感标签 → Live2D expression name 映射（需与模型 .exp3.json 的 Name 字段一致）
 _EMOTION_EXPRESSION_MAP: dict[str, str] = {
@@ -21,72 +38,212 @@ _EMOTION_EXPRESSION_MAP: dict[str, str] = {
 }
 
 
-async def broadcast(message: dict):
-    """向所有已连接的前端广播消息。"""
+class _Client:
+    """单个前端连接：有界待发送队列 + 专属写协程，慢客户端只拖慢自己。"""
+
+    def __init__(self, ws: WebSocket):
+        self.ws = ws
+        self.queue: deque[tuple[str, str]] = deque()  # (消息类型, 已序列化的 JSON)
+        self._wake = asyncio.Event()
+        self._full_since: float | None = None
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def push(self, kind: str, data: str) -> None:
+        """消息入队。队列满时先丢最早的一条可丢弃消息，没有可丢的：新消息也可丢弃则丢掉它，
+        否则断开该客户端（控制类消息不静默丢失）。"""
+        queue = self.queue
+        if kind in _COALESCE_TYPES:
+            for i, (queued, _) in enumerate(queue):
+                if queued == kind:
+                    del queue[i]  # 旧的一条尚未发出，直接由新消息替代（排到队尾，保持与其他消息的先后）
+                    _counters["coalesced"] += 1
+                    break
+        if len(queue) >= _QUEUE_SIZE:
+            now = time.monotonic()
+            if self._full_since is None:
+                self._full_since = now
+            elif now - self._full_since > _STUCK_S:
+                self.kick(f"发送队列持续满 {_STUCK_S:.0f}s")
+                return
+            victim = next((i for i, (queued, _) in enumerate(queue) if queued in _LOSSY_TYPES), None)
+            if victim is None and kind not in _LOSSY_TYPES:
+                self.kick("发送队列已满且没有可丢弃的消息")
+                return
+            _counters["dropped"] += 1
+            if victim is None:
+                return
+            del queue[victim]
+        else:
+            self._full_since = None
+        queue.append((kind, data))
+        self._wake.set()
+
+    def kick(self, reason: str) -> None:
+        """断开卡死或积压过多的客户端：停止写协程并关闭连接，接收循环随之退出。"""
+        if _connections.pop(self.ws, None) is None:
+            return
+        _counters["kicked"] += 1
+        logger.warning(f"Live2D 客户端{reason}，已断开")
+        self.writer.cancel()
+        asyncio.create_task(_close(self.ws))
+
+    async def _write_loop(self) -> None:
+        while True:
+            if not self.queue:
+                self._wake.clear()
+                await self._wake.wait()
+                continue
+            _, data = self.queue.popleft()
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.ws.send_text(data), _STUCK_S)
+            except asyncio.TimeoutError:
+                self.kick(f"单条消息发送超过 {_STUCK_S:.0f}s")
+                return
+            except Exception:
+                _connections.pop(self.ws, None)  # 连接已断开，由接收循环收尾
+                return
+            send_ms.add((time.perf_counter() - started) * 1000)
+
+
+async def _close(ws: WebSocket) -> None:
+    try:
+        await asyncio.wait_for(ws.close(code=1013), 1.0)
+    except Exception:
+        pass
+
+
+class _ChunkCoalescer:
+    """LLM 文本 delta 合并：按 ws_chunk_flush_ms 间隔或 ws_chunk_max_chars 字数推送一条 llm_chunk。
+
+    快速模型每秒产生数百个 delta，逐条推送意味着同样数量的 JSON 序列化与 WebSocket 帧；
+    合并后每个刷新周期至多一条。任何其他消息广播前先推送缓冲内容，句子 / 结束等事件
+    与文本的先后顺序不变。
+    """
+
+    def __init__(self):
+        self._parts: list[str] = []
+        self._chars = 0
+        self._timer: asyncio.TimerHandle | None = None
+
+    def add(self, text: str) -> None:
+        if not text or not _connections:
+            return
+        _counters["llm_deltas"] += 1
+        config = get_config().server
+        self._parts.append(text)
+        self._chars += len(text)
+        if config.ws_chunk_flush_ms <= 0 or self._chars >= config.ws_chunk_max_chars:
+            self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(config.ws_chunk_flush_ms / 1000, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._parts:
+            return
+        text = "".join(self._parts)
+        self._parts.clear()
+        self._chars = 0
+        _counters["llm_chunk_messages"] += 1
+        _fan_out({"type": "llm_chunk", "text": text})
+
+
+_chunks = _ChunkCoalescer()
+
+# 连接池
+_connections: dict[WebSocket, _Client] = {}
+
+
+def broadcast(message: dict) -> None:
+    """向所有已连接的前端广播消息：只序列化一次，放入各客户端队列后立即返回，不等待发送。"""
+    _chunks.flush()  # 先推送尚未合并发出的 LLM 文本，保持消息顺序
+    _fan_out(message)
+
+
+def _fan_out(message: dict) -> None:
     if not _connections:
         return
     data = json.dumps(message, ensure_ascii=False)
-    dead = set()
-    for ws in _connections:
-        try:
-            await ws.send_text(data)
-        except Exception:
-            dead.add(ws)
-    _connections.difference_update(dead)
+    kind = message.get("type", "")
+    for client in list(_connections.values()):
+        client.push(kind, data)
+
+
+def client_count() -> int:
+    return len(_connections)
+
+
+def stats() -> dict:
+    depths = [len(c.queue) for c in _connections.values()]
+    return {
+        "clients": len(depths),
+        "max_queue_depth": max(depths, default=0),
+        **_counters,
+        "send": send_ms.stats(),
+    }
 
 
 @router.websocket("/ws/live2d")
 async def ws_live2d(websocket: WebSocket):
     await websocket.accept()
-    _connections.add(websocket)
+    client = _connections[websocket] = _Client(websocket)
     logger.info(f"Live2D 客户端已连接，当前连接数: {len(_connections)}")
     try:
         while True:
             # 保持连接，等待客户端消息（心跳）
             await websocket.receive_text()
-    except WebSocketDisconnect:
-        pass
+    except (WebSocketDisconnect, RuntimeError):
+        pass  # RuntimeError：已被 kick() 关闭
     finally:
-        _connections.discard(websocket)
+        _connections.pop(websocket, None)
+        client.writer.cancel()
         logger.info(f"Live2D 客户端断开，当前连接数: {len(_connections)}")
 
 
-# 监听后端事件，广播到前端
+# 监听后端事件，广播到前端（broadcast 不等待发送，处理函数均为普通函数，在 emit 中直接执行）
 @bus.on(Event.ASR_RESULT)
-async def _on_asr_result(data: dict):
-    await broadcast({"type": "asr_result", **data})
+def _on_asr_result(data: dict):
+    broadcast({"type": "asr_result", **data})
+
+
+@bus.on(Event.ASR_PARTIAL)
+def _on_asr_partial(data: dict):
+    broadcast({"type": "asr_partial", **data})
 
 
 @bus.on(Event.TTS_LIP_SYNC)
-async def _on_lip_sync(data: dict):
-    await broadcast({"type": "lip_sync", **data})
+def _on_lip_sync(data: dict):
+    broadcast({"type": "lip_sync", **data})
 
 
 @bus.on(Event.TTS_SUBTITLE)
-async def _on_subtitle(data: dict):
+def _on_subtitle(data: dict):
     emotion = data.get("emotion")
     expression = _EMOTION_EXPRESSION_MAP.get(emotion) if emotion else None
-    await broadcast({"type": "subtitle", **data, "expression": expression})
+    broadcast({"type": "subtitle", **data, "expression": expression})
 
 
 @bus.on(Event.LLM_TEXT_CHUNK)
-async def _on_llm_text_chunk(data: dict):
-    await broadcast({"type": "llm_chunk", **data})
+def _on_llm_text_chunk(data: dict):
+    _chunks.add(data.get("text", ""))
 
 
 @bus.on(Event.LLM_SENTENCE)
-async def _on_llm_sentence(data: dict):
-    await broadcast({"type": "llm_sentence", **data})
+def _on_llm_sentence(data: dict):
+    broadcast({"type": "llm_sentence", **data})
 
 
 @bus.on(Event.LLM_DONE)
-async def _on_llm_done(_=None):
-    await broadcast({"type": "llm_done"})
+def _on_llm_done(_=None):
+    broadcast({"type": "llm_done"})
 
 
 @bus.on(Event.PLAYBACK_DONE)
-async def _on_playback_done(_=None):
-    await broadcast({"type": "playback_done"})
+def _on_playback_done(_=None):
+    broadcast({"type": "playback_done"})
 
 
 def _derive_module(name: str) -> str:
@@ -104,7 +261,7 @@ def _derive_module(name: str) -> str:
 async def log_sink(message):
     """loguru sink：将 INFO+ 日志通过 WebSocket 广播到前端。"""
     record = message.record
-    await broadcast({
+    broadcast({
         "type": "log_entry",
         "level": record["level"].name,
         "module": _derive_module(record["name"]),
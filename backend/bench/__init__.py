@@ -0,0 +1,6 @@
+"""本地基准与验证脚本：用协议替身代替 Gateway / TTS / 前端连接，测量延迟优化的效果。
+
+均在 backend 目录下以模块方式运行，例如：
+    python -m bench.llm_ttft
+运行时模块（pipeline/、api/）不依赖这里的任何代码。
+"""
@@ -0,0 +1,100 @@
+"""基准脚本共用的协议替身与统计工具。"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Callable
+
+# 替身 Gateway 默认输出的 delta：情感 JSON + 两句回复
+DEFAULT_TOKENS = ('{"emotion":"开心"}', "你好，", "我是小助手。", "今天天气不错！")
+
+
+async def fake_gateway(
+    port: int,
+    first_token_ms: Callable[[], float],
+    handshake_ms: float = 0.0,
+    linger_ms: float = 0.0,
+    tokens: tuple[str, ...] = DEFAULT_TOKENS,
+) -> asyncio.AbstractServer:
+    """极简 OpenClaw Gateway（HTTP/1.1 keep-alive + SSE 分块响应）。
+
+    - 每条新连接先等待 handshake_ms，模拟建连开销
+    - 每个请求在 first_token_ms() 毫秒后开始输出 tokens，可返回随机值以注入长尾延迟
+    - 发出 [DONE] 后再过 linger_ms 才结束响应体
+    - GET /probe 直接返回 200
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await asyncio.sleep(handshake_ms / 1000)
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                path = line.split()[1]
+                length = 0
+                while (header := await reader.readline()) not in (b"\r\n", b""):
+                    name, _, value = header.decode().partition(":")
+                    if name.lower() == "content-length":
+                        length = int(value)
+                await reader.readexactly(length)
+                if path == b"/probe":
+                    writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                    await writer.drain()
+                    continue
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+                await writer.drain()
+                await asyncio.sleep(first_token_ms() / 1000)
+                for token in tokens:
+                    body = "data: " + json.dumps({"choices": [{"delta": {"content": token}}]}, ensure_ascii=False)
+                    data = (body + "\n\n").encode()
+                    writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                    await writer.drain()
+                data = b"data: [DONE]\n\n"
+                writer.write(b"%x\r\n%s\r\n" % (len(data), data))
+                await writer.drain()
+                if linger_ms:
+                    await asyncio.sleep(linger_ms / 1000)
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            pass  # 客户端提前关闭连接（取消落败请求、[DONE] 后不再等待等）
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", port)
+
+
+async def fake_tts_server(port: int, handshake_ms: float, first_frame_ms: float, frames: int = 5):
+    """腾讯云流式 TTS（stream_wsv2）替身：READY → 收到 ACTION_COMPLETE → 若干 PCM 帧 → final。
+
+    每条连接先等待 handshake_ms 才回 READY（签名校验、鉴权与会话初始化），
+    收到完成信号后 first_frame_ms 输出首帧。
+    """
+    import websockets
+
+    async def handle(ws) -> None:
+        await asyncio.sleep(handshake_ms / 1000)
+        await ws.send(json.dumps({"code": 0, "ready": 1}))
+        async for msg in ws:
+            if json.loads(msg).get("action") != "ACTION_COMPLETE":
+                continue
+            await asyncio.sleep(first_frame_ms / 1000)
+            for _ in range(frames):
+                await ws.send(bytes(640))  # 20ms 16kHz 16-bit 静音
+            await ws.send(json.dumps({"code": 0, "final": 1}))
+
+    return await websockets.serve(handle, "127.0.0.1", port)
+
+
+def quantile(samples: list[float], q: float) -> float:
+    s = sorted(samples)
+    return s[min(len(s) - 1, int(len(s) * q))]
+
+
+def describe(samples: list[float], qs: tuple[float, ...] = (0.5, 0.95, 0.99)) -> str:
+    """分位数摘要，如 "p50   40ms  p95  120ms  max  1500ms"；无样本时为 "-"。"""
+    if not samples:
+        return "-"
+    parts = [f"p{round(q * 100)} {quantile(samples, q):>7.1f}ms" for q in qs]
+    return "  ".join(parts + [f"max {max(samples):>7.1f}ms"])
@@ -0,0 +1,67 @@
+"""OpenClaw 长连接客户端的首 token 延迟验证。
+
+用法（在 backend 目录下）：
+    python -m bench.llm_ttft [--turns 20] [--handshake-ms 30] [--linger-ms 0]
+
+本地替身 Gateway 为每条新连接注入 handshake_ms 的建连开销，可选在 [DONE] 之后 linger_ms 才结束响应；
+分别以"每轮新建客户端"和"复用长连接客户端"回放多轮请求，比较首 token 延迟与整轮耗时（到 LLM_DONE）。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from bench.common import describe, fake_gateway
+from config import OpenClawConfig
+from pipeline.llm.openclaw_llm import OpenClawLLMPipeline
+
+
+async def _measure(config: OpenClawConfig, turns: int, reuse: bool) -> tuple[list[float], list[float]]:
+    ttfts, totals = [], []
+    llm = OpenClawLLMPipeline(config) if reuse else None
+    try:
+        for _ in range(turns):
+            turn_llm = llm or OpenClawLLMPipeline(config)
+            started = time.perf_counter()
+            try:
+                await turn_llm.generate("你好")
+            finally:
+                if llm is None:
+                    await turn_llm.close()
+            totals.append((time.perf_counter() - started) * 1000)
+            if turn_llm.last_ttft_ms is not None:
+                ttfts.append(turn_llm.last_ttft_ms)
+        return ttfts, totals
+    finally:
+        if llm is not None:
+            await llm.close()
+
+
+async def _compare(args) -> None:
+    server = await fake_gateway(
+        args.port, lambda: args.first_token_ms, handshake_ms=args.handshake_ms, linger_ms=args.linger_ms
+    )
+    config = OpenClawConfig(url=f"http://127.0.0.1:{args.port}", token="bench", timeout_ms=args.timeout_ms)
+    try:
+        for label, reuse in (("per-turn", False), ("pooled", True)):
+            ttfts, totals = await _measure(config, args.turns, reuse)
+            print(f"{label:<9} TTFT  {describe(ttfts, (0.5,))}")
+            print(f"{'':<9} 整轮  {describe(totals, (0.5,))}")
+    finally:
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="用本地替身 Gateway 比较每轮新建客户端与复用长连接的首 token 延迟")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=30.0, help="每条新连接的建连开销")
+    parser.add_argument("--first-token-ms", type=float, default=50.0, help="收到请求到输出首 token 的延迟")
+    parser.add_argument("--linger-ms", type=float, default=0.0, help="[DONE] 之后再过多久结束响应")
+    parser.add_argument("--timeout-ms", type=int, default=8000)
+    parser.add_argument("--port", type=int, default=18881)
+    asyncio.run(_compare(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""TTS 预热会话池的首帧延迟验证。
+
+用法（在 backend 目录下）：
+    python -m bench.tts_pool [--sentences 20] [--handshake-ms 100] [--first-frame-ms 20]
+
+本地启动说同样协议的 WebSocket 替身（见 bench.common.fake_tts_server），分别以现场握手和
+预热池取用的方式合成多句，比较从调用 synthesize() 到首帧提交播放的耗时。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+
+from bench.common import describe, fake_tts_server
+from config import TTSConfig
+from pipeline.tts.session_pool import TTSSessionPool
+from pipeline.tts.tencent_tts import TencentTTSPipeline
+
+
+async def _first_frame_ms(tts: TencentTTSPipeline) -> float:
+    """合成一句，返回从调用到首帧提交播放的耗时。"""
+    first: list[float] = []
+    started = time.perf_counter()
+    await tts.synthesize("你好。", submit=lambda utt: first.append(time.perf_counter()))
+    return (first[0] - started) * 1000 if first else float("nan")
+
+
+async def _compare(args) -> None:
+    server = await fake_tts_server(args.port, args.handshake_ms, args.first_frame_ms)
+    config = TTSConfig(
+        secret_id="bench", secret_key="bench", streaming=True, cache_enabled=False,
+        pool_size=1, endpoint=f"ws://127.0.0.1:{args.port}/stream_wsv2",
+    )
+    tts = TencentTTSPipeline(config)
+    try:
+        for label, pooled in (("cold", False), ("pooled", True)):
+            pool = TTSSessionPool(tts) if pooled else None
+            tts.pool = pool
+            if pool is not None:
+                pool.start()
+            samples = []
+            try:
+                for _ in range(args.sentences):
+                    # 句间间隔：模拟 LLM 出句的节奏，预热池在此期间补位
+                    await asyncio.sleep(args.gap_ms / 1000)
+                    samples.append(await _first_frame_ms(tts))
+            finally:
+                if pool is not None:
+                    await pool.close()
+            hits = f"  命中 {pool.hits} / 未命中 {pool.misses}" if pool else ""
+            print(f"{label:<7} 首帧 {describe(samples, (0.5, 0.95))}{hits}")
+    finally:
+        tts.pool = None
+        server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="用本地 TTS 协议替身比较现场握手与预热会话池的首帧延迟")
+    parser.add_argument("--sentences", type=int, default=20)
+    parser.add_argument("--handshake-ms", type=float, default=100.0, help="建连到 READY 的耗时")
+    parser.add_argument("--first-frame-ms", type=float, default=20.0, help="收到完成信号到首帧的耗时")
+    parser.add_argument("--gap-ms", type=float, default=300.0, help="相邻两句之间的间隔")
+    parser.add_argument("--port", type=int, default=18891)
+    asyncio.run(_compare(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Live2D WebSocket 广播扇出的延迟验证。
+
+用法（在 backend 目录下）：
+    python -m bench.ws_fanout [--clients 10 100 300 500] [--send-ms 0.5] [--stall-ms 500]
+
+用假连接比较两种广播方式：逐个 await 发送（对照）与 api.ws_live2d 的每客户端队列。每条消息的
+send_text 耗时 send_ms，其中一个客户端每条卡 stall_ms；统计所有健康客户端收齐一条消息所需的时间，
+以及广播调用本身阻塞调用方（事件处理函数）的时间。队列方式下卡顿客户端不影响其他人，
+收齐耗时只随事件循环逐个调度写协程的开销缓慢增长。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+
+from api import ws_live2d
+from bench.common import describe, quantile
+
+
+class _FakeSocket:
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+        self.arrivals: dict[str, float] = {}  # 消息 → 发送完成时刻（各条消息内容互不相同）
+
+    async def send_text(self, data: str) -> None:
+        await asyncio.sleep(self.delay_s)
+        self.arrivals[data] = time.perf_counter()
+
+    async def close(self, code: int = 1000) -> None:
+        pass
+
+
+async def _measure(
+    clients: int, messages: int, send_ms: float, stall_ms: float, queued: bool
+) -> tuple[list[float], list[float]]:
+    """返回 (健康客户端收齐各条消息的耗时, 广播调用本身阻塞调用方的耗时)，单位毫秒。"""
+    stalled = _FakeSocket(stall_ms / 1000)
+    healthy = [_FakeSocket(send_ms / 1000) for _ in range(clients - 1)]
+    sockets = [stalled, *healthy]
+    connections = ws_live2d._connections
+    if queued:
+        for ws in sockets:
+            connections[ws] = ws_live2d._Client(ws)
+    latencies, blocking = [], []
+    try:
+        for seq in range(messages):
+            message = {"type": "subtitle", "text": "你好", "seq": seq}
+            data = json.dumps(message, ensure_ascii=False)
+            started = time.perf_counter()
+            if queued:
+                ws_live2d.broadcast(message)
+            else:
+                for ws in sockets:
+                    await ws.send_text(data)
+            blocking.append((time.perf_counter() - started) * 1000)
+            while any(data not in ws.arrivals for ws in healthy):
+                await asyncio.sleep(0.001)
+            latencies.append((max(ws.arrivals[data] for ws in healthy) - started) * 1000)
+            await asyncio.sleep(0.02)  # 消息间隔
+    finally:
+        for client in connections.values():
+            client.writer.cancel()
+        connections.clear()
+    return latencies, blocking
+
+
+async def _compare(args) -> None:
+    for clients in args.clients:
+        for label, queued in (("sequential", False), ("queued", True)):
+            latencies, blocking = await _measure(clients, args.messages, args.send_ms, args.stall_ms, queued)
+            print(
+                f"{clients:>4} clients  {label:<10}  收齐 {describe(latencies, (0.5, 0.99))}"
+                f"  广播调用 p50 {quantile(blocking, 0.5):>8.2f}ms"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="用假连接比较逐个发送与每客户端队列的广播延迟")
+    parser.add_argument("--clients", nargs="+", type=int, default=[10, 100, 300, 500])
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--send-ms", type=float, default=0.5, help="健康客户端每条消息的发送耗时")
+    parser.add_argument("--stall-ms", type=float, default=500.0, help="卡顿客户端每条消息的发送耗时")
+    asyncio.run(_compare(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -20,17 +20,55 @@ class OpenClawConfig(BaseModel):
     session_key: str = "main"
     agent_id: str = ""
     timeout_ms: int = 120000
+    keepalive_interval_s: float = 30.0  # 后台健康检查 / 连接保温的间隔
+    http2: bool = False  # 使用 HTTP/2（需安装 h2），否则为 HTTP/1.1 keep-alive
+    fallback_urls: list[str] = []  # 备用 Gateway 地址，首 token 超时或主端点失败时对冲 / 改投
+    hedge_after_ms: int = 0  # 首 token 超过此时长即向下一端点发出对冲请求，0 按该端点首 token 延迟的 p95 自适应
+    hedge_min_ms: int = 300  # 自适应对冲预算的下限，避免频繁对冲加重 Gateway 负载
+    sentence_first_min_chars: int = 6  # 回复第一段在逗号等分句处提前送 TTS 的最小字数
+    sentence_clause_min_chars: int = 16  # 后续段落在分句处切分的最小字数
+    sentence_merge_min_chars: int = 4  # 短于此字数的整句与后文合并
+    sentence_max_chars: int = 80  # 引号内超过此字数时允许切分
+    context_enabled: bool = False  # 请求中携带多轮对话上下文（Gateway 未按会话维护历史时开启）
+    context_max_tokens: int = 2000  # 上下文（摘要 + 近期轮次）的 token 预算，超出后在后台压缩较早的轮次
+    context_min_turns: int = 2  # 压缩时至少原样保留的最近轮数
+    context_summary_max_tokens: int = 300  # 摘要长度上限
+    response_cache_enabled: bool = False  # 相同 / 相近的用户问题直接回放上次的回复（启用 context_enabled 时不生效）
+    response_cache_max_entries: int = 256  # 缓存条目上限，超出后淘汰最久未用的
+    response_cache_ttl_s: float = 3600.0  # 缓存条目有效期
+    response_cache_similarity: float = 0.85  # 近似匹配的 bigram Dice 系数阈值（1 只做精确匹配）
 
 
 class ASRConfig(BaseModel):
     model_size: str = "small"
+    engine: str = "torch"  # 推理后端：torch（funasr）/ onnx（ONNX Runtime，适合纯 CPU）
     device: str = "auto"
     vad_sensitivity: int = 3
-    silence_duration_ms: int = 800
+    silence_duration_ms: int = 800  # 语音结束的静音超时（自适应断句时为上限）
+    endpoint_min_silence_ms: int = 300  # 自适应断句的静音超时下限
+    endpoint_aggressiveness: float = 0.5  # 自适应断句力度：0 固定超时，越大越早断句（误切风险越高）
+    endpoint_use_text: bool = False  # 以增量识别文本（末尾连词 / 填充词）延长断句等待；误切率评估前默认关闭
     min_speech_duration_ms: int = 300
     microphone_device_index: Optional[int] = None
-    vad_rms_threshold: float = 2200.0  # RMS能量预过滤阈值
+    vad_rms_threshold: float = 2200.0  # RMS能量预过滤阈值（自适应时为门限下限）
+    vad_adaptive_threshold: bool = True  # 按环境噪声底自动抬高 RMS 门限
+    vad_noise_margin: float = 3.0  # 自适应门限 = 噪声底 RMS × 此倍数
     vad_pre_roll_frames: int = 3  # Pre-roll帧数（默认90ms）
+    max_segment_ms: int = 15000  # 单段语音上限，持续说话超过时分块提交识别
+    segment_overlap_ms: int = 1000  # 相邻分块的重叠时长，用于拼接识别结果
+    echo_suppression: bool = True  # 播放 TTS 时以播放中的 PCM 为参考，屏蔽扬声器回声
+    echo_max_delay_ms: int = 300  # 回声相对参考信号的最大延迟（声学 + 设备缓冲）
+    echo_correlation: float = 0.4  # 归一化互相关高于此值视为回声主导
+    echo_barge_in_ratio: float = 2.0  # 麦克风能量超过预计回声的倍数才视为真实插话
+    capture_buffer_ms: int = 2000  # 采集环形缓冲容量，事件循环阻塞超过此时长才会丢帧
+    partial_interval_ms: int = 600  # 说话期间增量识别的间隔（0 关闭）
+    process_workers: int = 0  # >0 时在独立子进程中推理（进程数），0 为进程内推理
+    process_timeout_s: float = 30.0  # 子进程单次推理超时，超时即重建该进程
+    batch_max_size: int = 4  # 单次推理合并的最大语音段数（1 关闭微批）
+    batch_window_ms: int = 0  # 首段到达后额外等待凑批的时间，0 只合并推理期间排队的段
+    onnx_model_dir: str = "iic/SenseVoiceSmall"  # ONNX 模型目录或 ModelScope 模型名
+    onnx_quantize: bool = True  # 使用 int8 量化模型
+    onnx_intra_op_threads: int = 4  # ONNX Runtime 算子内并行线程数
 
 
 class TTSConfig(BaseModel):
@@ -41,11 +79,24 @@ class TTSConfig(BaseModel):
     voice_type: int = 603004
     codec: str = "pcm"
     sample_rate: int = 16000
+    streaming: bool = True  # 边合成边播放，首帧到达即开播
+    stream_prebuffer_ms: int = 120  # 流式播放开播前的预缓冲时长，吸收网络抖动
+    lookahead: int = 2  # 最多同时合成的句数（1 即串行）
+    max_pending_sentences: int = 16  # 待合成句子队列上限，满时丢弃最早的待合成句子
+    pool_size: int = 1  # 每种情感保持的预热 READY 会话数（0 关闭；计入并发配额）
+    endpoint: str = "wss://tts.cloud.tencent.com/stream_wsv2"  # 可指向本地协议替身做联调
+    cache_enabled: bool = True  # 相同文本/音色/情感的合成结果直接回放
+    cache_memory_mb: int = 32  # 内存 LRU 层上限
+    cache_disk_mb: int = 256  # 磁盘层上限
+    cache_dir: str = ""  # 磁盘层目录，留空使用 backend/cache/tts
 
 
 class ServerConfig(BaseModel):
     bind_address: str = "127.0.0.1"  # 默认仅监听本地
     port: int = 8000
+    latency_trace_file: str = ""  # 每轮延迟追踪的 JSONL 输出路径，留空不写（统计见 /api/metrics/latency）
+    ws_chunk_flush_ms: int = 25  # 推送给前端的 LLM 文本 delta 按此间隔合并为一条消息，0 为逐条推送
+    ws_chunk_max_chars: int = 48  # 合并缓冲达到此字数时立即推送
 
 
 class AppConfig(BaseModel):
@@ -5,6 +5,7 @@ from loguru import logger
 
 from config import get_config
 from core.event_bus import bus, Event
+from core.tracing import tracer
 from pipeline.llm.base import BaseLLMPipeline
 
 
@@ -16,7 +17,6 @@ class VTuberBot:
     def __init__(self):
         self._tasks: list[asyncio.Task] = []
         self._mic_task: asyncio.Task | None = None
-        self._tts_sentence_queue: asyncio.Queue[tuple[str, str] | None] = asyncio.Queue()
         self._current_chat_task: asyncio.Task | None = None
 
     @property
@@ -40,52 +40,44 @@ class VTuberBot:
     def stop_mic(self) -> None:
         """停止麦克风采集（幂等）。
 
-        只置 _running=False，让 stream.read() 在当前帧（≤30ms）自然返回后
-        由 finally 块安全释放 stream。不能 cancel task——task 被取消时
-        finally 会立即调用 pa.terminate()，而此时 stream.read() 仍阻塞在
-        PortAudio C 层，两者并发操作同一 stream 会导致段错误。
+        只置 _running=False 并唤醒采集循环，由其 finally 块先 stop_stream()
+        （等待 PortAudio 回调线程退出）再释放 stream。不 cancel task，
+        保证 stream 的关闭始终经过同一条有序路径。
         """
         if hasattr(self, 'mic'):
             self.mic.stop()
-        # 不 cancel，task 会在下一帧读完后自行退出 while 循环
+        # 不 cancel，task 被唤醒后自行退出 while 循环
         self._mic_task = None
         logger.info("麦克风采集已关闭")
 
-    async def _probe_openclaw(self, url: str) -> None:
-        """向 OpenClaw Gateway 发送连通性探针请求。"""
-        import httpx
-        try:
-            async with httpx.AsyncClient(timeout=5.0) as client:
-                r = await client.get(f"{url}/probe")
-                if r.status_code < 400:
-                    logger.info("OpenClaw Gateway 连接正常")
-                else:
-                    logger.error(
-                        f"OpenClaw Gateway /probe 返回 HTTP {r.status_code}，LLM 功能可能不可用"
-                    )
-        except Exception as e:
-            logger.error(
-                f"OpenClaw Gateway 不可达（{url}/probe）: {e}，LLM 功能不可用，ASR/TTS 仍正常运行"
-            )
-
     async def start(self):
         logger.info("VTuberBot 启动中...")
         config = get_config()
 
+        tracer.configure(config.server.latency_trace_file)
+
         # 延迟导入，避免循环依赖
         from devices.microphone import MicrophoneDevice
         from pipeline.asr.vad import VADProcessor
-        from pipeline.asr.sensevoice import SenseVoiceASR
+        from pipeline.asr import create_asr_engine
         from pipeline.llm import create_llm_pipeline
         from pipeline.tts.tencent_tts import TencentTTSPipeline
-
-        # OpenClaw Gateway 连通性探针
-        await self._probe_openclaw(config.openclaw.url)
+        from pipeline.tts.scheduler import TTSScheduler
+        from pipeline.tts.session_pool import TTSSessionPool
 
         # 初始化各模块
-        self.asr = SenseVoiceASR(config.asr)
+        self.asr = create_asr_engine(config.asr)
         self.llm = create_llm_pipeline(config.openclaw)
+        self.llm.set_character(config.character)
+        self.llm.start()  # 长连接 + 后台健康检查（替代一次性连通性探针）
         self.tts = TencentTTSPipeline(config.tts)
+        self.tts.pool = TTSSessionPool(self.tts)
+        self.tts.pool.start()
+        self.tts_scheduler = TTSScheduler(
+            self.tts,
+            lookahead=config.tts.lookahead,
+            max_pending=config.tts.max_pending_sentences,
+        )
         self.mic = MicrophoneDevice(config.asr)
 
         from pipeline.asr.sensevoice import init_asr_handler
@@ -93,50 +85,49 @@ class VTuberBot:
 
         asyncio.create_task(self.asr.preload())
 
-        # 启动串行 TTS 合成 worker，保证句子按序播放
-        worker = asyncio.create_task(self._tts_worker())
+        # 启动 TTS 合成调度器：并发预合成后续句子，按 LLM 顺序播放
+        worker = asyncio.create_task(self.tts_scheduler.run())
         self._tasks.append(worker)
 
+        # 事件循环延迟采样（/metrics）
+        from core.metrics import loop_lag
+        self._tasks.append(asyncio.create_task(loop_lag.run()))
+
         # 注册事件处理链
         self._register_handlers()
 
         logger.info("VTuberBot 已就绪（麦克风未启动，通过 /api/asr/start 开启）")
 
-    async def _tts_worker(self):
-        """串行消费 TTS 合成队列，保证句子按 LLM 生成顺序播放。"""
-        while True:
-            item = await self._tts_sentence_queue.get()
-            if item is None:
-                break
-            text, emotion = item
-            if get_config().tts.enabled:
-                await self.tts.synthesize(text, emotion)
-
     def _register_handlers(self):
-        @bus.on(Event.ASR_RESULT)
+        @bus.on(Event.ASR_RESULT, concurrent=True)
         async def on_asr_result(data: dict):
             text = data.get("text", "").strip()
             if not text:
+                tracer.discard(data.get("trace"))
                 return
             logger.info(f"[ASR] {text}  情感={data.get('emotion', 'neutral')}")
             # 打断上一轮播放
             bus.emit(Event.INTERRUPT)
-            await self.llm.generate(text, user_emotion=data.get("emotion", "neutral"))
+            await self.llm.generate(text, user_emotion=data.get("emotion", "neutral"), trace=data.get("trace"))
+
+        @bus.on(Event.ASR_PARTIAL)
+        def on_asr_partial(data: dict):
+            # 增量识别文本回传 VAD，作为自适应断句的语义信号
+            if self.is_mic_running and "segment" in data:
+                self.mic.vad.hint_partial(data["segment"], data["speech_frames"], data["text"])
 
         @bus.on(Event.LLM_SENTENCE)
-        async def on_llm_sentence(data: dict):
-            # 入队而非直接调用，由 _tts_worker 串行处理，保证合成顺序
-            await self._tts_sentence_queue.put((data["text"], data.get("emotion", "平静")))
+        def on_llm_sentence(data: dict):
+            # 普通函数在 emit 中同步入队，句子即刻带上当前 epoch，随后的打断能将其丢弃；
+            # 由调度器并发合成、按序播放
+            self.tts_scheduler.submit(data["text"], data.get("emotion", "平静"), data.get("trace"))
 
         @bus.on(Event.INTERRUPT)
-        async def on_interrupt(_=None):
+        def on_interrupt(_=None):
+            # 普通函数在 emit 中同步执行，打断立即生效
             self.tts.interrupt()
-            # 清空待合成队列，丢弃当前轮次的剩余句子
-            while not self._tts_sentence_queue.empty():
-                try:
-                    self._tts_sentence_queue.get_nowait()
-                except asyncio.QueueEmpty:
-                    break
+            # 清空待合成队列并取消在途合成，丢弃当前轮次的剩余句子
+            self.tts_scheduler.cancel()
             # 取消正在进行的 Chat LLM 任务
             if self._current_chat_task and not self._current_chat_task.done():
                 self._current_chat_task.cancel()
@@ -144,7 +135,7 @@ class VTuberBot:
             if self.is_mic_running:
                 pcm = self.mic.vad.force_commit()
                 if pcm:
-                    bus.emit(Event.MIC_VAD, {"pcm": pcm})
+                    bus.emit(Event.MIC_VAD, {"pcm": pcm, **self.mic.vad.last_segment, "trace": tracer.start("mic")})
 
     def reload_config(self):
         """热重载：更新各模块配置，下次调用时生效。"""
@@ -152,19 +143,27 @@ class VTuberBot:
         cfg = get_config()
         logger.info("热重载配置...")
 
+        tracer.configure(cfg.server.latency_trace_file)
+
         if hasattr(self, 'llm'):
-            from pipeline.llm import create_llm_pipeline
-            self.llm = create_llm_pipeline(cfg.openclaw)
-            logger.info("LLM pipeline 已重建（OpenClaw 配置更新）")
+            # 原地更新：在途请求继续使用旧连接，新请求使用新配置
+            self.llm.update_config(cfg.openclaw)
+            self.llm.set_character(cfg.character)
+            logger.info("LLM pipeline 配置已更新")
 
         if hasattr(self, 'tts'):
             self.tts.config = cfg.tts
+            self.tts_scheduler.lookahead = cfg.tts.lookahead
 
         if hasattr(self, 'asr'):
-            if (self.asr.config.model_size != cfg.asr.model_size or
-                    self.asr.config.device != cfg.asr.device):
-                self.asr._model = None  # 触发下次推理时重新加载
+            model_keys = ("model_size", "device", "engine", "onnx_model_dir",
+                          "onnx_quantize", "onnx_intra_op_threads")
+            if any(getattr(self.asr.config, k) != getattr(cfg.asr, k) for k in model_keys):
+                self.asr.unload()  # 触发下次推理时重新加载
                 logger.info("ASR 模型配置变更，将在下次推理时重新加载")
+            if self.asr.config.process_workers != cfg.asr.process_workers or (
+                    cfg.asr.process_workers == 0 and self.asr.config.engine != cfg.asr.engine):
+                logger.info("ASR 推理进程数 / 推理后端变更，重启服务后生效")
             self.asr.config = cfg.asr
 
         if hasattr(self, 'mic'):
@@ -181,10 +180,14 @@ class VTuberBot:
                 if hasattr(self.mic, 'vad'):
                     vad = self.mic.vad
                     vad._rms_threshold = cfg.asr.vad_rms_threshold
-                    vad._silence_frames = cfg.asr.silence_duration_ms // 30
+                    vad._adaptive_gate = cfg.asr.vad_adaptive_threshold
+                    vad._noise_margin = cfg.asr.vad_noise_margin
+                    vad._endpointer.configure(cfg.asr)
                     vad._min_speech_frames = cfg.asr.min_speech_duration_ms // 30
                     vad.vad.set_mode(cfg.asr.vad_sensitivity)
                     vad._pre_roll = type(vad._pre_roll)(maxlen=cfg.asr.vad_pre_roll_frames)
+                    vad._max_segment_frames = cfg.asr.max_segment_ms // 30
+                    vad._overlap_frames = cfg.asr.segment_overlap_ms // 30  # 缓冲在下一段语音开始时按新容量重建
                     logger.info("VAD 参数已热重载")
 
         logger.info("配置热重载完成")
@@ -192,4 +195,10 @@ class VTuberBot:
     async def stop(self):
         for task in self._tasks:
             task.cancel()
+        if hasattr(self, 'tts') and self.tts.pool:
+            await self.tts.pool.close()
+        if hasattr(self, 'asr'):
+            await self.asr.close()
+        if hasattr(self, 'llm'):
+            await self.llm.close()
         logger.info("VTuberBot 已停止")
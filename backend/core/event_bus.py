@@ -1,18 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import inspect
+import time
 from enum import Enum
-from pyee.asyncio import AsyncIOEventEmitter
+from typing import Any, Callable, TypedDict
+
+from loguru import logger
 
 
 class Event(str, Enum):
     # ASR
-    MIC_VAD = "mic_vad"               # {"pcm": bytes} — 麦克风采集到完整语音段
-    ASR_RESULT = "asr_result"          # {"text": str, "emotion": str} — 识别完成
+    MIC_VAD = "mic_vad"               # {"pcm": bytes, "segment"?: int, "speech_frames"?: int, "chunk"?: int, "final"?: bool, "trace"?: str} — 麦克风采集到完整语音段（超长语音分块，final=False 为中间块）
+    MIC_PARTIAL = "mic_partial"       # {"pcm": bytes, "segment": int, "speech_frames": int} — 语音进行中的缓冲快照
+    ASR_PARTIAL = "asr_partial"        # {"text": str, "emotion": str, "segment": int, "speech_frames": int} — 增量识别结果（语音尚未结束）
+    ASR_RESULT = "asr_result"          # {"text": str, "emotion": str, "trace"?: str} — 识别完成
 
     # LLM
     LLM_CHUNK = "llm_chunk"            # {"text": str} — 所有原始 delta（含情感 JSON 前缀）
     LLM_TEXT_CHUNK = "llm_text_chunk"  # {"text": str} — 情感 JSON 剥离后的纯文本 delta
-    LLM_SENTENCE = "llm_sentence"      # {"text": str, "emotion": str}
+    LLM_SENTENCE = "llm_sentence"      # {"text": str, "emotion": str, "trace"?: str}
     LLM_DONE = "llm_done"             # {}
 
     # TTS
@@ -30,4 +37,298 @@ class Event(str, Enum):
     TOOL_CALL_END = "tool_call_end"      # {"tool": str, "result": str}
 
 
-bus = AsyncIOEventEmitter()
+# ── 事件载荷类型 ─────────────────────────────────────────────────────────────
+# 与上方注释一一对应；bus.validate=True 时 emit 会检查必填字段（开发调试用）
+# "trace" 为本轮对话的延迟追踪 id（见 core.tracing），值可以为 None
+
+class _MicVADRequired(TypedDict):
+    pcm: bytes
+
+
+class MicVADPayload(_MicVADRequired, total=False):
+    segment: int
+    speech_frames: int
+    chunk: int
+    final: bool
+    trace: str | None
+
+
+class MicPartialPayload(TypedDict):
+    pcm: bytes
+    segment: int
+    speech_frames: int
+
+
+class _ASRPartialRequired(TypedDict):
+    text: str
+    emotion: str
+
+
+class ASRPartialPayload(_ASRPartialRequired, total=False):
+    segment: int
+    speech_frames: int
+
+
+class _ASRResultRequired(TypedDict):
+    text: str
+    emotion: str
+
+
+class ASRResultPayload(_ASRResultRequired, total=False):
+    trace: str | None
+
+
+class TextPayload(TypedDict):
+    text: str
+
+
+class SentencePayload(TypedDict):
+    text: str
+    emotion: str
+
+
+class LLMSentencePayload(SentencePayload, total=False):
+    trace: str | None
+
+
+class EmptyPayload(TypedDict):
+    pass
+
+
+class AudioFramePayload(TypedDict):
+    pcm: bytes
+
+
+class LipSyncPayload(TypedDict):
+    timeline: list
+    t0: float
+
+
+class PlaybackStartedPayload(TypedDict):
+    t0: float
+
+
+class ToolCallStartPayload(TypedDict):
+    tool: str
+    args: dict
+
+
+class ToolCallEndPayload(TypedDict):
+    tool: str
+    result: str
+
+
+PAYLOAD_TYPES: dict[Event, type] = {
+    Event.MIC_VAD: MicVADPayload,
+    Event.MIC_PARTIAL: MicPartialPayload,
+    Event.ASR_PARTIAL: ASRPartialPayload,
+    Event.ASR_RESULT: ASRResultPayload,
+    Event.LLM_CHUNK: TextPayload,
+    Event.LLM_TEXT_CHUNK: TextPayload,
+    Event.LLM_SENTENCE: LLMSentencePayload,
+    Event.LLM_DONE: EmptyPayload,
+    Event.TTS_AUDIO_FRAME: AudioFramePayload,
+    Event.TTS_LIP_SYNC: LipSyncPayload,
+    Event.TTS_SUBTITLE: SentencePayload,
+    Event.PLAYBACK_STARTED: PlaybackStartedPayload,
+    Event.PLAYBACK_DONE: EmptyPayload,
+    Event.TOOL_CALL_START: ToolCallStartPayload,
+    Event.TOOL_CALL_END: ToolCallEndPayload,
+}
+
+# 有序订阅者的默认队列上限
+DEFAULT_QUEUE_SIZE = 1024
+
+
+class _Subscriber:
+    """单个事件处理函数及其投递方式、计数。
+
+    - sync：普通函数，在 emit 中直接调用，不创建 task
+    - ordered：协程函数，由专属 worker 按 emit 顺序逐个 await；队列满时丢弃最旧的一条
+    - concurrent：协程函数，每次 emit 创建独立 task（处理可能长时间阻塞、且需要并发时使用）
+    """
+
+    def __init__(self, event: str, handler: Callable, mode: str, maxsize: int):
+        self.event = getattr(event, "value", event)
+        self.handler = handler
+        self.mode = mode
+        self.name = getattr(handler, "__qualname__", repr(handler))
+        self._queue: asyncio.Queue[tuple[tuple, float]] = asyncio.Queue(maxsize)
+        self._worker: asyncio.Task | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self.calls = 0
+        self.errors = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.max_wait_ms = 0.0
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self.mode == "ordered" else len(self._tasks)
+
+    def deliver(self, args: tuple) -> None:
+        if self.mode == "sync":
+            self._call_sync(args)
+        elif self.mode == "ordered":
+            item = (args, time.perf_counter())
+            try:
+                self._queue.put_nowait(item)
+            except asyncio.QueueFull:
+                self._queue.get_nowait()
+                self._queue.put_nowait(item)
+                self.dropped += 1
+                if self.dropped == 1 or self.dropped % 100 == 0:
+                    logger.warning(f"事件 {self.event} 的处理函数 {self.name} 积压，已丢弃 {self.dropped} 条")
+            if self._worker is None or self._worker.done():
+                self._worker = asyncio.get_running_loop().create_task(self._drain())
+        else:
+            task = asyncio.get_running_loop().create_task(self._invoke(args, time.perf_counter()))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def close(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        for task in list(self._tasks):
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "handler": self.name,
+            "mode": self.mode,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "calls": self.calls,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "avg_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+            "max_ms": round(self.max_ms, 3),
+            "max_wait_ms": round(self.max_wait_ms, 3),
+        }
+
+    def _call_sync(self, args: tuple) -> None:
+        started = time.perf_counter()
+        try:
+            self.handler(*args)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"事件 {self.event} 的处理函数 {self.name} 出错")
+        finally:
+            self._record(started)
+
+    async def _drain(self) -> None:
+        while True:
+            args, enqueued = await self._queue.get()
+            await self._invoke(args, enqueued)
+
+    async def _invoke(self, args: tuple, enqueued: float) -> None:
+        started = time.perf_counter()
+        self.max_wait_ms = max(self.max_wait_ms, (started - enqueued) * 1000)
+        try:
+            await self.handler(*args)
+        except asyncio.CancelledError:
+            current = asyncio.current_task()
+            if self.mode == "ordered" and current is self._worker and not _cancelling(current):
+                return  # 处理函数等待的对象被取消（如打断），worker 继续处理后续事件
+            raise
+        except Exception:
+            self.errors += 1
+            logger.exception(f"事件 {self.event} 的处理函数 {self.name} 出错")
+        finally:
+            self._record(started)
+
+    def _record(self, started: float) -> None:
+        ms = (time.perf_counter() - started) * 1000
+        self.calls += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+
+class EventBus:
+    """进程内事件总线，接口与 pyee 的 on / emit / remove_listener 兼容。
+
+    每个订阅者独立投递：同一订阅者按 emit 顺序收到事件；普通函数直接在 emit 中调用，
+    协程函数由该订阅者专属的 worker 依次处理，不再为每次 emit 创建 task。
+    处理函数的异常记录日志后吞掉，不影响其他订阅者与发布方。
+    """
+
+    def __init__(self):
+        self._subscribers: dict[str, list[_Subscriber]] = {}
+        self.emitted: dict[str, int] = {}
+        self.validate = False
+
+    def on(self, event: str, handler: Callable | None = None, *,
+           concurrent: bool = False, maxsize: int = DEFAULT_QUEUE_SIZE):
+        """注册处理函数；不传 handler 时作为装饰器使用。
+
+        concurrent=True 时协程函数每次 emit 都并发执行（不保证顺序、不限队列）；
+        maxsize 为有序订阅者的队列上限。
+        """
+        if handler is None:
+            return lambda f: self.on(event, f, concurrent=concurrent, maxsize=maxsize)
+        if inspect.iscoroutinefunction(handler):
+            mode = "concurrent" if concurrent else "ordered"
+        else:
+            mode = "sync"
+        self._subscribers.setdefault(event, []).append(_Subscriber(event, handler, mode, maxsize))
+        return handler
+
+    add_listener = on
+
+    def remove_listener(self, event: str, handler: Callable) -> None:
+        subscribers = self._subscribers.get(event, [])
+        for sub in subscribers:
+            if sub.handler is handler:
+                subscribers.remove(sub)
+                sub.close()
+                return
+
+    def listeners(self, event: str) -> list[Callable]:
+        return [sub.handler for sub in self._subscribers.get(event, [])]
+
+    def emit(self, event: str, *args: Any) -> bool:
+        self.emitted[event] = self.emitted.get(event, 0) + 1
+        if self.validate:
+            _check_payload(event, args)
+        subscribers = self._subscribers.get(event)
+        if not subscribers:
+            return False
+        for sub in tuple(subscribers):
+            sub.deliver(args)
+        return True
+
+    def stats(self) -> dict:
+        events = set(self._subscribers) | set(self.emitted)
+        return {
+            str(getattr(event, "value", event)): {
+                "emitted": self.emitted.get(event, 0),
+                "subscribers": [sub.stats() for sub in self._subscribers.get(event, [])],
+            }
+            for event in sorted(events, key=str)
+        }
+
+
+def _cancelling(task: asyncio.Task) -> bool:
+    """task 自身是否正被取消；Python 3.10 无法区分，一律视为是（worker 退出，下次 emit 时重建）。"""
+    cancelling = getattr(task, "cancelling", None)
+    return cancelling() > 0 if cancelling is not None else True
+
+
+def _check_payload(event: str, args: tuple) -> None:
+    payload_type = PAYLOAD_TYPES.get(event)
+    if payload_type is None:
+        return
+    data = args[0] if args else {}
+    if not isinstance(data, dict):
+        raise TypeError(f"事件 {getattr(event, 'value', event)} 的载荷应为 dict，实际为 {type(data).__name__}")
+    missing = payload_type.__required_keys__ - data.keys()
+    if missing:
+        raise TypeError(f"事件 {getattr(event, 'value', event)} 的载荷缺少字段: {sorted(missing)}")
+
+
+bus = EventBus()
@@ -0,0 +1,171 @@
+"""Prometheus 文本格式的指标导出（GET /metrics）。
+
+各模块在热路径上只做整数自增或 deque 追加（事件循环或单个线程写入，无需加锁），
+抓取时才读取这些计数器并格式化，音频 30ms 帧处理不承担任何额外开销。
+耗时类指标以 summary 导出（最近样本的 p50 / p95 / p99，单位秒）。
+
+    VAD        帧数、门限过滤帧数、提交 / 丢弃的语音段
+    采集       环形缓冲溢出、采集停顿
+    ASR        待推理队列深度、推理耗时
+    LLM        请求、错误、超时、输出 token 与吞吐
+    TTS        会话数、收到的音频字节、预热池命中、播放 underrun
+    WebSocket  客户端数、单条消息发送耗时、队列深度与丢弃 / 合并 / 断开计数
+    其他       事件循环延迟、事件总线发布 / 丢弃数、每轮各阶段延迟（见 core.tracing）
+"""
+from __future__ import annotations
+
+import asyncio
+
+from core.tracing import LatencyHistogram
+
+_PREFIX = "livebot_"
+_QUANTILES = (0.5, 0.95, 0.99)
+# 事件循环延迟的采样间隔
+_LAG_INTERVAL_S = 0.1
+
+
+class LoopLagMonitor:
+    """周期性 sleep，实际唤醒时刻与预期之差即事件循环被阻塞的时长。"""
+
+    def __init__(self, interval_s: float = _LAG_INTERVAL_S):
+        self.interval_s = interval_s
+        self.lag_ms = LatencyHistogram()
+        self.max_ms = 0.0
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval_s
+            await asyncio.sleep(self.interval_s)
+            lag = max(0.0, (loop.time() - expected) * 1000)
+            self.lag_ms.add(lag)
+            if lag > self.max_ms:
+                self.max_ms = lag
+
+
+loop_lag = LoopLagMonitor()
+
+
+class _Exposition:
+    """按 Prometheus 文本格式逐条写入样本；同名指标的 HELP / TYPE 只写一次。"""
+
+    def __init__(self):
+        self._lines: list[str] = []
+        self._declared: set[str] = set()
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._declared:
+            self._declared.add(name)
+            self._lines.append(f"# HELP {name} {help_text}")
+            self._lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, kind: str, help_text: str, value, **labels) -> None:
+        if value is None:
+            return
+        name = _PREFIX + name
+        self._declare(name, kind, help_text)
+        self._lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def summary(self, name: str, help_text: str, hist: LatencyHistogram, **labels) -> None:
+        """毫秒直方图按秒导出为 summary。"""
+        name = _PREFIX + name
+        self._declare(name, "summary", help_text)
+        for q, v in zip(_QUANTILES, hist.quantiles(_QUANTILES)):
+            if v is not None:
+                self._lines.append(f"{name}{_labels({**labels, 'quantile': q})} {_number(v / 1000)}")
+        self._lines.append(f"{name}_sum{_labels(labels)} {_number(hist.total_ms / 1000)}")
+        self._lines.append(f"{name}_count{_labels(labels)} {hist.count}")
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(round(float(value), 6))
+
+
+def render(bot) -> str:
+    """汇总 bot 各模块的计数器；未启动的模块跳过。"""
+    from api import ws_live2d
+    from core.event_bus import bus
+    from core.tracing import tracer
+
+    out = _Exposition()
+    mic = getattr(bot, "mic", None)
+    vad = getattr(mic, "vad", None)
+    if vad is not None:
+        out.sample("vad_frames_total", "counter", "VAD 处理的音频帧数", vad.frames)
+        out.sample("vad_gated_frames_total", "counter", "被能量门限直接判为静音的帧数", vad.gated_frames)
+        out.sample("vad_segments_total", "counter", "VAD 语音段数", vad.segments, outcome="committed")
+        out.sample("vad_segments_total", "counter", "VAD 语音段数", vad.discarded_segments, outcome="discarded")
+    if mic is not None:
+        capture = mic.stats()
+        out.sample("capture_overruns_total", "counter", "采集缓冲溢出（丢帧）次数", capture["overruns"])
+        out.sample("capture_underruns_total", "counter", "采集停顿次数", capture["underruns"])
+
+    asr = getattr(bot, "asr", None)
+    if asr is not None and hasattr(asr, "queue_depth"):
+        out.sample("asr_queue_depth", "gauge", "等待推理的语音段数", asr.queue_depth)
+        out.summary("asr_inference_seconds", "ASR 推理耗时", asr.inference_ms)
+
+    llm = getattr(bot, "llm", None)
+    if llm is not None and hasattr(llm, "stats"):
+        out.sample("llm_healthy", "gauge", "LLM Gateway 是否可用", llm.healthy)
+        out.sample("llm_requests_total", "counter", "LLM 流式请求数", llm.requests)
+        out.sample("llm_errors_total", "counter", "LLM 请求失败数（连接失败、错误状态码等）", llm.errors)
+        out.sample("llm_timeouts_total", "counter", "LLM 请求超时数", llm.timeouts)
+        out.sample("llm_output_tokens_total", "counter", "LLM 流式输出的估算 token 数", llm.output_tokens)
+        out.sample("llm_stream_seconds_total", "counter", "LLM 首 token 到流结束的累计时长", llm.stream_seconds)
+        out.sample("llm_tokens_per_second", "gauge", "最近一轮的输出吞吐", llm.last_tokens_per_s)
+        if getattr(llm, "cache", None) is not None:
+            out.sample("llm_cache_lookups_total", "counter", "回复缓存查询数", llm.cache.hits, result="hit")
+            out.sample("llm_cache_lookups_total", "counter", "回复缓存查询数", llm.cache.misses, result="miss")
+
+    tts = getattr(bot, "tts", None)
+    if tts is not None:
+        out.sample("tts_sessions_total", "counter", "用于合成的 TTS 会话数", tts.sessions)
+        out.sample("tts_received_bytes_total", "counter", "TTS 收到的 PCM 字节数", tts.bytes_received)
+        out.sample("playback_underruns_total", "counter", "流式播放中声道空转次数", tts.underruns)
+        scheduler = getattr(bot, "tts_scheduler", None)
+        if scheduler is not None:
+            out.sample("tts_dropped_sentences_total", "counter", "待合成队列满而丢弃的句子数", scheduler.dropped)
+        if tts.pool is not None:
+            out.sample("tts_pool_acquire_total", "counter", "TTS 预热池取用次数", tts.pool.hits, result="hit")
+            out.sample("tts_pool_acquire_total", "counter", "TTS 预热池取用次数", tts.pool.misses, result="miss")
+
+    out.sample("ws_clients", "gauge", "已连接的 Live2D WebSocket 客户端数", ws_live2d.client_count())
+    out.summary("ws_send_seconds", "单条 WebSocket 消息的发送耗时", ws_live2d.send_ms)
+    ws = ws_live2d.stats()
+    out.sample("ws_max_queue_depth", "gauge", "各客户端待发送队列的最大深度", ws["max_queue_depth"])
+    out.sample("ws_coalesced_total", "counter", "排队期间被同类新消息替代的消息数", ws["coalesced"])
+    out.sample("ws_dropped_total", "counter", "客户端队列满而丢弃的口型 / 增量识别 / 日志消息数", ws["dropped"])
+    out.sample("ws_kicked_total", "counter", "因发送卡死或队列积压被断开的客户端数", ws["kicked"])
+    out.sample("ws_llm_deltas_total", "counter", "待推送的 LLM 文本 delta 数", ws["llm_deltas"])
+    out.sample("ws_llm_chunk_messages_total", "counter", "合并后实际推送的 llm_chunk 消息数", ws["llm_chunk_messages"])
+
+    out.summary("event_loop_lag_seconds", "事件循环延迟（定时唤醒的迟到时长）", loop_lag.lag_ms)
+    out.sample("event_loop_lag_max_seconds", "gauge", "事件循环延迟的最大值", loop_lag.max_ms / 1000)
+
+    events = bus.stats()
+    for event, info in events.items():
+        out.sample("events_emitted_total", "counter", "事件总线发布次数", info["emitted"], event=event)
+    for event, info in events.items():
+        dropped = sum(s["dropped"] for s in info["subscribers"])
+        out.sample("event_dropped_total", "counter", "处理函数积压而丢弃的事件数", dropped, event=event)
+
+    out.sample("turns_total", "counter", "已结算的对话轮次", tracer.completed, outcome="completed")
+    out.sample("turns_total", "counter", "已结算的对话轮次", tracer.incomplete, outcome="incomplete")
+    for stage, hist in tracer.since_start.items():
+        out.summary("turn_stage_seconds", "每轮各阶段相对本轮开始的耗时", hist, stage=stage)
+    return out.render()
@@ -0,0 +1,194 @@
+"""每轮对话的端到端延迟追踪。
+
+一轮对话从麦克风提交语音段（MIC_VAD）或 /api/chat/send 开始，分配 trace id，
+随事件载荷的 "trace" 字段依次传给 ASR、LLM、TTS 调度器与播放线程，各环节用
+time.monotonic() 记录到达时刻：
+
+    start → asr_result → llm_first_token → llm_first_sentence → tts_first_frame
+          → playback_started → playback_done
+
+- 各阶段只记录首次到达（playback_done 为最后一句播完）；一轮回复的所有句子都播完
+  （或确认无音频）且 LLM 已结束时结算，记入各阶段直方图
+- 被打断等未走完的轮次在超时后结算，只记录已到达的阶段
+- 直方图保存相对本轮开始的耗时与相对上一阶段的耗时，经 /api/metrics/latency 查询分位数
+- 配置了 server.latency_trace_file 时，每轮结算后追加一行 JSON，供离线分析
+"""
+from __future__ import annotations
+
+import itertools
+import json
+import time
+from collections import deque
+from pathlib import Path
+
+from loguru import logger
+
+STAGES = (
+    "asr_result",
+    "llm_first_token",
+    "llm_first_sentence",
+    "tts_first_frame",
+    "playback_started",
+    "playback_done",
+)
+
+# 计算分位数所用的最近样本数
+_WINDOW = 1000
+# 未走完的轮次超过此时长即结算
+_TRACE_TTL_S = 60.0
+# 同时追踪的轮次上限，超出时结算最早的轮次
+_MAX_OPEN = 32
+
+
+class LatencyHistogram:
+    """单个阶段的耗时分布：累计次数 / 总和，以及最近 _WINDOW 个样本的分位数。"""
+
+    def __init__(self):
+        self.samples: deque[float] = deque(maxlen=_WINDOW)
+        self.count = 0
+        self.total_ms = 0.0
+
+    def add(self, ms: float) -> None:
+        self.samples.append(ms)
+        self.count += 1
+        self.total_ms += ms
+
+    def quantiles(self, qs: tuple[float, ...]) -> list[float | None]:
+        """最近样本的分位数（q 取 0~1），无样本时为 None。"""
+        s = sorted(self.samples)
+        return [s[min(len(s) - 1, int(len(s) * q))] if s else None for q in qs]
+
+    def stats(self) -> dict:
+        p50, p95, p99 = (round(v, 1) if v is not None else None for v in self.quantiles((0.5, 0.95, 0.99)))
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 1) if self.count else None,
+            "p50_ms": p50,
+            "p95_ms": p95,
+            "p99_ms": p99,
+        }
+
+
+class _Trace:
+    def __init__(self, trace_id: str, source: str, started: float):
+        self.id = trace_id
+        self.source = source
+        self.started = started
+        self.wall_started = time.time()
+        self.stages: dict[str, float] = {}
+        self.sentences = 0        # LLM 发出的句子数
+        self.sentences_done = 0   # 已播完 / 确认无音频的句子数
+        self.llm_done = False
+
+
+class TurnTracer:
+    """trace 的创建、打点与结算。仅在事件循环线程中调用（播放线程经 call_soon_threadsafe 转入）。"""
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+        self._open: dict[str, _Trace] = {}
+        self.since_start = {stage: LatencyHistogram() for stage in STAGES}
+        self.step = {stage: LatencyHistogram() for stage in STAGES}
+        self.completed = 0
+        self.incomplete = 0
+        self._dump_path: Path | None = None
+
+    def configure(self, dump_path: str) -> None:
+        self._dump_path = Path(dump_path).expanduser() if dump_path else None
+
+    def start(self, source: str, at: float | None = None) -> str:
+        """开始一轮对话，返回 trace id；at 为开始时刻（monotonic 秒），默认为当前。"""
+        now = time.monotonic()
+        for trace in [t for t in self._open.values() if now - t.started > _TRACE_TTL_S]:
+            self._finish(trace, complete=False)
+        while len(self._open) >= _MAX_OPEN:
+            self._finish(next(iter(self._open.values())), complete=False)
+        trace_id = f"{source}-{next(self._ids)}"
+        self._open[trace_id] = _Trace(trace_id, source, now if at is None else at)
+        return trace_id
+
+    def discard(self, trace_id: str | None) -> None:
+        """放弃一轮（如语音段没有识别出有效文本），不计入统计。"""
+        if trace_id:
+            self._open.pop(trace_id, None)
+
+    def mark(self, trace_id: str | None, stage: str, at: float | None = None) -> None:
+        """记录某阶段首次到达的时刻；trace 为 None 或已结算时忽略。"""
+        trace = self._open.get(trace_id) if trace_id else None
+        if trace is not None and stage not in trace.stages:
+            trace.stages[stage] = time.monotonic() if at is None else at
+
+    def sentence(self, trace_id: str | None) -> None:
+        """LLM 发出一句。"""
+        trace = self._open.get(trace_id) if trace_id else None
+        if trace is not None:
+            trace.sentences += 1
+            self.mark(trace_id, "llm_first_sentence")
+
+    def sentence_done(self, trace_id: str | None, played: bool = False, at: float | None = None) -> None:
+        """一句播完（played=True）或确认没有音频（合成失败 / TTS 关闭）。"""
+        trace = self._open.get(trace_id) if trace_id else None
+        if trace is None:
+            return
+        trace.sentences_done += 1
+        if played:
+            trace.stages["playback_done"] = time.monotonic() if at is None else at
+        self._maybe_finish(trace)
+
+    def llm_done(self, trace_id: str | None) -> None:
+        trace = self._open.get(trace_id) if trace_id else None
+        if trace is not None:
+            trace.llm_done = True
+            self._maybe_finish(trace)
+
+    def stats(self) -> dict:
+        return {
+            "completed": self.completed,
+            "incomplete": self.incomplete,
+            "open": len(self._open),
+            "since_start": {stage: h.stats() for stage, h in self.since_start.items()},
+            "step": {stage: h.stats() for stage, h in self.step.items()},
+        }
+
+    def _maybe_finish(self, trace: _Trace) -> None:
+        if trace.llm_done and trace.sentences_done >= trace.sentences:
+            self._finish(trace, complete=True)
+
+    def _finish(self, trace: _Trace, complete: bool) -> None:
+        self._open.pop(trace.id, None)
+        if complete:
+            self.completed += 1
+        else:
+            self.incomplete += 1
+        offsets = {
+            stage: round((trace.stages[stage] - trace.started) * 1000, 1)
+            for stage in STAGES if stage in trace.stages
+        }
+        previous = 0.0
+        for stage, ms in offsets.items():
+            self.since_start[stage].add(ms)
+            self.step[stage].add(ms - previous)
+            previous = ms
+        if complete:
+            logger.debug(f"[延迟] {trace.id} " + " ".join(f"{s}={ms:.0f}ms" for s, ms in offsets.items()))
+        if self._dump_path is not None:
+            self._dump(trace, offsets, complete)
+
+    def _dump(self, trace: _Trace, offsets: dict[str, float], complete: bool) -> None:
+        record = {
+            "trace": trace.id,
+            "source": trace.source,
+            "started_at": round(trace.wall_started, 3),
+            "complete": complete,
+            "sentences": trace.sentences,
+            "stages_ms": offsets,
+        }
+        try:
+            with self._dump_path.open("a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logger.warning(f"写入延迟追踪文件失败（{self._dump_path}）: {e}")
+            self._dump_path = None
+
+
+tracer = TurnTracer()
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+
+class FrameRing:
+    """单生产者 / 单消费者的无锁 PCM 环形缓冲。
+
+    底层为预分配的 bytearray，写指针只由采集线程推进，读指针只由事件循环推进；
+    两个指针单调递增，取模得到实际偏移。先拷贝数据、后推进指针，
+    对方看到新指针时数据已就绪，因此无需加锁（依赖 GIL 保证整数赋值的原子性）。
+
+    缓冲写满时丢弃新到的数据并计入 overruns，已缓冲的数据保持完整。
+    """
+
+    def __init__(self, frame_bytes: int, capacity_frames: int):
+        self.frame_bytes = frame_bytes
+        self.capacity = frame_bytes * max(2, capacity_frames)
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._write = 0  # 仅生产者修改
+        self._read = 0   # 仅消费者修改
+        self.overruns = 0
+
+    @property
+    def available(self) -> int:
+        """可读的完整帧数。"""
+        return (self._write - self._read) // self.frame_bytes
+
+    def write(self, data: bytes) -> bool:
+        """生产者侧：追加 PCM，空间不足时整体丢弃并返回 False。"""
+        n = len(data)
+        if n > self.capacity - (self._write - self._read):
+            self.overruns += 1
+            return False
+        start = self._write % self.capacity
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < n:
+            self._view[:n - first] = data[first:]
+        self._write += n
+        return True
+
+    def read_frames(self, max_frames: int | None = None) -> list[bytes]:
+        """消费者侧：批量取出完整帧（每帧拷贝为独立的 bytes）。"""
+        count = self.available
+        if max_frames is not None:
+            count = min(count, max_frames)
+        frames = []
+        size = self.frame_bytes
+        for _ in range(count):
+            start = self._read % self.capacity
+            end = start + size
+            if end <= self.capacity:
+                frames.append(self._view[start:end].tobytes())
+            else:
+                frames.append(self._view[start:].tobytes() + self._view[:end - self.capacity].tobytes())
+            self._read += size
+        return frames
+
+    def clear(self) -> None:
+        """消费者侧：丢弃全部未读数据。"""
+        self._read = self._write
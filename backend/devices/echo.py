@@ -0,0 +1,213 @@
+"""回声门控：扬声器外放时，防止机器人听到自己的声音后触发 VAD / 打断自己。
+
+TTS 播放线程把送进声卡的 PCM 连同预计播放时刻写入 playback_reference；
+麦克风每帧与对应时间段（考虑声学与设备延迟，最长 echo_max_delay_ms）的参考信号
+做归一化互相关：
+
+- 相关度高 → 该帧以回声为主，用于学习回声增益（麦克风 RMS / 参考 RMS）
+- 麦克风能量不超过 预计回声 × echo_barge_in_ratio → 判为回声，VAD 按静音处理
+- 用户真正插话时能量明显高于回声、相关度下降，照常进入 VAD
+
+离线验证（在 backend 目录下）：
+    python -m devices.echo <mic.wav> <tts.wav> [--delay-ms 120] [--gain 0.4]
+把 TTS 录音按给定延迟与增益混入麦克风录音，分别在有无门控时回放 VAD，比较提交的语音段。
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from config import ASRConfig
+
+SAMPLE_RATE = 16000
+FRAME_SAMPLES = 480
+# 参考信号保留时长（s），需覆盖最大回声延迟
+_HISTORY_S = 2.0
+# 回声增益的平滑系数
+_GAIN_ALPHA = 0.2
+# 参考信号 RMS 低于此值视为未在播放
+_REF_SILENCE_RMS = 30.0
+
+
+class EchoReference:
+    """播放参考信号：播放线程写入，麦克风侧按时间段读取。统一重采样到 16kHz。"""
+
+    def __init__(self):
+        self._blocks: deque[tuple[float, np.ndarray]] = deque()  # (开始播放时刻, float32 采样)
+        self._clock_end = 0.0
+        self._lock = threading.Lock()
+
+    def push(self, pcm: bytes | memoryview, sample_rate: int, now: float | None = None) -> None:
+        """记录一段即将播放的 PCM；紧接在已排队音频之后播放，声道空闲时从当前时刻开始。"""
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+        if sample_rate != SAMPLE_RATE:
+            n = len(samples) * SAMPLE_RATE // sample_rate
+            samples = np.interp(np.arange(n) * sample_rate / SAMPLE_RATE, np.arange(len(samples)), samples)
+            samples = samples.astype(np.float32)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            start = max(now, self._clock_end)
+            self._blocks.append((start, samples))
+            self._clock_end = start + len(samples) / SAMPLE_RATE
+            while self._blocks and self._blocks[0][0] + len(self._blocks[0][1]) / SAMPLE_RATE < now - _HISTORY_S:
+                self._blocks.popleft()
+
+    def stop(self, now: float | None = None) -> None:
+        """播放被打断：丢弃尚未播出的部分。"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            while self._blocks and self._blocks[-1][0] >= now:
+                self._blocks.pop()
+            if self._blocks:
+                start, samples = self._blocks[-1]
+                played = int((now - start) * SAMPLE_RATE)
+                if played < len(samples):
+                    self._blocks[-1] = (start, samples[:played])
+            self._clock_end = now
+
+    def window(self, start: float, end: float) -> np.ndarray | None:
+        """返回 [start, end) 时间段的参考信号，该段内没有任何播放时返回 None。"""
+        n = int((end - start) * SAMPLE_RATE)
+        with self._lock:
+            if not self._blocks or self._clock_end <= start:
+                return None
+            out = None
+            for block_start, samples in self._blocks:
+                offset = int(round((block_start - start) * SAMPLE_RATE))
+                lo, hi = max(offset, 0), min(offset + len(samples), n)
+                if lo >= hi:
+                    continue
+                if out is None:
+                    out = np.zeros(n, dtype=np.float32)
+                out[lo:hi] = samples[lo - offset:hi - offset]
+        return out
+
+
+# TTS 播放线程与麦克风共享的参考信号
+playback_reference = EchoReference()
+
+
+class EchoGate:
+    """逐帧判断麦克风输入是否只是扬声器回声。"""
+
+    def __init__(self, config: ASRConfig, reference: EchoReference = playback_reference):
+        self.config = config
+        self.reference = reference
+        self.gain: float | None = None  # 学习到的回声增益（麦克风 RMS / 参考 RMS）
+        self.active_frames = 0          # 播放期间处理的帧数
+        self.suppressed_frames = 0
+        self.barge_in_frames = 0
+
+    def stats(self) -> dict:
+        return {
+            "gain": round(self.gain, 3) if self.gain is not None else None,
+            "active_frames": self.active_frames,
+            "suppressed_frames": self.suppressed_frames,
+            "barge_in_frames": self.barge_in_frames,
+        }
+
+    def is_echo(self, frame: bytes, frame_end: float) -> bool:
+        """frame_end 为该帧最后一个采样的采集时刻（time.monotonic）。"""
+        max_delay = self.config.echo_max_delay_ms / 1000
+        frame_start = frame_end - FRAME_SAMPLES / SAMPLE_RATE
+        ref = self.reference.window(frame_start - max_delay, frame_end)
+        if ref is None:
+            return False
+        mic = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
+        corr, echo_rms = _best_alignment(ref, mic)
+        if echo_rms < _REF_SILENCE_RMS:
+            return False
+        self.active_frames += 1
+        mic_rms = math.sqrt(float(mic @ mic) / len(mic))
+
+        correlated = corr >= self.config.echo_correlation
+        if self.gain is None:
+            echo = correlated
+        else:
+            echo = mic_rms <= self.gain * echo_rms * self.config.echo_barge_in_ratio
+        if echo and correlated:
+            # 只用判定为回声的帧更新增益，插话期间不会把增益越学越高
+            ratio = mic_rms / echo_rms
+            self.gain = ratio if self.gain is None else self.gain + _GAIN_ALPHA * (ratio - self.gain)
+        if echo:
+            self.suppressed_frames += 1
+        else:
+            self.barge_in_frames += 1
+        return echo
+
+
+def _best_alignment(ref: np.ndarray, mic: np.ndarray) -> tuple[float, float]:
+    """在参考信号中寻找与麦克风帧最相似的位置，返回 (|归一化互相关|, 该位置参考段 RMS)。"""
+    m = len(mic)
+    lags = len(ref) - m + 1
+    if lags <= 0:
+        return 0.0, 0.0
+    n = 1 << (len(ref) + m - 1).bit_length()
+    corr = np.fft.irfft(np.fft.rfft(ref, n) * np.conj(np.fft.rfft(mic, n)), n)[:lags]
+    cumsum = np.concatenate(([0.0], np.cumsum(ref.astype(np.float64) ** 2)))
+    seg_energy = cumsum[m:] - cumsum[:lags]
+    mic_energy = float(mic @ mic)
+    ncc = np.abs(corr) / np.sqrt(seg_energy * mic_energy + 1e-9)
+    best = int(np.argmax(ncc))
+    return float(ncc[best]), math.sqrt(max(seg_energy[best], 0.0) / m)
+
+
+# ── 离线验证 ─────────────────────────────────────────────────────────────────
+
+def simulate(mic_pcm: bytes, tts_pcm: bytes, delay_ms: int, gain: float, config: ASRConfig) -> dict:
+    """把 TTS 音频按延迟与增益混入麦克风录音（t=0 开始播放），分别在有无门控时回放 VAD。"""
+    from pipeline.asr.vad import VADProcessor
+
+    mic = np.frombuffer(mic_pcm, dtype=np.int16).astype(np.float32)
+    tts = np.frombuffer(tts_pcm, dtype=np.int16).astype(np.float32)
+    delay = delay_ms * SAMPLE_RATE // 1000
+    n = max(len(mic), len(tts) + delay)
+    mixed = np.zeros(n, dtype=np.float32)
+    mixed[:len(mic)] += mic
+    mixed[delay:delay + len(tts)] += tts * gain
+    mixed = np.clip(mixed, -32768, 32767).astype(np.int16).tobytes()
+
+    reference = EchoReference()
+    reference.push(tts_pcm, SAMPLE_RATE, now=0.0)
+    gate = EchoGate(config, reference)
+    result = {}
+    for label, use_gate in (("without_gate", False), ("with_gate", True)):
+        vad = VADProcessor(config)
+        segments = []
+        for i in range(0, len(mixed) - FRAME_SAMPLES * 2 + 1, FRAME_SAMPLES * 2):
+            frame = mixed[i:i + FRAME_SAMPLES * 2]
+            end = (i // 2 + FRAME_SAMPLES) / SAMPLE_RATE
+            suppress = use_gate and gate.is_echo(frame, end)
+            if vad.process(frame, suppress=suppress) is not None and vad.last_segment.get("final"):
+                segments.append(round(end, 2))
+        result[label] = segments
+    result["gate"] = gate.stats()
+    return result
+
+
+def main() -> None:
+    from pathlib import Path
+    from pipeline.asr.benchmark import load_wav
+
+    parser = argparse.ArgumentParser(description="离线验证回声门控：混入 TTS 录音后比较 VAD 提交的语音段")
+    parser.add_argument("mic", type=Path, help="麦克风录音（16kHz 单声道 WAV，可为空房间或含插话）")
+    parser.add_argument("tts", type=Path, help="TTS 输出录音（16kHz 单声道 WAV）")
+    parser.add_argument("--delay-ms", type=int, default=120, help="模拟的回声延迟")
+    parser.add_argument("--gain", type=float, default=0.4, help="模拟的回声增益")
+    args = parser.parse_args()
+
+    from config import get_config
+    config = get_config().asr.model_copy(update={"echo_suppression": True})
+    r = simulate(load_wav(args.mic), load_wav(args.tts), args.delay_ms, args.gain, config)
+    print(f"无门控提交 {len(r['without_gate'])} 段，结束于 {r['without_gate']} s")
+    print(f"有门控提交 {len(r['with_gate'])} 段，结束于 {r['with_gate']} s")
+    print(f"门控统计: {r['gate']}")
+
+
+if __name__ == "__main__":
+    main()
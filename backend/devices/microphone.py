@@ -1,22 +1,56 @@
 from __future__ import annotations
 
 import asyncio
+import time
 from loguru import logger
 
 from config import ASRConfig
 from core.event_bus import bus, Event
+from core.tracing import tracer
+from devices.audio_ring import FrameRing
+from devices.echo import EchoGate
 
 SAMPLE_RATE = 16000
 CHANNELS = 1
 SAMPLE_WIDTH = 2       # 16-bit
 FRAME_DURATION_MS = 30 # webrtcvad 要求 10/20/30ms
 FRAME_SIZE = int(SAMPLE_RATE * FRAME_DURATION_MS / 1000)  # 480 samples
+FRAME_BYTES = FRAME_SIZE * SAMPLE_WIDTH
+# 连续这么多帧时长没有新数据即视为采集停顿（计一次 underrun）
+_STALL_FRAMES = 3
 
 
 class MicrophoneDevice:
+    """麦克风采集：PortAudio 回调线程把 PCM 写入预分配的环形缓冲，事件循环批量取帧做 VAD。
+
+    回调只做一次内存拷贝，不经过线程池，ASR 占满默认线程池时采集也不受影响；
+    事件循环空闲等待时才由回调唤醒，繁忙时帧在环中积累，下次一并处理。
+    """
+
     def __init__(self, config: ASRConfig):
         self.config = config
         self._running = False
+        self._ring: FrameRing | None = None
+        self._wake: asyncio.Event | None = None
+        self._waiting = False
+        self.input_overflows = 0   # PortAudio 报告的输入溢出（驱动层丢帧）
+        self.underruns = 0         # 采集停顿：超过 _STALL_FRAMES 帧时长未收到数据
+        self.frames = 0            # 已处理帧数
+        self.max_batch = 0         # 单次取出的最大帧数（反映事件循环的积压）
+        self.echo: EchoGate | None = None
+
+    def stats(self) -> dict:
+        ring = self._ring
+        return {
+            "frames": self.frames,
+            "overruns": (ring.overruns if ring else 0) + self.input_overflows,
+            "ring_overruns": ring.overruns if ring else 0,
+            "input_overflows": self.input_overflows,
+            "underruns": self.underruns,
+            "buffered_frames": ring.available if ring else 0,
+            "max_batch": self.max_batch,
+            "echo": self.echo.stats() if self.echo else None,
+        }
 
     async def start(self):
         import pyaudio
@@ -24,44 +58,87 @@ class MicrophoneDevice:
 
         pa = pyaudio.PyAudio()
         device_index = self.config.microphone_device_index
+        loop = asyncio.get_event_loop()
+        self._ring = ring = FrameRing(
+            FRAME_BYTES, max(1, self.config.capture_buffer_ms // FRAME_DURATION_MS)
+        )
+        self._wake = asyncio.Event()
+        self._waiting = False
 
+        def on_audio(in_data, frame_count, time_info, status):
+            # PortAudio 回调线程：只拷贝进环，必要时唤醒事件循环
+            if status & pyaudio.paInputOverflow:
+                self.input_overflows += 1
+            ring.write(in_data)
+            if self._waiting:
+                self._waiting = False
+                loop.call_soon_threadsafe(self._wake.set)
+            return None, pyaudio.paContinue
+
+        options = dict(
+            rate=SAMPLE_RATE,
+            channels=CHANNELS,
+            format=pyaudio.paInt16,
+            input=True,
+            frames_per_buffer=FRAME_SIZE,
+            stream_callback=on_audio,
+        )
         try:
-            stream = pa.open(
-                rate=SAMPLE_RATE,
-                channels=CHANNELS,
-                format=pyaudio.paInt16,
-                input=True,
-                input_device_index=device_index,
-                frames_per_buffer=FRAME_SIZE,
-            )
+            stream = pa.open(input_device_index=device_index, **options)
         except OSError as e:
             logger.warning(f"指定麦克风设备不可用（{e}），回退到默认设备")
-            stream = pa.open(
-                rate=SAMPLE_RATE,
-                channels=CHANNELS,
-                format=pyaudio.paInt16,
-                input=True,
-                frames_per_buffer=FRAME_SIZE,
-            )
+            stream = pa.open(**options)
 
         self.vad = VADProcessor(self.config)
+        self.echo = EchoGate(self.config)
         self._running = True
+        stream.start_stream()
         logger.info("麦克风采集已启动")
 
-        loop = asyncio.get_event_loop()
+        stall_timeout = _STALL_FRAMES * FRAME_DURATION_MS / 1000
         try:
             while self._running:
-                frame = await loop.run_in_executor(
-                    None, lambda: stream.read(FRAME_SIZE, exception_on_overflow=False)
-                )
-                result = self.vad.process(frame)
-                if result is not None:
-                    # VAD 返回完整语音段，触发 ASR
-                    bus.emit(Event.MIC_VAD, {"pcm": result})
+                frames = ring.read_frames()
+                if not frames:
+                    self._wake.clear()
+                    self._waiting = True
+                    if ring.available:  # 置标志前回调已写入
+                        self._waiting = False
+                        continue
+                    try:
+                        await asyncio.wait_for(self._wake.wait(), timeout=stall_timeout)
+                    except asyncio.TimeoutError:
+                        if self._running:
+                            self.underruns += 1
+                    continue
+                self.frames += len(frames)
+                self.max_batch = max(self.max_batch, len(frames))
+                # 按环中剩余数据反推每帧的采集时刻，供回声门控对齐参考信号
+                end = time.monotonic() - ring.available * FRAME_DURATION_MS / 1000
+                for i, frame in enumerate(frames):
+                    self._process(frame, end - (len(frames) - 1 - i) * FRAME_DURATION_MS / 1000)
         finally:
+            self._waiting = False
             stream.stop_stream()
             stream.close()
             pa.terminate()
 
+    def _process(self, frame: bytes, frame_end: float) -> None:
+        echo = self.config.echo_suppression and self.echo.is_echo(frame, frame_end)
+        result = self.vad.process(frame, suppress=echo)
+        if result is not None:
+            # VAD 返回完整语音段，触发 ASR；段结束（非分块）时开始一轮延迟追踪
+            data = {"pcm": result, **self.vad.last_segment}
+            if data.get("final", True):
+                data["trace"] = tracer.start("mic", at=frame_end)
+            bus.emit(Event.MIC_VAD, data)
+        elif self.config.partial_interval_ms > 0:
+            # 语音进行中：定期提交缓冲快照做增量识别
+            partial = self.vad.poll_partial(self.config.partial_interval_ms // FRAME_DURATION_MS)
+            if partial is not None:
+                bus.emit(Event.MIC_PARTIAL, partial)
+
     def stop(self):
         self._running = False
+        if self._wake is not None:
+            self._wake.set()
@@ -32,11 +32,13 @@ from api.ws_live2d import router as ws_router, log_sink
 from api.config_api import router as config_router
 from api.models_api import router as models_router
 from api.chat_api import router as chat_router
+from api.metrics_api import router as metrics_router
 
 app.include_router(ws_router)
 app.include_router(config_router)
 app.include_router(models_router)
 app.include_router(chat_router)
+app.include_router(metrics_router)
 
 # Live2D 模型静态文件
 models_dir = Path(__file__).parent.parent / "models"
@@ -0,0 +1,18 @@
+from config import ASRConfig
+
+
+def create_asr_engine(config: ASRConfig):
+    """根据配置创建 ASR 引擎实例：process_workers > 0 时在独立进程中推理。"""
+    if config.process_workers > 0:
+        from pipeline.asr.worker_pool import ProcessASR
+        return ProcessASR(config)
+    return create_local_engine(config)
+
+
+def create_local_engine(config: ASRConfig):
+    """创建进程内推理引擎：按 config.engine 选择 torch 或 ONNX Runtime 后端。"""
+    if config.engine == "onnx":
+        from pipeline.asr.sensevoice_onnx import SenseVoiceOnnxASR
+        return SenseVoiceOnnxASR(config)
+    from pipeline.asr.sensevoice import SenseVoiceASR
+    return SenseVoiceASR(config)
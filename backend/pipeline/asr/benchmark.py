@@ -0,0 +1,171 @@
+"""ASR 推理后端基准：在固定的本地 WAV 语料上比较各后端的实时率（RTF）与内存占用。
+
+用法（在 backend 目录下）：
+    python -m pipeline.asr.benchmark <wav目录> [--engines torch onnx] [--threads 4] [--inputs array file]
+                                     [--batch-sizes 1 2 4 8]
+
+语料须为 16kHz 单声道 16-bit WAV。每个后端在独立子进程中运行，内存峰值互不干扰；
+RTF = 推理总耗时 / 音频总时长（不含模型加载），越小越快。
+--inputs 指定音频交给模型的方式：array 为内存中的 float32 波形，file 为逐段写临时 WAV 文件，
+同时给出两者即可比较内存直传省下的编码、写盘与解码开销。
+--batch-sizes 按给定的每批段数把语料分组，经微批接口推理，比较吞吐（RTF）与每批耗时
+（同批各段的结果同时返回，每批耗时即其中每段的识别延迟）。
+"""
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import resource
+import time
+import wave
+from pathlib import Path
+
+from config import ASRConfig
+
+SAMPLE_RATE = 16000
+
+
+def load_wav(path: Path) -> bytes:
+    """读取 16kHz 单声道 16-bit WAV 的 PCM。"""
+    with wave.open(str(path), "rb") as wf:
+        if (wf.getframerate(), wf.getnchannels(), wf.getsampwidth()) != (SAMPLE_RATE, 1, 2):
+            raise ValueError(f"{path.name}: 需要 16kHz 单声道 16-bit WAV")
+        return wf.readframes(wf.getnframes())
+
+
+def load_corpus(directory: Path) -> list[tuple[str, bytes]]:
+    """按文件名顺序读取语料，返回 [(文件名, PCM)]。"""
+    corpus = [(path.name, load_wav(path)) for path in sorted(directory.glob("*.wav"))]
+    if not corpus:
+        raise ValueError(f"{directory} 下没有 WAV 文件")
+    return corpus
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux 下单位为 KB
+
+
+def _run_engine(config_data: dict, directory: str, array_input: bool, batch_sizes: list[int], conn) -> None:
+    """子进程入口：加载模型、预热一次，再逐条推理整个语料；给出 batch_sizes 时再按各批大小推理一遍。"""
+    from pipeline.asr import create_local_engine
+
+    corpus = load_corpus(Path(directory))
+    asr = create_local_engine(ASRConfig.model_validate(config_data))
+    asr._array_input = array_input
+    t0 = time.perf_counter()
+    asr._load_model()
+    load_s = time.perf_counter() - t0
+    load_rss = _peak_rss_mb()
+    asr._transcribe_sync(corpus[0][1])  # 预热，排除首次推理的初始化开销
+
+    texts = {}
+    t0 = time.perf_counter()
+    for name, pcm in corpus:
+        texts[name] = asr._transcribe_sync(pcm)
+    infer_s = time.perf_counter() - t0
+    audio_s = sum(len(pcm) for _, pcm in corpus) / 2 / SAMPLE_RATE
+
+    batches = {}
+    for size in batch_sizes:
+        groups = [corpus[i:i + size] for i in range(0, len(corpus), size)]
+        outputs, elapsed = {}, []
+        for group in groups:
+            t0 = time.perf_counter()
+            results = asr._transcribe_batch_sync([pcm for _, pcm in group])
+            elapsed.append(time.perf_counter() - t0)
+            outputs.update(zip((name for name, _ in group), results))
+        batches[size] = {
+            "rtf": sum(elapsed) / audio_s,
+            "batch_ms": sum(elapsed) / len(elapsed) * 1000,
+            "mismatched": sum(outputs[name] != texts[name] for name in texts),
+        }
+
+    conn.send({
+        "load_s": load_s,
+        "infer_s": infer_s,
+        "audio_s": audio_s,
+        "rtf": infer_s / audio_s,
+        "load_rss_mb": load_rss,
+        "peak_rss_mb": _peak_rss_mb(),
+        "texts": texts,
+        "batches": batches,
+    })
+
+
+def run_benchmark(
+    directory: Path,
+    engines: list[str],
+    config: ASRConfig,
+    inputs: tuple[str, ...] = ("array",),
+    batch_sizes: tuple[int, ...] = (),
+) -> dict[str, dict]:
+    """依次在独立子进程中测量各后端与输入方式，返回 "engine/input" → 指标。"""
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for engine in engines:
+        for mode in inputs:
+            parent, child = ctx.Pipe()
+            data = config.model_copy(update={"engine": engine}).model_dump()
+            proc = ctx.Process(target=_run_engine, args=(data, str(directory), mode == "array", list(batch_sizes), child))
+            proc.start()
+            child.close()
+            key = f"{engine}/{mode}"
+            try:
+                results[key] = parent.recv()
+            except EOFError:
+                results[key] = {"error": f"子进程异常退出（exitcode={proc.exitcode}）"}
+            proc.join()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="比较 ASR 推理后端的 RTF 与内存占用")
+    parser.add_argument("corpus", type=Path, help="16kHz 单声道 WAV 语料目录")
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx"])
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--threads", type=int, default=4, help="ONNX Runtime 算子内线程数")
+    parser.add_argument("--no-quantize", action="store_true", help="ONNX 使用 fp32 模型")
+    parser.add_argument(
+        "--inputs", nargs="+", choices=["array", "file"], default=["array"],
+        help="音频输入方式：内存波形 / 临时 WAV 文件",
+    )
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[], help="微批推理的每批段数")
+    args = parser.parse_args()
+
+    config = ASRConfig(
+        device=args.device,
+        onnx_intra_op_threads=args.threads,
+        onnx_quantize=not args.no_quantize,
+        batch_max_size=max(args.batch_sizes, default=ASRConfig().batch_max_size),
+    )
+    results = run_benchmark(args.corpus, args.engines, config, tuple(args.inputs), tuple(args.batch_sizes))
+
+    print(f"{'engine':<12}{'RTF':>8}{'infer(s)':>10}{'audio(s)':>10}{'load(s)':>9}{'load RSS':>10}{'peak RSS':>10}")
+    for engine, r in results.items():
+        if "error" in r:
+            print(f"{engine:<12}{r['error']}")
+            continue
+        print(
+            f"{engine:<12}{r['rtf']:>8.4f}{r['infer_s']:>10.2f}{r['audio_s']:>10.1f}{r['load_s']:>9.1f}"
+            f"{r['load_rss_mb']:>8.0f}MB{r['peak_rss_mb']:>8.0f}MB"
+        )
+
+    if args.batch_sizes:
+        print(f"\n{'engine':<12}{'batch':>6}{'RTF':>8}{'ms/batch':>10}{'mismatch':>10}")
+        for engine, r in results.items():
+            for size, b in r.get("batches", {}).items():
+                print(f"{engine:<12}{size:>6}{b['rtf']:>8.4f}{b['batch_ms']:>10.1f}{b['mismatched']:>10}")
+
+    # 与第一组结果逐条比对文本和情感，量化后端、不同输入方式都须保持同样的输出
+    ok = [e for e in results if "error" not in results[e]]
+    if len(ok) > 1:
+        base = results[ok[0]]["texts"]
+        for engine in ok[1:]:
+            diff = [name for name, out in results[engine]["texts"].items() if out != base[name]]
+            print(f"{engine} 与 {ok[0]} 输出不一致：{len(diff)}/{len(base)} 条")
+            for name in diff:
+                print(f"  {name}: {tuple(base[name])} → {tuple(results[engine]['texts'][name])}")
+
+
+if __name__ == "__main__":
+    main()
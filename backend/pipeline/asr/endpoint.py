@@ -0,0 +1,170 @@
+"""自适应断句：根据已说内容的"完整度"动态决定静音超时。
+
+固定的 silence_duration_ms 让每轮对话都白等一整段静音。这里把它当作上限，
+按以下信号估计当前语音是否已经说完，越像说完，所需静音越短（不低于 endpoint_min_silence_ms）：
+
+- 能量衰减：句末音量通常逐渐回落；停顿前最后几帧仍接近平均音量时更像是句中换气
+- 语音长度：极短的语音（"嗯"、咳嗽）证据不足，不提前断句
+- 增量识别文本（endpoint_use_text，默认关闭）：SenseVoice 的结果经过 ITN，几乎每个增量结果
+  都以"。"结尾，句末标点并不说明话已说完。因此先去掉末尾标点，只把以连词 / 填充词结尾
+  （"然后"、"就是"、"呃"……）当作"还没说完"的证据；其余情况文本不提供信号，仍只看声学。
+  文本只会延长等待，不会让断句更早；误切率尚未连同文本一起评估，故默认不启用
+
+endpoint_aggressiveness 控制延迟与准确率的取舍：0 等价于固定超时，1 为最激进。
+
+回放评估（在 backend 目录下）：
+    python -m pipeline.asr.endpoint <wav目录> [--sweep 0.25 0.5 0.75 1.0]
+对每个 WAV 分别以固定超时和自适应断句回放 VAD，统计误切（固定超时下仍在同一段内，
+自适应却提前提交）次数与平均节省的断句延迟。只使用声学信号，不含增量识别文本。
+"""
+from __future__ import annotations
+
+import argparse
+from collections import deque
+from pathlib import Path
+
+from config import ASRConfig
+
+FRAME_DURATION_MS = 30
+# ITN 附加在增量识别文本末尾的标点，判断前去掉
+_TRAILING_PUNCT = "。！？!?.…，,、；;：: "
+# 以这些词结尾的增量文本视为话未说完（连词、填充词）；"的""啊"等也常作句末语气词，不列入
+_CONTINUATIONS = (
+    "然后", "但是", "可是", "所以", "因为", "而且", "还有", "就是", "那个", "这个", "如果", "或者",
+    "和", "跟", "呃",
+    " and", " but", " so", " because", " or", " the", " to", " um", " uh",
+)
+# 计算能量衰减时参考的尾部语音帧数
+_TAIL_FRAMES = 5
+# 语音长度达到此值（ms）后长度信号视为充分
+_FULL_LENGTH_MS = 1500
+# 短于此值（ms）的语音不提前断句
+_MIN_LENGTH_MS = 300
+
+
+class AdaptiveEndpointer:
+    """为单个语音段估计所需的静音帧数；由 VADProcessor 在每个语音帧 / 静音帧上调用。"""
+
+    def __init__(self, config: ASRConfig):
+        self.configure(config)
+        self._tail: deque[float] = deque(maxlen=_TAIL_FRAMES)
+        self.reset()
+
+    def configure(self, config: ASRConfig) -> None:
+        self.max_frames = config.silence_duration_ms // FRAME_DURATION_MS
+        self.min_frames = min(config.endpoint_min_silence_ms // FRAME_DURATION_MS, self.max_frames)
+        self.aggressiveness = min(max(config.endpoint_aggressiveness, 0.0), 1.0)
+        self.use_text = config.endpoint_use_text
+
+    def reset(self) -> None:
+        self._tail.clear()
+        self._energy_sum = 0.0
+        self._speech_frames = 0
+        self._text_complete: bool | None = None  # False 为增量文本显示话未说完，None 为没有文本信号
+
+    def on_speech(self, energy: float) -> None:
+        self._energy_sum += energy
+        self._speech_frames += 1
+        self._tail.append(energy)
+        self._text_complete = None  # 新的语音帧使之前的文本提示失效
+
+    def on_partial_text(self, text: str) -> None:
+        """增量识别结果（对应当前全部语音帧）到达。末尾标点由 ITN 添加，不作为说完的依据。"""
+        if not self.use_text:
+            return
+        stripped = " " + text.rstrip(_TRAILING_PUNCT).lower()
+        self._text_complete = False if stripped.endswith(_CONTINUATIONS) else None
+
+    def completeness(self) -> float:
+        """当前语音已说完的可能性估计，0~1。"""
+        length_ms = self._speech_frames * FRAME_DURATION_MS
+        if length_ms < _MIN_LENGTH_MS or not self._tail:
+            return 0.0
+        mean = self._energy_sum / self._speech_frames
+        tail = sum(self._tail) / len(self._tail)
+        decay = min(max((1.0 - tail / mean) / 0.6, 0.0), 1.0) if mean > 0 else 0.0
+        length = min((length_ms - _MIN_LENGTH_MS) / (_FULL_LENGTH_MS - _MIN_LENGTH_MS), 1.0)
+        if self._text_complete is None:
+            return 0.65 * decay + 0.35 * length
+        # 文本显示话未说完：文本项记 0，声学信号的权重随之减小
+        return 0.4 * decay + 0.2 * length
+
+    def silence_frames(self) -> int:
+        """当前语音段结束所需的连续静音帧数。"""
+        if self.aggressiveness <= 0:
+            return self.max_frames
+        span = self.max_frames - self.min_frames
+        return self.max_frames - round(span * self.aggressiveness * self.completeness())
+
+
+# ── 回放评估 ─────────────────────────────────────────────────────────────────
+
+def _replay(frames: list[bytes], config: ASRConfig) -> list[int]:
+    """回放 VAD，返回每个完整语音段提交时的帧序号（分块提交不计）。"""
+    from pipeline.asr.vad import VADProcessor
+
+    vad = VADProcessor(config)
+    commits = []
+    for i, frame in enumerate(frames):
+        if vad.process(frame) is not None and vad.last_segment.get("final"):
+            commits.append(i)
+    return commits
+
+
+def evaluate_endpointing(corpus: list[tuple[str, bytes]], config: ASRConfig) -> dict:
+    """以固定超时为基准回放每条录音，统计自适应断句的误切次数与节省的延迟。
+
+    自适应断句的每次提交在基准中应有一次提交与之对应（位于其后、相差不超过
+    固定超时的帧数），节省延迟即两者之差；找不到对应的即为误切。
+    """
+    from pipeline.asr.vad import FRAME_BYTES
+
+    baseline_config = config.model_copy(update={"endpoint_aggressiveness": 0.0})
+    window = config.silence_duration_ms // FRAME_DURATION_MS
+    # 末尾补足静音，保证最后一段在两种策略下都能提交
+    padding = b"\0" * FRAME_BYTES * (window + 2)
+    commits = cut_offs = 0
+    saved_ms: list[int] = []
+    for _, pcm in corpus:
+        data = pcm + padding
+        frames = [data[i:i + FRAME_BYTES] for i in range(0, len(data) - FRAME_BYTES + 1, FRAME_BYTES)]
+        baseline = _replay(frames, baseline_config)
+        adaptive = _replay(frames, config)
+        commits += len(adaptive)
+        for a in adaptive:
+            match = next((b for b in baseline if a <= b <= a + window), None)
+            if match is None:
+                cut_offs += 1
+            else:
+                saved_ms.append((match - a) * FRAME_DURATION_MS)
+    return {
+        "aggressiveness": config.endpoint_aggressiveness,
+        "files": len(corpus),
+        "commits": commits,
+        "false_cut_offs": cut_offs,
+        "false_cut_off_rate": cut_offs / commits if commits else 0.0,
+        "mean_saved_ms": sum(saved_ms) / len(saved_ms) if saved_ms else 0.0,
+    }
+
+
+def main() -> None:
+    from pipeline.asr.benchmark import load_corpus
+
+    parser = argparse.ArgumentParser(description="回放评估自适应断句的误切率与延迟收益")
+    parser.add_argument("corpus", type=Path, help="16kHz 单声道 WAV 语料目录，每个文件为完整的一句或多句话")
+    parser.add_argument("--sweep", nargs="+", type=float, default=[0.25, 0.5, 0.75, 1.0],
+                        help="评估的 endpoint_aggressiveness 取值")
+    args = parser.parse_args()
+
+    from config import get_config
+    corpus = load_corpus(args.corpus)
+    print(f"{'aggr':>6}{'commits':>9}{'cut-offs':>10}{'rate':>8}{'saved(ms)':>11}")
+    for value in args.sweep:
+        config = get_config().asr.model_copy(update={"endpoint_aggressiveness": value})
+        r = evaluate_endpointing(corpus, config)
+        print(f"{value:>6.2f}{r['commits']:>9}{r['false_cut_offs']:>10}"
+              f"{r['false_cut_off_rate']:>8.1%}{r['mean_saved_ms']:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,11 +3,14 @@ from __future__ import annotations
 import asyncio
 import io
 import re
+import time
 import wave
+import numpy as np
 from loguru import logger
 
 from config import ASRConfig
 from core.event_bus import bus, Event
+from core.tracing import LatencyHistogram, tracer
 
 SAMPLE_RATE = 16000
 
@@ -28,6 +31,10 @@ _EMOTION_PATTERN = re.compile(r"<\|([A-Z_]+)\|>")
 _ANY_TAG = re.compile(r"<\|[^|]+\|>")
 # 判断文本是否为纯标点/空白，不含任何实质字符
 _MEANINGFUL = re.compile(r"[\w\u4e00-\u9fff\u3040-\u30ff]")
+# 拼接分块结果时忽略的衔接处标点
+_JOIN_PUNCT = "，。！？、；：,.!?;: "
+# 估算重叠音频对应的最大字数（语速上限，字/秒）
+_CHARS_PER_S = 8
 
 
 def _parse_sensevoice(raw: str) -> tuple[str, str]:
@@ -42,6 +49,38 @@ def _parse_sensevoice(raw: str) -> tuple[str, str]:
     return text, emotion
 
 
+def _stitch(texts: list[str], max_overlap: int) -> str:
+    """按顺序拼接相邻分块的识别结果，去掉重叠音频造成的重复文字。
+
+    取前一块末尾与后一块开头的最长公共部分（至少 2 字，忽略衔接处标点）；
+    找不到时直接相连。
+    """
+    merged = ""
+    for text in texts:
+        if not text:
+            continue
+        head = merged.rstrip(_JOIN_PUNCT)
+        body = text.lstrip(_JOIN_PUNCT)
+        for k in range(min(len(head), len(body), max_overlap), 1, -1):
+            if head.endswith(body[:k]):
+                merged = head + body[k:]
+                break
+        else:
+            merged += text
+    return merged
+
+
+def _pcm_to_float32(pcm: bytes) -> np.ndarray:
+    """将 16-bit PCM 转为 [-1, 1] 的 float32 波形，直接作为 funasr 的 numpy 输入。
+
+    np.frombuffer 只是 PCM 的 int16 视图，astype 会复制出新的 float32 数组（唯一一次分配），
+    缩放在该副本上原地进行；返回值不引用 pcm，调用方的缓冲（如 worker 的共享内存）可立即复用。
+    """
+    samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32)
+    samples *= 1.0 / 32768.0
+    return samples
+
+
 def _pcm_to_wav(pcm: bytes) -> bytes:
     """将原始 PCM bytes 封装为 WAV 格式（funasr 接受文件路径或 numpy，这里用临时 wav）。"""
     buf = io.BytesIO()
@@ -54,10 +93,22 @@ def _pcm_to_wav(pcm: bytes) -> bytes:
 
 
 class SenseVoiceASR:
+    """进程内 SenseVoice 推理。
+
+    并发的 transcribe() 请求（多路音频源、增量与正式识别）先进入待推理列表；
+    模型空闲后最多 batch_max_size 段合并为一个批次，一次 generate 完成后按序
+    把结果分发回各调用方。推理期间到达的请求自然在列表中积累成下一批。
+    """
+
     def __init__(self, config: ASRConfig):
         self.config = config
         self._model = None
         self._lock = asyncio.Lock()
+        self._array_input = True  # 模型不接受 numpy 输入时改用临时 WAV 文件
+        self._batch_input = True  # 模型不支持列表输入时改为逐段推理
+        self._pending: list[tuple[bytes, asyncio.Future]] = []
+        self._drain_task: asyncio.Task | None = None
+        self.inference_ms = LatencyHistogram()  # 每批推理耗时
 
     def _load_model(self):
         if self._model is not None:
@@ -81,42 +132,221 @@ class SenseVoiceASR:
             loop = asyncio.get_event_loop()
             await loop.run_in_executor(None, self._load_model)
 
+    @property
+    def busy(self) -> bool:
+        """是否有推理（或模型加载）正在进行。"""
+        return self._lock.locked() or bool(self._pending)
+
+    @property
+    def queue_depth(self) -> int:
+        """等待推理的语音段数。"""
+        return len(self._pending)
+
     async def transcribe(self, pcm: bytes) -> tuple[str, str]:
         """推理，返回 (text, emotion)。"""
-        async with self._lock:
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, self._transcribe_sync, pcm)
+        future = asyncio.get_event_loop().create_future()
+        self._pending.append((pcm, future))
+        if self._drain_task is None or self._drain_task.done():
+            self._drain_task = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        """逐批取出待推理的语音段，直到列表为空。"""
+        loop = asyncio.get_event_loop()
+        while self._pending:
+            async with self._lock:
+                max_size = max(1, self.config.batch_max_size)
+                if len(self._pending) < max_size and self.config.batch_window_ms > 0:
+                    await asyncio.sleep(self.config.batch_window_ms / 1000)
+                batch = [(pcm, f) for pcm, f in self._pending[:max_size] if not f.done()]
+                del self._pending[:max_size]
+                if not batch:
+                    continue
+                started = time.perf_counter()
+                try:
+                    results = await loop.run_in_executor(
+                        None, self._transcribe_batch_sync, [pcm for pcm, _ in batch]
+                    )
+                    self.inference_ms.add((time.perf_counter() - started) * 1000)
+                except Exception as e:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def unload(self) -> None:
+        """模型配置变更：下次推理时重新加载。"""
+        self._model = None
+
+    async def close(self) -> None:
+        pass
+
+    def _transcribe_batch_sync(self, pcms: list[bytes]) -> list[tuple[str, str]]:
+        """多段语音一次推理（模型内部按最长段补零对齐），结果与输入一一对应。"""
+        if len(pcms) == 1 or not (self._batch_input and self._array_input):
+            return [self._transcribe_sync(pcm) for pcm in pcms]
+        self._load_model()
+        try:
+            raws = self._generate_batch([_pcm_to_float32(pcm) for pcm in pcms])
+            if len(raws) != len(pcms):
+                raise ValueError(f"批量结果数 {len(raws)} 与输入数 {len(pcms)} 不符")
+        except (TypeError, ValueError) as e:
+            # 列表输入被拒绝或结果数不符：当前模型不支持批量推理，此后一律逐段推理
+            logger.warning(f"SenseVoice 不支持批量推理，改为逐段推理: {e}")
+            self._batch_input = False
+            return [self._transcribe_sync(pcm) for pcm in pcms]
+        except Exception as e:
+            # 其他推理错误只影响这一批，逐段重试，下一批仍走批量
+            logger.warning(f"SenseVoice 批量推理失败，本批逐段重试: {e}")
+            return [self._transcribe_sync(pcm) for pcm in pcms]
+        logger.debug(f"[ASR] 批量推理 {len(pcms)} 段")
+        return [_parse_sensevoice(raw) for raw in raws]
 
     def _transcribe_sync(self, pcm: bytes) -> tuple[str, str]:
         self._load_model()
+        if self._array_input:
+            try:
+                return self._generate(_pcm_to_float32(pcm))
+            except (TypeError, ValueError) as e:
+                # 输入类型 / 格式被拒绝：当前 funasr 版本不支持内存直传，此后一律走临时文件
+                logger.warning(f"SenseVoice 不支持内存输入，改用临时 WAV 文件: {e}")
+                self._array_input = False
+            except Exception as e:
+                # 其他推理错误（显存不足等）不代表输入方式有问题，仅本次改用临时文件重试
+                logger.warning(f"SenseVoice 内存输入推理失败，本次改用临时 WAV 文件重试: {e}")
+        return self._transcribe_file(pcm)
+
+    def _transcribe_file(self, pcm: bytes) -> tuple[str, str]:
         import tempfile, os
         wav = _pcm_to_wav(pcm)
         with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
             f.write(wav)
             tmp_path = f.name
         try:
-            result = self._model.generate(
-                input=tmp_path,
-                cache={},
-                language="auto",
-                use_itn=True,
-            )
-            raw = result[0]["text"] if result else ""
-            return _parse_sensevoice(raw)
+            return self._generate(tmp_path)
         finally:
             os.unlink(tmp_path)
 
+    def _generate_batch(self, audios: list[np.ndarray]) -> list[str]:
+        """批量推理，返回与输入一一对应的原始输出（含 <|...|> 标签）。"""
+        result = self._model.generate(
+            input=audios,
+            cache={},
+            language="auto",
+            use_itn=True,
+            batch_size=len(audios),
+            fs=SAMPLE_RATE,
+        )
+        return [r["text"] for r in result]
+
+    def _generate(self, audio) -> tuple[str, str]:
+        """audio 为 float32 波形或 WAV 文件路径。"""
+        result = self._model.generate(
+            input=audio,
+            cache={},
+            language="auto",
+            use_itn=True,
+            fs=SAMPLE_RATE,
+        )
+        raw = result[0]["text"] if result else ""
+        return _parse_sensevoice(raw)
+
 
 def init_asr_handler(asr: SenseVoiceASR):
-    """注册 MIC_VAD 事件处理，推理后发布 ASR_RESULT。"""
+    """注册 MIC_PARTIAL / MIC_VAD 事件处理，推理后发布 ASR_PARTIAL / ASR_RESULT。
+
+    增量识别只在 ASR 空闲时进行，不与正式识别抢占；若语音段提交时自最近一次
+    快照以来没有新增语音帧（只多了尾部静音），直接复用该次增量结果。
+    超长语音的中间块（final=False）识别后先作为增量结果发布，段结束时与最后一块按重叠拼接。
+    """
+    # segment → (快照时的语音帧数, 增量识别任务)；只保留当前语音段
+    partials: dict[int, tuple[int, asyncio.Task]] = {}
+    # segment → {块序号: 识别任务}；只保留当前语音段
+    chunks: dict[int, dict[int, asyncio.Task]] = {}
+
+    def max_overlap() -> int:
+        return int(asr.config.segment_overlap_ms / 1000 * _CHARS_PER_S) + 2
+
+    def finished_chunks(segment) -> list[str]:
+        texts = []
+        for _, task in sorted(chunks.get(segment, {}).items()):
+            if not task.done() or task.cancelled() or task.exception():
+                break
+            texts.append(task.result()[0])
+        return texts
 
-    @bus.on(Event.MIC_VAD)
+    async def all_chunks(segment) -> list[str]:
+        texts = []
+        for _, task in sorted(chunks.pop(segment, {}).items()):
+            try:
+                texts.append((await task)[0])
+            except Exception as e:
+                logger.warning(f"[ASR] 分块识别失败: {e}")
+        return texts
+
+    def publish_partial(text: str, emotion: str, data: dict) -> None:
+        if text and _MEANINGFUL.search(text):
+            bus.emit(Event.ASR_PARTIAL, {
+                "text": text,
+                "emotion": emotion,
+                "segment": data["segment"],
+                "speech_frames": data["speech_frames"],
+            })
+
+    # 两个处理函数都需要并发执行：排队的语音段才能合并为一批推理，ASR 忙时的快照直接跳过
+    @bus.on(Event.MIC_PARTIAL, concurrent=True)
+    async def _handle_mic_partial(data: dict):
+        segment = data["segment"]
+        pending = partials.get(segment)
+        if asr.busy or (pending and not pending[1].done()):
+            return
+        task = asyncio.ensure_future(asr.transcribe(data["pcm"]))
+        partials.clear()
+        partials[segment] = (data["speech_frames"], task)
+        try:
+            text, emotion = await task
+        except Exception as e:
+            logger.debug(f"[ASR] 增量识别失败: {e}")
+            return
+        publish_partial(_stitch(finished_chunks(segment) + [text], max_overlap()), emotion, data)
+
+    @bus.on(Event.MIC_VAD, concurrent=True)
     async def _handle_mic_vad(data: dict):
         pcm = data["pcm"]
-        text, emotion = await asr.transcribe(pcm)
+        segment = data.get("segment")
+        if data.get("final") is False:
+            if segment not in chunks:
+                chunks.clear()
+            task = asyncio.ensure_future(asr.transcribe(pcm))
+            chunks.setdefault(segment, {})[data["chunk"]] = task
+            try:
+                _, emotion = await task
+            except Exception as e:
+                logger.warning(f"[ASR] 分块识别失败: {e}")
+                return
+            publish_partial(_stitch(finished_chunks(segment), max_overlap()), emotion, data)
+            return
+
+        reusable = partials.pop(segment, None)
+        text = emotion = None
+        if reusable and reusable[0] == data.get("speech_frames"):
+            try:
+                text, emotion = await reusable[1]
+                logger.debug("[ASR] 复用增量识别结果")
+            except Exception:
+                text = None
+        if text is None:
+            text, emotion = await asr.transcribe(pcm)
+        if segment in chunks:
+            text = _stitch(await all_chunks(segment) + [text], max_overlap())
         if not text or not _MEANINGFUL.search(text):
             if text:
                 logger.debug(f"[ASR] 丢弃纯标点结果: {text!r}")
+            tracer.discard(data.get("trace"))
             return
         logger.info(f"[ASR] 识别结果: {text!r}  情感: {emotion}")
-        bus.emit(Event.ASR_RESULT, {"text": text, "emotion": emotion})
+        tracer.mark(data.get("trace"), "asr_result")
+        bus.emit(Event.ASR_RESULT, {"text": text, "emotion": emotion, "trace": data.get("trace")})
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import numpy as np
+from loguru import logger
+
+from pipeline.asr.sensevoice import SenseVoiceASR, _parse_sensevoice
+
+
+class SenseVoiceOnnxASR(SenseVoiceASR):
+    """SenseVoice 的 ONNX Runtime 推理后端，面向纯 CPU 部署。
+
+    使用 funasr-onnx 加载导出的（默认 int8 量化）计算图，不依赖 torch 推理；
+    首次使用时若模型目录中没有 ONNX 文件，funasr-onnx 会自动下载并导出。
+    输出与 torch 后端相同：原始文本经 _parse_sensevoice 解析为 (text, emotion)。
+    """
+
+    def _load_model(self):
+        if self._model is not None:
+            return
+        from funasr_onnx import SenseVoiceSmall
+        logger.info(
+            f"加载 SenseVoice-Small（ONNX Runtime），quantize={self.config.onnx_quantize}，"
+            f"intra_op_threads={self.config.onnx_intra_op_threads}"
+        )
+        self._model = SenseVoiceSmall(
+            self.config.onnx_model_dir,
+            batch_size=max(1, self.config.batch_max_size),
+            quantize=self.config.onnx_quantize,
+            intra_op_num_threads=self.config.onnx_intra_op_threads,
+        )
+        logger.info("SenseVoice-Small（ONNX Runtime）加载完成")
+
+    def _generate_batch(self, audios: list[np.ndarray]) -> list[str]:
+        # funasr-onnx 的列表输入只接受文件路径，波形逐段推理
+        return [self._run(audio)[0] for audio in audios]
+
+    def _generate(self, audio) -> tuple[str, str]:
+        """audio 为 float32 波形或 WAV 文件路径。"""
+        result = self._run(audio)
+        raw = result[0] if result else ""
+        return _parse_sensevoice(raw)
+
+    def _run(self, audio) -> list[str]:
+        return self._model(audio, language="auto", textnorm="withitn")
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import math
 import threading
 from collections import deque
 
@@ -8,85 +9,269 @@ import webrtcvad
 from loguru import logger
 
 from config import ASRConfig
+from pipeline.asr.endpoint import AdaptiveEndpointer
 
 SAMPLE_RATE = 16000
 FRAME_DURATION_MS = 30
 FRAME_BYTES = int(SAMPLE_RATE * FRAME_DURATION_MS / 1000) * 2
 
 
-def _rms(frame: bytes) -> float:
-    samples = np.frombuffer(frame, dtype=np.int16).astype(np.float32)
-    return float(np.sqrt(np.mean(samples ** 2)))
+# 噪声底估计：最近若干秒帧能量的低分位数（最小统计量法，语音很少占满整个窗口）
+_NOISE_WINDOW_FRAMES = 166     # 约 5s
+_NOISE_PERCENTILE = 15
+_NOISE_UPDATE_FRAMES = 10      # 每隔多少帧重新估计一次
+
+
+def _mean_square(frame: bytes) -> int:
+    """整数域的帧均方能量：int16 → int64 点积，不经过浮点。"""
+    samples = np.frombuffer(frame, dtype=np.int16).astype(np.int64)
+    return int(samples @ samples) // len(samples)
+
+
+class _NoiseFloor:
+    """环境噪声底跟踪：滑动窗口内帧均方能量的低分位数，供 RMS 预过滤自动定门限。"""
+
+    def __init__(self):
+        self._window = np.zeros(_NOISE_WINDOW_FRAMES, dtype=np.int64)
+        self._count = 0
+        self.mean_square = 0
+
+    @property
+    def rms(self) -> float:
+        return math.sqrt(self.mean_square)
+
+    def update(self, mean_square: int) -> None:
+        self._window[self._count % _NOISE_WINDOW_FRAMES] = mean_square
+        self._count += 1
+        if self._count % _NOISE_UPDATE_FRAMES == 0:
+            filled = self._window[:min(self._count, _NOISE_WINDOW_FRAMES)]
+            k = len(filled) * _NOISE_PERCENTILE // 100
+            self.mean_square = int(np.partition(filled, k)[k])
+
+
+class _SegmentBuffer:
+    """预分配的语音段缓冲：帧按切片写入固定大小的 bytearray，容量用满即需提交。"""
+
+    def __init__(self, capacity_frames: int):
+        self.capacity_frames = capacity_frames
+        self._buf = bytearray(capacity_frames * FRAME_BYTES)
+        self._view = memoryview(self._buf)
+        self.frames = 0
+
+    @property
+    def full(self) -> bool:
+        return self.frames >= self.capacity_frames
+
+    def __bool__(self) -> bool:
+        return self.frames > 0
+
+    def append(self, frame: bytes) -> None:
+        start = self.frames * FRAME_BYTES
+        self._view[start:start + FRAME_BYTES] = frame
+        self.frames += 1
+
+    def snapshot(self) -> bytes:
+        """当前内容的一份拷贝（缓冲会被复用，交给 ASR 的数据必须独立）。"""
+        return self._view[:self.frames * FRAME_BYTES].tobytes()
+
+    def keep_tail(self, frames: int) -> None:
+        """只保留末尾 frames 帧（移到缓冲开头），作为下一块的重叠部分。"""
+        frames = min(frames, self.frames)
+        end = self.frames * FRAME_BYTES
+        self._view[:frames * FRAME_BYTES] = self._view[end - frames * FRAME_BYTES:end]
+        self.frames = frames
+
+    def clear(self) -> None:
+        self.frames = 0
 
 
 class VADProcessor:
-    """帧级 VAD 检测：RMS预过滤 + webrtcvad + Pre-roll缓冲。"""
+    """帧级 VAD 检测：RMS预过滤 + webrtcvad + Pre-roll缓冲。
+
+    语音段写入预分配的定长缓冲，每个麦克风的内存占用固定。持续说话超过
+    max_segment_ms 时先提交一块（final=False），并保留末尾 segment_overlap_ms
+    作为下一块的开头，由 ASR 侧按重叠拼接各块结果。
+    语音结束所需的静音时长由 AdaptiveEndpointer 按当前语音的完整度动态决定。
+    """
 
     def __init__(self, config: ASRConfig):
         self.vad = webrtcvad.Vad(config.vad_sensitivity)
-        self._silence_frames = config.silence_duration_ms // FRAME_DURATION_MS
+        self._endpointer = AdaptiveEndpointer(config)
         self._min_speech_frames = config.min_speech_duration_ms // FRAME_DURATION_MS
         self._rms_threshold = config.vad_rms_threshold
+        self._noise = _NoiseFloor()
+        self._adaptive_gate = config.vad_adaptive_threshold
+        self._noise_margin = config.vad_noise_margin
+        self._gate = int(self._rms_threshold ** 2)  # 当前门限（均方值）
+        self.frames = 0
+        self.gated_frames = 0          # 被 RMS 预过滤直接判为静音的帧数
+        self.segments = 0              # 提交给 ASR 的语音段数（不含超长语音的中间块）
+        self.discarded_segments = 0    # 语音帧不足、按短噪音丢弃的段数
         self._pre_roll: deque[bytes] = deque(maxlen=config.vad_pre_roll_frames)
-        self._buffer: list[bytes] = []
+        self._max_segment_frames = config.max_segment_ms // FRAME_DURATION_MS
+        self._overlap_frames = config.segment_overlap_ms // FRAME_DURATION_MS
+        self._buffer = _SegmentBuffer(self._capacity_frames())
+        self._chunk = 0                # 当前语音段内已提交的块数
         self._silent_count = 0
         self._speaking = False
         self._speech_frame_count = 0
+        self._segment_id = 0           # 每段语音开始时递增
+        self._partial_at = 0           # 上次增量快照时的语音帧数
+        self.last_segment: dict = {}   # 最近一次提交的段标识，供 ASR 复用增量识别结果与拼接分块
         self._lock = threading.Lock()
 
-    def process(self, frame: bytes) -> bytes | None:
+    def _capacity_frames(self) -> int:
+        # 重叠部分至少为新内容留出一半容量
+        return max(self._max_segment_frames, 2 * self._overlap_frames, 2)
+
+    def process(self, frame: bytes, suppress: bool = False) -> bytes | None:
+        """处理一帧；suppress=True（回声门控判定为扬声器回声）时该帧按静音处理。"""
         with self._lock:
-            return self._process_locked(frame)
+            return self._process_locked(frame, suppress)
+
+    def poll_partial(self, interval_frames: int) -> dict | None:
+        """语音进行中时按需返回当前缓冲快照，用于增量识别。
+
+        说话期间每新增 interval_frames 个语音帧快照一次；刚进入停顿（首个静音帧）时
+        也快照一次，这样静音超时期间跑出的结果可被最终提交直接复用。
+        """
+        with self._lock:
+            if not self._speaking or self._speech_frame_count < self._min_speech_frames:
+                return None
+            if self._speech_frame_count == self._partial_at:
+                return None
+            pausing = self._silent_count == 1
+            if not pausing and self._speech_frame_count - self._partial_at < interval_frames:
+                return None
+            self._partial_at = self._speech_frame_count
+            return {
+                "pcm": self._buffer.snapshot(),
+                "segment": self._segment_id,
+                "speech_frames": self._speech_frame_count,
+            }
+
+    def stats(self) -> dict:
+        return {
+            "noise_floor": round(self._noise.rms, 1),
+            "gate": round(math.sqrt(self._gate), 1),
+            "gate_rate": self.gated_frames / self.frames if self.frames else 0.0,
+            "frames": self.frames,
+            "gated_frames": self.gated_frames,
+            "segments": self.segments,
+            "discarded_segments": self.discarded_segments,
+        }
+
+    def hint_partial(self, segment: int, speech_frames: int, text: str) -> None:
+        """增量识别结果回传：快照之后没有新增语音帧时，作为断句的语义信号。"""
+        with self._lock:
+            if self._speaking and segment == self._segment_id and speech_frames == self._speech_frame_count:
+                self._endpointer.on_partial_text(text)
 
     def force_commit(self) -> bytes | None:
         """强制提交当前 buffer（不等静音超时）。供打断逻辑调用。"""
         with self._lock:
             if not self._speaking or not self._buffer:
                 return None
-            if self._speech_frame_count >= self._min_speech_frames:
-                audio = b"".join(self._buffer)
+            if self._speech_frame_count >= self._min_speech_frames or self._chunk:
+                audio = self._buffer.snapshot()
                 logger.debug(f"VAD: force_commit 提交 {len(audio)} bytes")
+                self._mark_commit(final=True)
                 self._reset()
                 return audio
+            self.discarded_segments += 1
             self._reset()
             return None
 
-    def _process_locked(self, frame: bytes) -> bytes | None:
-        energy = _rms(frame)
-        # RMS 预过滤：低能量帧直接视为静音，跳过 webrtcvad
-        if energy < self._rms_threshold:
+    def _process_locked(self, frame: bytes, suppress: bool = False) -> bytes | None:
+        mean_square = _mean_square(frame)
+        self._update_gate()
+        self.frames += 1
+        # RMS 预过滤：低能量帧直接视为静音，跳过 webrtcvad（均方值与门限平方比较，省去开方）
+        if mean_square < self._gate:
+            is_speech = False
+            self.gated_frames += 1
+        elif suppress:
             is_speech = False
         else:
             is_speech = self.vad.is_speech(frame, SAMPLE_RATE)
+        energy = math.isqrt(mean_square)
+        if self._adaptive_gate and not is_speech and not suppress and not self._speaking:
+            # 噪声底只取语音段之外、webrtcvad 判为非语音（或低于门限）的帧；播放期间被抑制的帧
+            # 含回声，也不计入。语音帧混进窗口会把低分位数抬到说话能量，门限随之把轻声音节滤掉
+            self._noise.update(mean_square)
 
         if is_speech:
             self._silent_count = 0
             if not self._speaking:
-                pre = list(self._pre_roll)
-                self._speaking = True
-                self._speech_frame_count = 0
-                self._buffer = pre          # 前置 pre-roll，防截断词头
-                logger.debug(f"VAD: 语音开始（pre-roll={len(pre)}帧，energy={energy:.0f}）")
+                self._start_segment()
+                logger.debug(f"VAD: 语音开始（pre-roll={self._buffer.frames}帧，energy={energy:.0f}）")
             self._speech_frame_count += 1
+            self._endpointer.on_speech(energy)
+            return self._append(frame)
+        if not self._speaking:
+            self._pre_roll.append(frame)   # 仅在静默时维护 pre-roll
+            return None
+        self._silent_count += 1
+        if self._silent_count >= self._endpointer.silence_frames():
             self._buffer.append(frame)
-        else:
-            if not self._speaking:
-                self._pre_roll.append(frame)   # 仅在静默时维护 pre-roll
-            else:
-                self._silent_count += 1
-                self._buffer.append(frame)      # 保留尾部静音避免截断词尾
-                if self._silent_count >= self._silence_frames:
-                    if self._speech_frame_count >= self._min_speech_frames:
-                        audio = b"".join(self._buffer)
-                        logger.debug(f"VAD: 语音结束 {len(audio)} bytes")
-                        self._reset()
-                        return audio
-                    logger.debug(f"VAD: 丢弃短噪音（{self._speech_frame_count}帧）")
-                    self._reset()
-        return None
+            if self._speech_frame_count >= self._min_speech_frames or self._chunk:
+                audio = self._buffer.snapshot()
+                logger.debug(f"VAD: 语音结束 {len(audio)} bytes")
+                self._mark_commit(final=True)
+                self._reset()
+                return audio
+            logger.debug(f"VAD: 丢弃短噪音（{self._speech_frame_count}帧）")
+            self.discarded_segments += 1
+            self._reset()
+            return None
+        return self._append(frame)      # 保留尾部静音避免截断词尾
+
+    def _update_gate(self) -> None:
+        """门限 = max(vad_rms_threshold, 噪声底 × vad_noise_margin)：嘈杂环境下自动抬高。"""
+        static = int(self._rms_threshold ** 2)
+        if not self._adaptive_gate:
+            self._gate = static
+            return
+        self._gate = max(static, int(self._noise.mean_square * self._noise_margin ** 2))
+
+    def _start_segment(self) -> None:
+        self._speaking = True
+        self._speech_frame_count = 0
+        self._segment_id += 1
+        self._partial_at = 0
+        self._chunk = 0
+        self._endpointer.reset()
+        if self._buffer.capacity_frames != self._capacity_frames():
+            self._buffer = _SegmentBuffer(self._capacity_frames())  # 配置热更新后重建
+        # 前置 pre-roll，防截断词头；至少为当前帧留出一帧空间，缓冲在两次调用之间始终不满
+        for pre in list(self._pre_roll)[-(self._buffer.capacity_frames - 1):]:
+            self._buffer.append(pre)
+
+    def _append(self, frame: bytes) -> bytes | None:
+        """写入一帧；缓冲写满时提交当前块并保留重叠尾部，段本身继续。"""
+        self._buffer.append(frame)
+        if not self._buffer.full:
+            return None
+        audio = self._buffer.snapshot()
+        logger.debug(f"VAD: 语音段超长，分块提交第 {self._chunk} 块 {len(audio)} bytes")
+        self._mark_commit(final=False)
+        self._chunk += 1
+        self._buffer.keep_tail(self._overlap_frames)
+        return audio
+
+    def _mark_commit(self, final: bool) -> None:
+        if final:
+            self.segments += 1
+        self.last_segment = {
+            "segment": self._segment_id,
+            "speech_frames": self._speech_frame_count,
+            "chunk": self._chunk,
+            "final": final,
+        }
 
     def _reset(self) -> None:
-        self._buffer = []
+        self._buffer.clear()
+        self._chunk = 0
         self._silent_count = 0
         self._speaking = False
         self._speech_frame_count = 0
@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+from loguru import logger
+
+from config import ASRConfig
+from core.tracing import LatencyHistogram
+
+# 每个 worker 的共享内存初始容量（30s 16kHz 16-bit），更长的语音段按需扩容
+_SHM_BYTES = 30 * 16000 * 2
+# 空闲 worker 的健康检查间隔与应答超时
+_HEALTH_INTERVAL_S = 10.0
+_PING_TIMEOUT_S = 2.0
+# 子进程加载模型的最长等待时间
+_LOAD_TIMEOUT_S = 300.0
+# 重建 worker 失败后的重试间隔
+_RESPAWN_RETRY_S = 5.0
+
+
+class _InferenceError(Exception):
+    """worker 自身报告的推理失败：子进程与管道仍然可用，无需重建。"""
+
+
+def _worker_main(config_data: dict, conn) -> None:
+    """ASR 子进程入口：加载一次模型，之后循环处理父进程的推理请求。
+
+    请求 ("run", shm_name, nbytes)：PCM 位于共享内存前 nbytes 字节；
+    应答 ("result", text, emotion) 或 ("error", message)。
+    """
+    from pipeline.asr import create_local_engine
+
+    asr = create_local_engine(ASRConfig.model_validate(config_data))
+    asr._load_model()
+    conn.send(("ready",))
+
+    shm: shared_memory.SharedMemory | None = None
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            break
+        kind = msg[0]
+        if kind == "ping":
+            conn.send(("pong",))
+            continue
+        if kind == "stop":
+            break
+        _, name, nbytes = msg
+        try:
+            if shm is None or shm.name != name:
+                if shm is not None:
+                    shm.close()
+                shm = shared_memory.SharedMemory(name=name)  # 由父进程负责 unlink
+            with shm.buf[:nbytes] as pcm:
+                text, emotion = asr._transcribe_sync(pcm)
+            conn.send(("result", text, emotion))
+        except Exception as e:
+            conn.send(("error", str(e)))
+    if shm is not None:
+        shm.close()
+
+
+class _Worker:
+    """父进程侧的 worker 句柄：子进程 + 管道 + 专属共享内存。方法均为阻塞调用，在线程池中执行。"""
+
+    def __init__(self, ctx, config: ASRConfig, index: int, generation: int):
+        self.index = index
+        self.generation = generation
+        self.ready = False
+        self.closed = False
+        self.shm = shared_memory.SharedMemory(create=True, size=_SHM_BYTES)
+        self.conn, child_conn = ctx.Pipe()
+        self.proc = ctx.Process(
+            target=_worker_main,
+            args=(config.model_dump(), child_conn),
+            name=f"asr-worker-{index}",
+            daemon=True,
+        )
+        self.proc.start()
+        child_conn.close()
+
+    def wait_ready(self, timeout: float = _LOAD_TIMEOUT_S) -> None:
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise TimeoutError("ASR worker 模型加载超时")
+        msg = self._recv()
+        if msg[0] != "ready":
+            raise RuntimeError(f"ASR worker 启动异常: {msg}")
+        self.ready = True
+
+    def request(self, pcm: bytes, timeout: float) -> tuple[str, str]:
+        self.wait_ready()
+        n = len(pcm)
+        if n > self.shm.size:
+            self._grow(n)
+        self.shm.buf[:n] = pcm
+        self.conn.send(("run", self.shm.name, n))
+        if not self.conn.poll(timeout):
+            raise TimeoutError(f"ASR worker 推理超时（{timeout}s）")
+        msg = self._recv()
+        if msg[0] == "error":
+            raise _InferenceError(msg[1])
+        return msg[1], msg[2]
+
+    def _recv(self) -> tuple:
+        try:
+            return self.conn.recv()
+        except EOFError:
+            self.proc.join(timeout=1.0)  # 管道先于进程关闭，稍等以取得退出码
+            raise EOFError(f"ASR worker 进程已退出（exitcode={self.proc.exitcode}）") from None
+
+    def ping(self) -> bool:
+        if not self.proc.is_alive():
+            return False
+        if not self.ready:
+            return True  # 仍在加载模型
+        try:
+            self.conn.send(("ping",))
+            return self.conn.poll(_PING_TIMEOUT_S) and self.conn.recv() == ("pong",)
+        except (EOFError, OSError):
+            return False
+
+    def _grow(self, n: int) -> None:
+        old = self.shm
+        self.shm = shared_memory.SharedMemory(create=True, size=max(n, old.size * 2))
+        old.close()
+        old.unlink()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self.proc.is_alive():
+                self.conn.send(("stop",))
+                self.proc.join(timeout=1.0)
+        except (EOFError, OSError):
+            pass
+        if self.proc.is_alive():
+            self.proc.kill()
+            self.proc.join(timeout=1.0)
+        self.conn.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class ProcessASR:
+    """多进程 ASR 引擎：每个 worker 子进程各自加载一次模型，与 SenseVoiceASR 接口一致。
+
+    PCM 经每个 worker 专属的共享内存传递，管道只传递段名和长度；
+    多段语音（多路音频源）可同时由不同 worker 推理。worker 崩溃、管道断开或推理超时时
+    自动重建；子进程报告的推理错误只跳过该段，worker 继续使用。空闲 worker 定期 ping 做健康检查。
+    """
+
+    def __init__(self, config: ASRConfig):
+        self.config = config
+        self._ctx = multiprocessing.get_context("spawn")
+        self._workers: list[_Worker] = []
+        self._idle: asyncio.Queue[_Worker] | None = None
+        self._executor: ThreadPoolExecutor | None = None
+        self._health_task: asyncio.Task | None = None
+        self._background: set[asyncio.Task] = set()  # 延后归还 / 重建 worker 的任务
+        self._generation = 0
+        self._waiting = 0  # 等待空闲 worker 的请求数
+        self.restarts = 0
+        self.inference_ms = LatencyHistogram()  # 单段推理耗时（含 IPC）
+
+    @property
+    def size(self) -> int:
+        return max(1, self.config.process_workers)
+
+    @property
+    def busy(self) -> bool:
+        return self._idle is not None and self._idle.empty()
+
+    @property
+    def queue_depth(self) -> int:
+        """等待空闲 worker 的语音段数。"""
+        return self._waiting
+
+    def _ensure_started(self) -> None:
+        if self._idle is not None:
+            return
+        self._idle = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.size + 1, thread_name_prefix="asr-ipc")
+        for i in range(self.size):
+            worker = _Worker(self._ctx, self.config, i, self._generation)
+            self._workers.append(worker)
+            self._idle.put_nowait(worker)
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info(f"ASR worker 进程已启动 ×{self.size}")
+
+    async def preload(self) -> None:
+        """启动 worker 进程并等待全部模型加载完成。"""
+        self._ensure_started()
+        loop = asyncio.get_event_loop()
+        # 先从空闲队列取出，避免与并发的推理请求争用同一管道
+        workers = [await self._idle.get() for _ in range(self.size)]
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._executor, w.wait_ready) for w in workers),
+                return_exceptions=True,
+            )
+        finally:
+            for worker in workers:
+                self._idle.put_nowait(worker)
+        for r in results:
+            if isinstance(r, Exception):
+                logger.error(f"ASR worker 预热失败: {r}")
+
+    async def transcribe(self, pcm: bytes) -> tuple[str, str]:
+        """取一个空闲 worker 推理，返回 (text, emotion)；失败时返回空结果，worker 不可用时重建。"""
+        self._ensure_started()
+        loop = asyncio.get_event_loop()
+        self._waiting += 1
+        try:
+            worker = await self._idle.get()
+        finally:
+            self._waiting -= 1
+        owned = True  # 由本协程归还 worker；被取消时改由后台任务在请求结束后归还
+        try:
+            if worker.generation != self._generation:
+                worker = await self._respawn(worker, "配置变更")
+            started = time.perf_counter()
+            future = loop.run_in_executor(self._executor, worker.request, pcm, self.config.process_timeout_s)
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 执行线程仍在读写这个 worker 的管道，此时归还会让下一个调用方收到这次的应答；
+                # 等请求结束（至多 process_timeout_s）后再归还
+                owned = False
+                self._spawn(self._reclaim(worker, future))
+                raise
+            self.inference_ms.add((time.perf_counter() - started) * 1000)
+            return result
+        except Exception as e:
+            worker = await self._recover(worker, e)
+            return "", "neutral"
+        finally:
+            if owned:
+                self._release(worker)
+
+    def unload(self) -> None:
+        """模型配置变更：worker 下次被取用时以新配置重建。"""
+        self._generation += 1
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+        for task in self._background:
+            task.cancel()
+        for worker in self._workers:
+            worker.close()
+        self._workers.clear()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    async def _recover(self, worker: _Worker, error: Exception) -> _Worker:
+        """请求失败后的处理，返回可归还的 worker。"""
+        if isinstance(error, _InferenceError):
+            logger.error(f"ASR worker #{worker.index} 推理失败: {error}")
+            return worker
+        # 超时后管道里可能还有迟到的应答，EOF / BrokenPipe 说明子进程已退出，都只能重建
+        if isinstance(error, (TimeoutError, EOFError, BrokenPipeError)) or not worker.proc.is_alive():
+            return await self._respawn(worker, str(error) or type(error).__name__)
+        logger.error(f"ASR worker #{worker.index} 请求失败: {error}")
+        return worker
+
+    async def _reclaim(self, worker: _Worker, future: asyncio.Future) -> None:
+        """调用方已取消：等执行线程中的请求结束，再按结果归还或重建 worker。"""
+        try:
+            await future
+        except Exception as e:
+            worker = await self._recover(worker, e)
+        self._release(worker)
+
+    def _release(self, worker: _Worker) -> None:
+        """归还 worker；进程已不在（重建失败等）时不放回空闲队列，转入后台重试重建。"""
+        if not worker.closed and worker.proc.is_alive():
+            self._idle.put_nowait(worker)
+        else:
+            self._spawn(self._revive(worker))
+
+    async def _revive(self, worker: _Worker) -> None:
+        while True:
+            await asyncio.sleep(_RESPAWN_RETRY_S)
+            worker = await self._respawn(worker, "进程不可用")
+            if not worker.closed:
+                self._idle.put_nowait(worker)
+                return
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _respawn(self, worker: _Worker, reason: str) -> _Worker:
+        """关闭并重建 worker；新进程创建失败时返回已关闭的原 worker，由 _release 稍后重试。"""
+        logger.warning(f"重建 ASR worker #{worker.index}（{reason}）")
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(self._executor, worker.close)
+        try:
+            fresh = _Worker(self._ctx, self.config, worker.index, self._generation)
+        except Exception as e:
+            logger.error(f"ASR worker #{worker.index} 重建失败: {e}")
+            return worker
+        self._workers[self._workers.index(worker)] = fresh
+        self.restarts += 1
+        return fresh
+
+    async def _health_loop(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            await asyncio.sleep(_HEALTH_INTERVAL_S)
+            for _ in range(self._idle.qsize()):
+                worker = self._idle.get_nowait()
+                try:
+                    if not await loop.run_in_executor(self._executor, worker.ping):
+                        worker = await self._respawn(worker, "健康检查失败")
+                except Exception as e:
+                    logger.error(f"ASR worker 健康检查异常: {e}")
+                finally:
+                    self._release(worker)
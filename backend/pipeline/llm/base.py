@@ -14,7 +14,23 @@ class BaseLLMPipeline(ABC):
         """检查是否有可用工具（始终返回 False）。"""
         return False
 
+    def set_character(self, character) -> None:
+        """绑定当前角色（用于按角色区分缓存等，默认无）。"""
+        pass
+
+    def start(self) -> None:
+        """启动后台任务（默认无）。"""
+        pass
+
+    async def close(self) -> None:
+        """释放连接等资源（默认无）。"""
+        pass
+
+    def update_config(self, config) -> None:
+        """热更新配置。"""
+        self.config = config
+
     @abstractmethod
-    async def generate(self, user_text: str, user_emotion: str = "neutral") -> None:
-        """处理用户输入，将结果通过事件总线发布。"""
+    async def generate(self, user_text: str, user_emotion: str = "neutral", trace: str | None = None) -> None:
+        """处理用户输入，将结果通过事件总线发布；trace 为本轮的延迟追踪 id（见 core.tracing）。"""
         ...
@@ -0,0 +1,172 @@
+"""多 Gateway 端点的对冲请求：压低首 token 的长尾延迟。
+
+- 请求先发往排名第一的端点（首 token 延迟中位数最低且健康，样本不足时按配置顺序）
+- 超过对冲预算仍未收到首 token，向下一个端点再发一份相同请求；先出首 token 的一方胜出，
+  其余请求立即取消（关闭连接，Gateway 侧随之中止生成）
+- 首 token 之前连接失败 / 返回错误时立即改投下一个端点；首 token 之后出错不再重试，
+  避免同一轮回复重复播报
+- 每个端点记录最近的首 token 延迟，供排名与 p95 对冲预算使用；落败被取消的请求按已等待时长
+  记一个下界样本，慢请求不会因被对冲掉而从统计中消失
+
+对冲效果验证见 bench.llm_hedge。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import deque
+from typing import AsyncIterator, Callable
+
+from loguru import logger
+
+# 计算分位数所用的最近样本数
+_WINDOW = 100
+# 样本数达到此值后才参与排名与自适应预算
+_MIN_SAMPLES = 5
+
+
+class GatewayError(Exception):
+    """Gateway 返回了错误状态码。"""
+
+
+class Endpoint:
+    """单个 Gateway 端点及其首 token 延迟统计。"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.healthy: bool | None = None  # None 表示尚未探测
+        self.ttft_ms: deque[float] = deque(maxlen=_WINDOW)
+        self.requests = 0
+        self.hedges = 0     # 作为对冲请求发出的次数
+        self.wins = 0       # 率先返回首 token 的次数
+        self.failures = 0   # 首 token 之前失败的次数
+        self.cancelled = 0  # 落败被取消的次数
+
+    def percentile(self, q: float) -> float | None:
+        if len(self.ttft_ms) < _MIN_SAMPLES:
+            return None
+        samples = sorted(self.ttft_ms)
+        return samples[min(len(samples) - 1, int(len(samples) * q / 100))]
+
+    def stats(self) -> dict:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "url": self.url,
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "hedges": self.hedges,
+            "wins": self.wins,
+            "failures": self.failures,
+            "cancelled": self.cancelled,
+            "ttft_p50_ms": round(p50, 1) if p50 is not None else None,
+            "ttft_p95_ms": round(p95, 1) if p95 is not None else None,
+        }
+
+
+def rank_endpoints(endpoints: list[Endpoint]) -> list[Endpoint]:
+    """探测失败的端点排在最后；其余按首 token 延迟中位数排序，样本不足的保持配置顺序排在已测端点之后。"""
+    def key(item: tuple[int, Endpoint]):
+        index, endpoint = item
+        p50 = endpoint.percentile(50)
+        return endpoint.healthy is False, p50 if p50 is not None else float("inf"), index
+    return [endpoint for _, endpoint in sorted(enumerate(endpoints), key=key)]
+
+
+async def hedged_stream(
+    open_stream: Callable[[Endpoint], AsyncIterator[str]],
+    endpoints: list[Endpoint],
+    hedge_after_ms: Callable[[Endpoint], float],
+) -> AsyncIterator[str]:
+    """依次向 endpoints 发起请求并产出胜出一方的文本 delta。
+
+    open_stream(endpoint) 返回该端点的 delta 异步迭代器；hedge_after_ms(endpoint)
+    给出该端点的对冲预算。全部端点都在首 token 之前失败时抛出最后一个错误。
+    调用方须用 contextlib.aclosing 包裹，保证提前退出时落败请求被取消。
+    """
+    queue: asyncio.Queue[tuple[int, str, object]] = asyncio.Queue()
+    tasks: dict[int, asyncio.Task] = {}
+    launched_at: dict[int, float] = {}
+    alive: set[int] = set()
+
+    async def run(i: int) -> None:
+        try:
+            async for delta in open_stream(endpoints[i]):
+                queue.put_nowait((i, "delta", delta))
+            queue.put_nowait((i, "end", None))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            queue.put_nowait((i, "error", e))
+
+    def launch(i: int, hedge: bool) -> None:
+        endpoints[i].requests += 1
+        if hedge:
+            endpoints[i].hedges += 1
+        launched_at[i] = time.perf_counter()
+        alive.add(i)
+        tasks[i] = asyncio.create_task(run(i))
+
+    launch(0, hedge=False)
+    next_i = 1
+    winner: int | None = None
+    try:
+        while True:
+            timeout = None
+            if winner is None and next_i < len(endpoints) and alive:
+                last = next_i - 1
+                elapsed = time.perf_counter() - launched_at[last]
+                timeout = max(0.0, hedge_after_ms(endpoints[last]) / 1000 - elapsed)
+            try:
+                i, kind, value = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                logger.info(
+                    f"{endpoints[next_i - 1].url} 首 token 超过 {hedge_after_ms(endpoints[next_i - 1]):.0f}ms，"
+                    f"对冲请求 {endpoints[next_i].url}"
+                )
+                launch(next_i, hedge=True)
+                next_i += 1
+                continue
+
+            if winner is None:
+                if kind == "error":
+                    alive.discard(i)
+                    endpoints[i].failures += 1
+                    if alive or next_i < len(endpoints):
+                        logger.warning(f"OpenClaw 端点 {endpoints[i].url} 请求失败，改用其他端点: {value!r}")
+                    if alive:
+                        continue  # 还有在途请求，等它们的结果
+                    if next_i < len(endpoints):
+                        launch(next_i, hedge=False)
+                        next_i += 1
+                        continue
+                    raise value
+                # 首个 delta（或一方以空回复正常结束）：该请求胜出，取消其余请求
+                winner = i
+                endpoints[i].wins += 1
+                now = time.perf_counter()
+                won_ms = (now - launched_at[i]) * 1000
+                if kind == "delta":
+                    endpoints[i].ttft_ms.append(won_ms)
+                for j in alive - {i}:
+                    tasks[j].cancel()
+                    endpoints[j].cancelled += 1
+                    # 落败方的首 token 延迟至少是已等待的时长，按下界记入，否则慢请求的样本被丢掉、
+                    # p95 与排名都偏乐观；等待时长还不及胜出方的首 token 延迟时，下界说明不了什么，不记
+                    lost_ms = (now - launched_at[j]) * 1000
+                    if lost_ms >= won_ms:
+                        endpoints[j].ttft_ms.append(lost_ms)
+
+            if i != winner:
+                continue
+            if kind == "delta":
+                yield value
+            elif kind == "end":
+                return
+            else:
+                raise value
+    finally:
+        pending = [t for t in tasks.values() if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -0,0 +1,259 @@
+"""按 token 预算维护的多轮对话上下文。
+
+请求消息依次为：历史摘要（system）→ 近期轮次（user / assistant 原文）→ 本轮用户输入。
+前缀只在追加轮次或摘要压缩时变化，且追加只发生在末尾，Gateway 可复用上一轮的前缀缓存。
+
+- 历史（摘要 + 近期轮次）超过 context_max_tokens 时，在后台把最早的若干轮压缩进摘要，
+  压缩后的历史回落到预算的一半，避免每轮都改写前缀；压缩不阻塞当前请求
+- 压缩完成前构造请求时，从最早的轮次起临时略去超出预算的部分，请求大小始终不超过预算
+- 压缩失败时直接丢弃这些轮次，内存占用同样有界
+- token 数按字符估算（CJK 字符约 1 token，其余约 4 字符 1 token），仅用于预算控制与统计
+
+上下文增长评估（在 backend 目录下）：
+    python -m pipeline.llm.memory [--turns 40] [--url http://localhost:18789 --token ...]
+回放一段脚本化的多轮对话，逐轮打印不截断与按预算维护两种方式的请求 token 数；
+给出 --url 时向 Gateway 实际发起请求，同时打印首 token 延迟。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from config import OpenClawConfig
+
+# 每条消息的格式开销（role、分隔符）
+_MESSAGE_OVERHEAD = 4
+
+
+def estimate_tokens(text: str) -> int:
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def count_prompt_tokens(messages: list[dict]) -> int:
+    return sum(estimate_tokens(m["content"]) + _MESSAGE_OVERHEAD for m in messages)
+
+
+@dataclass
+class Turn:
+    user: str
+    assistant: str
+
+    @property
+    def tokens(self) -> int:
+        return estimate_tokens(self.user) + estimate_tokens(self.assistant) + 2 * _MESSAGE_OVERHEAD
+
+
+def summary_message(summary: str) -> dict:
+    return {"role": "system", "content": f"以下是此前对话的摘要：\n{summary}"}
+
+
+class ConversationMemory:
+    """对话上下文；summarize(旧摘要, 待压缩轮次) 返回新摘要，在后台任务中调用。"""
+
+    def __init__(self, config: OpenClawConfig, summarize: Callable[[str, list[Turn]], Awaitable[str]]):
+        self.configure(config)
+        self._summarize = summarize
+        self.summary = ""
+        self.turns: list[Turn] = []
+        self._compact_task: asyncio.Task | None = None
+        self._generation = 0  # reset() 后递增，丢弃过期的压缩结果
+        self.compactions = 0
+        self.compaction_failures = 0
+        self.last_compaction_ms: float | None = None
+        self.prompt_tokens: deque[int] = deque(maxlen=50)
+
+    def configure(self, config: OpenClawConfig) -> None:
+        self.max_tokens = config.context_max_tokens
+        self.min_turns = config.context_min_turns
+        self.summary_max_tokens = config.context_summary_max_tokens
+
+    def reset(self) -> None:
+        self.summary = ""
+        self.turns.clear()
+        self._generation += 1
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            self._compact_task = None
+
+    async def close(self) -> None:
+        if self._compact_task is not None:
+            self._compact_task.cancel()
+            await asyncio.gather(self._compact_task, return_exceptions=True)
+            self._compact_task = None
+
+    def history_tokens(self) -> int:
+        tokens = sum(t.tokens for t in self.turns)
+        if self.summary:
+            tokens += estimate_tokens(self.summary) + _MESSAGE_OVERHEAD
+        return tokens
+
+    def messages(self, user_content: str) -> list[dict]:
+        """构造本轮请求的消息列表（只读，不修改记忆）。"""
+        head = [summary_message(self.summary)] if self.summary else []
+        budget = self.max_tokens - count_prompt_tokens(head)
+        turns = self.turns
+        total = sum(t.tokens for t in turns)
+        start = 0
+        while start < len(turns) and total > budget:
+            total -= turns[start].tokens  # 压缩尚未完成，临时略去最早的轮次
+            start += 1
+        messages = head
+        for turn in turns[start:]:
+            messages.append({"role": "user", "content": turn.user})
+            messages.append({"role": "assistant", "content": turn.assistant})
+        messages.append({"role": "user", "content": user_content})
+        self.prompt_tokens.append(count_prompt_tokens(messages))
+        return messages
+
+    def append(self, user_content: str, assistant_text: str) -> None:
+        self.turns.append(Turn(user_content, assistant_text))
+        self._maybe_compact()
+
+    def stats(self) -> dict:
+        return {
+            "turns": len(self.turns),
+            "history_tokens": self.history_tokens(),
+            "summary_tokens": estimate_tokens(self.summary),
+            "last_prompt_tokens": self.prompt_tokens[-1] if self.prompt_tokens else None,
+            "avg_prompt_tokens": round(sum(self.prompt_tokens) / len(self.prompt_tokens))
+            if self.prompt_tokens else None,
+            "compactions": self.compactions,
+            "compaction_failures": self.compaction_failures,
+            "compacting": self._compact_task is not None,
+            "last_compaction_ms": self.last_compaction_ms,
+        }
+
+    def _maybe_compact(self) -> None:
+        if self._compact_task is not None or self.history_tokens() <= self.max_tokens:
+            return
+        # 压缩到预算的一半（含预留给摘要的空间），之后若干轮内前缀保持不变
+        target = self.max_tokens // 2 - self.summary_max_tokens
+        remaining = sum(t.tokens for t in self.turns)
+        count = 0
+        while len(self.turns) - count > self.min_turns and remaining > target:
+            remaining -= self.turns[count].tokens
+            count += 1
+        if count == 0:
+            return
+        self._compact_task = asyncio.create_task(self._compact(self.turns[:count]))
+
+    async def _compact(self, batch: list[Turn]) -> None:
+        generation = self._generation
+        started = time.perf_counter()
+        try:
+            summary = (await self._summarize(self.summary, batch)).strip()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            summary = None
+            self.compaction_failures += 1
+            logger.warning(f"对话历史压缩失败，直接丢弃最早的 {len(batch)} 轮: {e}")
+        if generation != self._generation:
+            return
+        if summary:
+            self.summary = summary
+            self.compactions += 1
+            self.last_compaction_ms = round((time.perf_counter() - started) * 1000, 1)
+            logger.debug(f"对话历史已压缩 {len(batch)} 轮，摘要约 {estimate_tokens(summary)} tokens")
+        # 压缩期间新轮次只会追加在末尾，batch 仍是列表开头的同一批对象
+        del self.turns[:len(batch)]
+        self._compact_task = None
+        self._maybe_compact()
+
+
+def summarize_prompt(summary: str, turns: list[Turn], max_tokens: int) -> str:
+    """压缩请求的提示词：把旧摘要与待压缩轮次合并为新摘要。"""
+    lines = [f"用户：{t.user}\n助手：{t.assistant}" for t in turns]
+    previous = f"已有摘要：\n{summary}\n\n" if summary else ""
+    return (
+        f"{previous}新的对话：\n" + "\n".join(lines) + "\n\n"
+        f"请把已有摘要和新的对话合并为一段新的摘要，保留人名、事实、用户偏好和未完成的话题，"
+        f"不超过 {max_tokens} 字，只输出摘要本身。"
+    )
+
+
+# ── 上下文增长评估 ───────────────────────────────────────────────────────────
+
+_SCRIPT = [
+    "你好呀，今天直播玩什么游戏？",
+    "我昨天也玩了这个，卡在第三关了，有什么技巧吗？",
+    "原来如此，那个 boss 的弱点是什么？",
+    "我叫小林，是从北京来看直播的。",
+    "你还记得我刚才说卡在哪一关吗？",
+    "给我推荐几首适合打游戏时听的歌吧。",
+    "第二首是谁唱的？",
+    "今天北京下雨了，你那边天气怎么样？",
+]
+
+
+def _fake_reply(question: str) -> str:
+    return f"关于“{question[:8]}”，我想想哦，这个问题挺有意思的，我们可以慢慢聊，先说说我的看法吧。"
+
+
+async def _offline_summarize(summary: str, turns: list[Turn]) -> str:
+    """离线评估用：截取每轮用户输入作为摘要。"""
+    await asyncio.sleep(0)
+    return (summary + " " + "；".join(t.user[:12] for t in turns))[-200:]
+
+
+async def _evaluate(args) -> None:
+    config = OpenClawConfig(
+        url=args.url or "http://localhost:18789",
+        token=args.token,
+        context_enabled=True,
+        context_max_tokens=args.budget,
+    )
+    llm = None
+    if args.url:
+        from pipeline.llm.openclaw_llm import OpenClawLLMPipeline
+        llm = OpenClawLLMPipeline(config)
+        memory = llm.memory
+    else:
+        memory = ConversationMemory(config, _offline_summarize)
+
+    naive: list[dict] = []
+    print(f"{'turn':>4}{'naive':>8}{'budgeted':>10}{'ttft(ms)':>10}  summary")
+    try:
+        for i in range(args.turns):
+            question = _SCRIPT[i % len(_SCRIPT)]
+            naive.append({"role": "user", "content": question})
+            naive_tokens = count_prompt_tokens(naive)
+            ttft = None
+            if llm is not None:
+                await llm.generate(question)
+                ttft = llm.last_ttft_ms
+                reply = memory.turns[-1].assistant if memory.turns else ""
+            else:
+                memory.messages(question)
+                reply = _fake_reply(question)
+                memory.append(question, reply)
+            naive.append({"role": "assistant", "content": reply})
+            await asyncio.sleep(0.01)  # 让后台压缩有机会完成
+            ttft_text = f"{ttft:.0f}" if ttft is not None else "-"
+            print(f"{i + 1:>4}{naive_tokens:>8}{memory.prompt_tokens[-1]:>10}{ttft_text:>10}"
+                  f"  {estimate_tokens(memory.summary)} tokens / {memory.compactions} 次压缩")
+    finally:
+        if llm is not None:
+            await llm.close()
+        else:
+            await memory.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="逐轮比较不截断与按预算维护上下文的请求 token 数")
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=OpenClawConfig().context_max_tokens, help="上下文 token 预算")
+    parser.add_argument("--url", default="", help="Gateway 地址，给出时实际发起请求并测量首 token 延迟")
+    parser.add_argument("--token", default="")
+    asyncio.run(_evaluate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
 import json
-import re
+import time
+from collections import deque
+from typing import AsyncIterator
 from loguru import logger
 
 import httpx
 
-from config import OpenClawConfig
+from config import CharacterConfig, OpenClawConfig
 from core.event_bus import bus, Event
+from core.tracing import tracer
 from pipeline.llm.base import BaseLLMPipeline
-
-# 句子边界正则
-_SENTENCE_END = re.compile(r"[。！？!?\n]")
+from pipeline.llm.endpoints import Endpoint, GatewayError, hedged_stream, rank_endpoints
+from pipeline.llm.memory import ConversationMemory, Turn, count_prompt_tokens, estimate_tokens, summarize_prompt
+from pipeline.llm.response_cache import CachedResponse, ResponseCache, character_namespace
+from pipeline.llm.segmenter import SentenceSegmenter, split_sentences
 
 # 用户情感映射（ASR 输出 → 附加到 user message 的中文标签）
 _EMOTION_MAP = {
@@ -24,6 +29,20 @@ _EMOTION_MAP = {
     "disgusted": "厌恶",
 }
 
+# 建连超时（读超时沿用 timeout_ms）
+_CONNECT_TIMEOUT_S = 5.0
+# 探针请求超时
+_PROBE_TIMEOUT_S = 5.0
+# 端点首 token 延迟样本不足时的对冲预算（ms）
+_HEDGE_DEFAULT_MS = 2000.0
+# 收到 [DONE] 后读完剩余响应体的时限
+_DRAIN_TIMEOUT_S = 0.1
+
+
+async def _drain(lines: AsyncIterator[str]) -> None:
+    async for _ in lines:
+        pass
+
 
 class OpenClawLLMPipeline(BaseLLMPipeline):
     """通过 OpenClaw Gateway HTTP 接口实现的 LLM Pipeline。
@@ -32,10 +51,211 @@ class OpenClawLLMPipeline(BaseLLMPipeline):
     - LLM_CHUNK：每个 SSE delta
     - LLM_SENTENCE：按句子边界切割的文本片段（含情感）
     - LLM_DONE：流结束
+
+    持有一个长连接 httpx.AsyncClient（keep-alive，可选 HTTP/2），每轮对话复用已建立的连接；
+    后台定期请求 /probe 做健康检查，同时保持连接池温热。配置变更时新请求改用新客户端，
+    旧客户端在其上的请求全部结束后再关闭。
+
+    配置了 fallback_urls 时为多端点模式：首 token 超过对冲预算（默认为该端点首 token
+    延迟的 p95）仍未到达就向下一个端点发出对冲请求，采用先出首 token 的一方并取消其余请求；
+    建连失败 / 错误状态码时立即改投下一个端点（见 pipeline.llm.endpoints）。
+
+    启用 context_enabled 时在请求中携带按 token 预算维护的多轮上下文，
+    较早的轮次在后台压缩为摘要（见 pipeline.llm.memory）。
+
+    启用 response_cache_enabled 时，相同 / 相近的问题直接回放缓存的情感、原始文本块与句子，
+    事件顺序与实时生成一致（LLM_TEXT_CHUNK → LLM_SENTENCE → LLM_DONE），不产生 LLM_CHUNK。
+    同时启用 context_enabled 时不查也不写缓存：回复取决于上下文，同一句话在不同对话中答案不同。
     """
 
     def __init__(self, config: OpenClawConfig):
         self.config = config
+        self._client: httpx.AsyncClient | None = None
+        self._client_key: tuple | None = None
+        self._active: dict[httpx.AsyncClient, int] = {}  # 客户端 → 在途请求数
+        self._retired: set[httpx.AsyncClient] = set()
+        self._probe_task: asyncio.Task | None = None
+        self.endpoints: list[Endpoint] = []
+        self._sync_endpoints()
+        self.healthy: bool | None = None   # 任一端点可用即为 True，None 表示尚未探测
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.output_tokens = 0         # 流式输出的估算 token 数（含情感 JSON）
+        self.stream_seconds = 0.0      # 首 token 到流结束的累计时长
+        self.last_tokens_per_s: float | None = None
+        self.last_ttft_ms: float | None = None
+        self._ttft_total_ms = 0.0
+        self._ttft_count = 0
+        self._recent_turns: deque[dict] = deque(maxlen=20)  # 最近各轮的请求 token 数与首 token 延迟
+        self.memory = ConversationMemory(config, self._summarize)
+        self.cache: ResponseCache | None = None
+        self.cache_namespace = ""
+        self._configure_cache()
+
+    def start(self) -> None:
+        """启动后台健康检查 / 保温任务（首次探测立即进行）。"""
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def close(self) -> None:
+        await self.memory.close()
+        if self._probe_task:
+            self._probe_task.cancel()
+            self._probe_task = None
+        clients = set(self._active) | self._retired
+        if self._client is not None:
+            clients.add(self._client)
+        self._client = None
+        self._active.clear()
+        self._retired.clear()
+        await asyncio.gather(*(c.aclose() for c in clients), return_exceptions=True)
+
+    def update_config(self, config: OpenClawConfig) -> None:
+        """热更新配置：连接相关参数变化时换用新客户端，旧客户端待在途请求结束后关闭。"""
+        self.config = config
+        self._configure_cache()
+        self._sync_endpoints()
+        self.memory.configure(config)
+        if not config.context_enabled:
+            self.memory.reset()
+        if self._client is not None and self._client_key != self._connection_key():
+            self._retire(self._client)
+            self._client = None
+            self.healthy = None
+            logger.info("OpenClaw 连接配置变更，后续请求使用新连接")
+            if self._probe_task is not None:
+                # 立即探测新地址，同时为新客户端建立连接
+                self._probe_task.cancel()
+                self._probe_task = asyncio.create_task(self._probe_loop())
+
+    def stats(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "last_tokens_per_s": self.last_tokens_per_s,
+            "last_ttft_ms": self.last_ttft_ms,
+            "avg_ttft_ms": self._ttft_total_ms / self._ttft_count if self._ttft_count else None,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "endpoints": [e.stats() for e in self.endpoints],
+            "context": self.memory.stats() if self.config.context_enabled else None,
+            "recent_turns": list(self._recent_turns),
+        }
+
+    def _urls(self) -> list[str]:
+        urls = [self.config.url, *self.config.fallback_urls]
+        return [u.rstrip("/") for i, u in enumerate(urls) if u and u not in urls[:i]]
+
+    def _sync_endpoints(self) -> None:
+        """按配置重建端点列表，保留仍在配置中的端点的延迟统计。"""
+        known = {e.url: e for e in self.endpoints}
+        self.endpoints = [known.get(url) or Endpoint(url) for url in self._urls()]
+
+    def _hedge_after_ms(self, endpoint: Endpoint) -> float:
+        if self.config.hedge_after_ms > 0:
+            return self.config.hedge_after_ms
+        p95 = endpoint.percentile(95)
+        if p95 is None:
+            return _HEDGE_DEFAULT_MS
+        return max(p95, self.config.hedge_min_ms)
+
+    def set_character(self, character: CharacterConfig) -> None:
+        namespace = character_namespace(character)
+        if self.cache_namespace and namespace != self.cache_namespace:
+            self.memory.reset()  # 换了角色，之前的对话上下文不再适用
+        self.cache_namespace = namespace
+
+    def _configure_cache(self) -> None:
+        c = self.config
+        if not c.response_cache_enabled:
+            self.cache = None
+        elif self.cache is None:
+            self.cache = ResponseCache(c.response_cache_max_entries, c.response_cache_ttl_s,
+                                       c.response_cache_similarity)
+        else:
+            self.cache.configure(c.response_cache_max_entries, c.response_cache_ttl_s,
+                                 c.response_cache_similarity)
+
+    def _connection_key(self) -> tuple:
+        return (tuple(self._urls()), self.config.http2)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            http2 = self.config.http2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("未安装 h2，OpenClaw 连接回退为 HTTP/1.1 keep-alive")
+                    http2 = False
+            self._client = httpx.AsyncClient(
+                http2=http2,
+                timeout=httpx.Timeout(self.config.timeout_ms / 1000.0, connect=_CONNECT_TIMEOUT_S),
+                limits=httpx.Limits(
+                    max_keepalive_connections=4,
+                    keepalive_expiry=max(self.config.keepalive_interval_s * 2, 30.0),
+                ),
+            )
+            self._client_key = self._connection_key()
+        return self._client
+
+    def _acquire(self) -> httpx.AsyncClient:
+        client = self._get_client()
+        self._active[client] = self._active.get(client, 0) + 1
+        return client
+
+    def _release(self, client: httpx.AsyncClient) -> None:
+        self._active[client] -= 1
+        if self._active[client] <= 0:
+            del self._active[client]
+            if client in self._retired:
+                self._retired.discard(client)
+                asyncio.ensure_future(client.aclose())
+
+    def _retire(self, client: httpx.AsyncClient) -> None:
+        if client in self._active:
+            self._retired.add(client)
+        else:
+            asyncio.ensure_future(client.aclose())
+
+    async def _probe_loop(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(max(self.config.keepalive_interval_s, 1.0))
+
+    async def probe(self) -> bool:
+        """探测全部端点：检查 Gateway 连通性，顺带保持 keep-alive 连接不被回收。"""
+        results = await asyncio.gather(*(self._probe_endpoint(e) for e in self.endpoints))
+        healthy = any(results)
+        if self.healthy is False and healthy:
+            logger.info("OpenClaw Gateway 已恢复可用")
+        self.healthy = healthy
+        return healthy
+
+    async def _probe_endpoint(self, endpoint: Endpoint) -> bool:
+        url = endpoint.url
+        client = self._acquire()
+        try:
+            r = await client.get(f"{url}/probe", timeout=_PROBE_TIMEOUT_S)
+            healthy = r.status_code < 400
+            if not healthy and endpoint.healthy is not False:
+                logger.error(
+                    f"OpenClaw Gateway /probe 返回 HTTP {r.status_code}，LLM 功能可能不可用"
+                )
+        except Exception as e:
+            healthy = False
+            if endpoint.healthy is not False:
+                logger.error(
+                    f"OpenClaw Gateway 不可达（{url}/probe）: {e}，LLM 功能不可用，ASR/TTS 仍正常运行"
+                )
+        finally:
+            self._release(client)
+        if healthy and endpoint.healthy is not True:
+            logger.info(f"OpenClaw Gateway 连接正常（{url}）")
+        endpoint.healthy = healthy
+        return healthy
 
     def set_tool_registry(self, registry) -> None:
         """no-op：工具能力由 OpenClaw Gateway 内部处理。"""
@@ -49,15 +269,22 @@ class OpenClawLLMPipeline(BaseLLMPipeline):
         """no-op：长期记忆由 OpenClaw 的 memory-lancedb 扩展处理。"""
         return ""
 
-    async def generate(self, user_text: str, user_emotion: str = "neutral") -> None:
+    async def generate(self, user_text: str, user_emotion: str = "neutral", trace: str | None = None) -> None:
         """向 OpenClaw Gateway 发起流式请求，将结果通过事件总线发布。"""
-        # 用户情感注入
-        content = user_text
-        if user_emotion and user_emotion not in ("neutral", ""):
-            mapped = _EMOTION_MAP.get(user_emotion, user_emotion)
-            content = f"{user_text}[用户语气：{mapped}]"
+        cache = None if self.config.context_enabled else self.cache
+        if cache is not None:
+            cached = cache.get(self.cache_namespace, user_text)
+            if cached is not None:
+                self._replay(cached, trace)
+                return
+
+        content = self._user_content(user_text, user_emotion)
+        if self.config.context_enabled:
+            messages = self.memory.messages(content)
+        else:
+            messages = [{"role": "user", "content": content}]
+        prompt_tokens = count_prompt_tokens(messages)
 
-        url = f"{self.config.url}/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.config.token}",
             "Content-Type": "application/json",
@@ -66,121 +293,228 @@ class OpenClawLLMPipeline(BaseLLMPipeline):
         payload = {
             "model": "openclaw",
             "stream": True,
-            "messages": [{"role": "user", "content": content}],
+            "messages": messages,
         }
-        timeout = httpx.Timeout(self.config.timeout_ms / 1000.0)
 
         buf = ""
+        raw_tokens = 0
+        first_at = 0.0
+        reply_text = ""  # 情感 JSON 之后的回复正文，写入对话上下文
         emotion_parsed = False
         current_emotion = "平静"
+        self.requests += 1
+        started = time.perf_counter()
+        first_token = True
+        segmenter = SentenceSegmenter(self.config)
+        sentences: list[str] = []
+        chunks: list[str] = []      # 原样发出的 LLM_TEXT_CHUNK，缓存回放时保留空白与分块
+        chunk_marks: list[int] = []  # 每句发出前已发出的文本块数
+        first_sentence_ms = 0.0
+
+        def emit_text(text: str) -> None:
+            chunks.append(text)
+            bus.emit(Event.LLM_TEXT_CHUNK, {"text": text})
+
+        def emit_sentence(sentence: str) -> None:
+            nonlocal first_sentence_ms
+            if not sentences:
+                first_sentence_ms = (time.perf_counter() - started) * 1000
+            sentences.append(sentence)
+            chunk_marks.append(len(chunks))
+            tracer.sentence(trace)
+            bus.emit(Event.LLM_SENTENCE, {"text": sentence, "emotion": current_emotion, "trace": trace})
+
+        def open_stream(endpoint: Endpoint) -> AsyncIterator[str]:
+            return self._stream_deltas(endpoint, headers, payload)
 
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                async with client.stream("POST", url, headers=headers, json=payload) as response:
-                    if response.status_code >= 400:
-                        body = (await response.aread()).decode("utf-8", errors="replace")
-                        logger.error(
-                            f"OpenClaw Gateway 返回 HTTP {response.status_code}，跳过本轮生成: {body[:200]}"
-                        )
-                        return
-
-                    async for line in response.aiter_lines():
-                        if not line.startswith("data:"):
-                            continue
-                        data_str = line[5:].strip()
-                        if data_str == "[DONE]":
-                            break
-
-                        try:
-                            chunk = json.loads(data_str)
-                        except json.JSONDecodeError:
-                            continue
-
-                        delta = ""
-                        try:
-                            delta = chunk["choices"][0]["delta"].get("content") or ""
-                        except (KeyError, IndexError):
-                            continue
-
-                        if not delta:
-                            continue
-
-                        buf += delta
-                        bus.emit(Event.LLM_CHUNK, {"text": delta})
-
-                        just_parsed_emotion = False
-                        if not emotion_parsed:
-                            # 等第一个 } 出现，尝试解析情感 JSON
-                            if "}" in buf:
-                                try:
-                                    end = buf.index("}") + 1
-                                    parsed = json.loads(buf[:end].strip())
-                                    current_emotion = parsed.get("emotion", current_emotion)
-                                    buf = buf[end:].lstrip("\n")
-                                except (ValueError, json.JSONDecodeError):
-                                    logger.debug(f"情感 JSON 解析失败，fallback 为平静: {buf[:buf.index('}')+1]!r}")
-                                emotion_parsed = True
-                                just_parsed_emotion = True
-                                # 发布情感 JSON 之后的剩余真实文本
-                                if buf:
-                                    bus.emit(Event.LLM_TEXT_CHUNK, {"text": buf})
-                        elif not just_parsed_emotion:
-                            # 后续 delta 全部是真实文本
-                            bus.emit(Event.LLM_TEXT_CHUNK, {"text": delta})
-
-                        if emotion_parsed:
-                            # 按句子边界实时发出
-                            while True:
-                                m = _SENTENCE_END.search(buf)
-                                if not m:
-                                    break
-                                sentence = buf[: m.end()].strip()
-                                buf = buf[m.end():]
-                                if sentence:
-                                    bus.emit(
-                                        Event.LLM_SENTENCE,
-                                        {"text": sentence, "emotion": current_emotion},
-                                    )
+            deltas = hedged_stream(open_stream, rank_endpoints(self.endpoints), self._hedge_after_ms)
+            async with contextlib.aclosing(deltas):
+                async for delta in deltas:
+                    if first_token:
+                        first_token = False
+                        first_at = time.perf_counter()
+                        ttft_ms = (first_at - started) * 1000
+                        tracer.mark(trace, "llm_first_token")
+                        self._record_ttft(ttft_ms)
+                        self._recent_turns.append({"prompt_tokens": prompt_tokens, "ttft_ms": round(ttft_ms, 1)})
+                    buf += delta
+                    raw_tokens += estimate_tokens(delta)
+                    bus.emit(Event.LLM_CHUNK, {"text": delta})
+
+                    just_parsed_emotion = False
+                    if not emotion_parsed:
+                        # 等第一个 } 出现，尝试解析情感 JSON
+                        if "}" in buf:
+                            try:
+                                end = buf.index("}") + 1
+                                parsed = json.loads(buf[:end].strip())
+                                current_emotion = parsed.get("emotion", current_emotion)
+                                buf = buf[end:].lstrip("\n")
+                            except (ValueError, json.JSONDecodeError):
+                                logger.debug(f"情感 JSON 解析失败，fallback 为平静: {buf[:buf.index('}')+1]!r}")
+                            emotion_parsed = True
+                            just_parsed_emotion = True
+                            # 发布情感 JSON 之后的剩余真实文本
+                            if buf:
+                                reply_text += buf
+                                emit_text(buf)
+                    elif not just_parsed_emotion:
+                        # 后续 delta 全部是真实文本
+                        reply_text += delta
+                        emit_text(delta)
+
+                    if emotion_parsed:
+                        # 交给分句器，句末或足够长的分句处实时发出
+                        for sentence in segmenter.feed(buf):
+                            emit_sentence(sentence)
+                        buf = ""
 
             # 流结束后处理剩余内容
-            if buf.strip():
-                if not emotion_parsed:
-                    # fallback：整个输出都在 buf，尝试提取情感
-                    try:
-                        end = buf.index("}") + 1
-                        parsed = json.loads(buf[:end].strip())
-                        current_emotion = parsed.get("emotion", current_emotion)
-                        buf = buf[end:].lstrip("\n")
-                    except (ValueError, json.JSONDecodeError):
-                        pass
-                for sentence in _split_sentences(buf.strip()):
-                    bus.emit(Event.LLM_SENTENCE, {"text": sentence, "emotion": current_emotion})
+            if not emotion_parsed and buf.strip():
+                # fallback：整个输出都在 buf，尝试提取情感
+                try:
+                    end = buf.index("}") + 1
+                    parsed = json.loads(buf[:end].strip())
+                    current_emotion = parsed.get("emotion", current_emotion)
+                    buf = buf[end:].lstrip("\n")
+                except (ValueError, json.JSONDecodeError):
+                    pass
+                reply_text = buf.strip()
+                rest = split_sentences(reply_text, self.config)
+            else:
+                rest = segmenter.flush()
+            for sentence in rest:
+                emit_sentence(sentence)
+
+            if cache is not None:
+                cache.put(self.cache_namespace, user_text, CachedResponse(
+                    emotion=current_emotion,
+                    sentences=sentences,
+                    chunks=chunks,
+                    chunk_marks=chunk_marks,
+                    first_sentence_ms=first_sentence_ms,
+                    total_ms=(time.perf_counter() - started) * 1000,
+                ))
 
         except httpx.ConnectError:
+            self.errors += 1
             logger.error(
-                f"无法连接到 OpenClaw Gateway（{self.config.url}），请确认 Gateway 已启动"
+                f"无法连接到 OpenClaw Gateway（{', '.join(self._urls())}），请确认 Gateway 已启动"
             )
         except httpx.TimeoutException:
+            self.timeouts += 1
             logger.warning(f"OpenClaw Gateway 请求超时（{self.config.timeout_ms}ms）")
+        except GatewayError as e:
+            self.errors += 1
+            logger.error(f"{e}，跳过本轮生成")
         except asyncio.CancelledError:
             pass  # 被主动取消（用户打断），由 finally 负责清理
         except Exception as e:
+            self.errors += 1
             logger.error(f"OpenClaw LLM 调用失败: {e}")
         finally:
+            if first_at:
+                stream_s = time.perf_counter() - first_at
+                self.output_tokens += raw_tokens
+                self.stream_seconds += stream_s
+                if stream_s > 0:
+                    self.last_tokens_per_s = round(raw_tokens / stream_s, 1)
+            if self.config.context_enabled and reply_text.strip():
+                # 被打断的轮次也记录已生成的部分，让模型知道上一轮说到哪里；其中可能含有
+                # 已生成但尚未播放（或播放被打断）的句子，并不等于用户实际听到的内容
+                self.memory.append(content, reply_text.strip())
             bus.emit(Event.LLM_DONE, {})
+            tracer.llm_done(trace)
 
+    @staticmethod
+    def _user_content(user_text: str, user_emotion: str) -> str:
+        """用户情感注入。"""
+        if user_emotion and user_emotion not in ("neutral", ""):
+            mapped = _EMOTION_MAP.get(user_emotion, user_emotion)
+            return f"{user_text}[用户语气：{mapped}]"
+        return user_text
 
-def _split_sentences(text: str) -> list[str]:
-    """按句子边界切割文本，返回非空句子列表。"""
-    sentences: list[str] = []
-    buf = text.strip()
-    while buf:
-        m = _SENTENCE_END.search(buf)
-        if not m:
-            sentences.append(buf)
-            break
-        sentence = buf[: m.end()].strip()
-        buf = buf[m.end():]
-        if sentence:
-            sentences.append(sentence)
-    return sentences
+    async def _summarize(self, summary: str, turns: list[Turn]) -> str:
+        """对话上下文压缩：以非流式请求让 Gateway 合并摘要。"""
+        prompt = summarize_prompt(summary, turns, self.config.context_summary_max_tokens)
+        return await self._complete([{"role": "user", "content": prompt}])
+
+    async def _complete(self, messages: list[dict]) -> str:
+        """向排名第一的端点发起一次非流式请求，返回回复正文。"""
+        endpoint = rank_endpoints(self.endpoints)[0]
+        client = self._acquire()
+        try:
+            r = await client.post(
+                f"{endpoint.url}/v1/chat/completions",
+                headers={"Authorization": f"Bearer {self.config.token}", "Content-Type": "application/json"},
+                json={"model": "openclaw", "stream": False, "messages": messages},
+                timeout=httpx.Timeout(self.config.timeout_ms / 1000.0, connect=_CONNECT_TIMEOUT_S),
+            )
+            if r.status_code >= 400:
+                raise GatewayError(f"OpenClaw Gateway（{endpoint.url}）返回 HTTP {r.status_code}: {r.text[:200]}")
+            return r.json()["choices"][0]["message"]["content"] or ""
+        finally:
+            self._release(client)
+
+    async def _stream_deltas(self, endpoint: Endpoint, headers: dict, payload: dict) -> AsyncIterator[str]:
+        """向单个端点发起流式请求，逐个产出 SSE 中的文本 delta。"""
+        timeout = httpx.Timeout(self.config.timeout_ms / 1000.0, connect=_CONNECT_TIMEOUT_S)
+        client = self._acquire()
+        try:
+            async with client.stream(
+                "POST", f"{endpoint.url}/v1/chat/completions", headers=headers, json=payload, timeout=timeout
+            ) as response:
+                if response.status_code >= 400:
+                    body = (await response.aread()).decode("utf-8", errors="replace")
+                    raise GatewayError(
+                        f"OpenClaw Gateway（{endpoint.url}）返回 HTTP {response.status_code}: {body[:200]}"
+                    )
+
+                lines = response.aiter_lines()
+                async for line in lines:
+                    if not line.startswith("data:"):
+                        continue
+                    data_str = line[5:].strip()
+                    if data_str == "[DONE]":
+                        # 读完剩余响应体（含分块结束标记）连接才能放回连接池复用；Gateway 在 [DONE]
+                        # 之后迟迟不结束响应时不再等待，退出 stream 上下文即关闭该连接
+                        with contextlib.suppress(asyncio.TimeoutError):
+                            await asyncio.wait_for(_drain(lines), _DRAIN_TIMEOUT_S)
+                        break
+
+                    try:
+                        chunk = json.loads(data_str)
+                    except json.JSONDecodeError:
+                        continue
+
+                    try:
+                        delta = chunk["choices"][0]["delta"].get("content") or ""
+                    except (KeyError, IndexError):
+                        continue
+
+                    if delta:
+                        yield delta
+        finally:
+            self._release(client)
+
+    def _replay(self, cached: CachedResponse, trace: str | None) -> None:
+        logger.info(f"[LLM 缓存] 命中，回放 {len(cached.sentences)} 句（节省约 {cached.total_ms:.0f}ms）")
+        emitted = 0
+        for sentence, mark in zip(cached.sentences, cached.chunk_marks):
+            # 按原始交错顺序回放：先发该句之前的原始文本块，再发句子
+            for chunk in cached.chunks[emitted:mark]:
+                bus.emit(Event.LLM_TEXT_CHUNK, {"text": chunk})
+            emitted = mark
+            tracer.sentence(trace)
+            bus.emit(Event.LLM_SENTENCE, {"text": sentence, "emotion": cached.emotion, "trace": trace})
+        for chunk in cached.chunks[emitted:]:
+            bus.emit(Event.LLM_TEXT_CHUNK, {"text": chunk})
+        bus.emit(Event.LLM_DONE, {})
+        tracer.llm_done(trace)
+
+    def _record_ttft(self, ms: float) -> None:
+        self.last_ttft_ms = round(ms, 1)
+        self._ttft_total_ms += ms
+        self._ttft_count += 1
+        logger.debug(f"OpenClaw 首 token 延迟 {ms:.0f}ms")
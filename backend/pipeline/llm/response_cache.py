@@ -0,0 +1,168 @@
+"""LLM 回复缓存：直播间反复出现的相同问题直接回放上次的回复，省去一次完整的 Gateway 往返。
+
+- 键为归一化后的用户文本：全角 / 半角折叠（NFKC）、转小写、去掉情感后缀与标点空白
+- 近似匹配：字符 bigram 倒排索引，Dice 系数不低于 similarity 即视为同一问题；
+  数字不同的问题（"1+1等于几" / "1+2等于几"）永不匹配
+- 按角色划分命名空间，角色名或人设变化后旧回复不再命中
+- 条目超过 TTL 即失效，总数超过上限时淘汰最久未用的条目
+"""
+from __future__ import annotations
+
+import hashlib
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from config import CharacterConfig
+
+# generate() 注入的情感后缀，如 "[用户语气：开心]"
+_EMOTION_SUFFIX = re.compile(r"\[用户语气：[^\]]*\]\s*$")
+_DIGITS = re.compile(r"\d+")
+
+
+def normalize_text(text: str) -> str:
+    """归一化用户文本：去情感后缀，NFKC 折叠全角字符，转小写，只保留文字与数字。"""
+    text = _EMOTION_SUFFIX.sub("", text)
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] in "LN")
+
+
+def character_namespace(character: CharacterConfig) -> str:
+    """角色命名空间：角色名 + 人设摘要。"""
+    digest = hashlib.sha1(character.persona.encode("utf-8")).hexdigest()[:8]
+    return f"{character.name}:{digest}"
+
+
+def _grams(text: str) -> set[str]:
+    if len(text) < 2:
+        return {text}
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+@dataclass
+class CachedResponse:
+    emotion: str
+    sentences: list[str]
+    chunks: list[str]         # 原始 LLM_TEXT_CHUNK 文本，保留空白与分块
+    chunk_marks: list[int]    # 每句之前已发出的文本块数，回放时按原顺序交错
+    first_sentence_ms: float  # 原始请求到第一句发出的耗时
+    total_ms: float           # 原始请求的完整耗时
+    created: float = field(default_factory=time.monotonic)
+    hits: int = 0
+
+
+class ResponseCache:
+    """内存 LRU + 倒排索引。仅在事件循环中访问，无需加锁。"""
+
+    def __init__(self, max_entries: int, ttl_s: float, similarity: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self._entries: OrderedDict[tuple[str, str], CachedResponse] = OrderedDict()
+        self._grams: dict[tuple[str, str], set[str]] = {}
+        self._index: dict[tuple[str, str], set[tuple[str, str]]] = {}  # (命名空间, bigram) → 键
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.saved_first_sentence_ms = 0.0
+        self.saved_total_ms = 0.0
+
+    def configure(self, max_entries: int, ttl_s: float, similarity: float) -> None:
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.similarity = similarity
+        self._evict()
+
+    def get(self, namespace: str, text: str) -> CachedResponse | None:
+        norm = normalize_text(text)
+        if not norm:
+            return None
+        key = (namespace, norm)
+        entry = self._fresh(key)
+        if entry is None:
+            key = self._nearest(namespace, norm)
+            entry = self._fresh(key) if key is not None else None
+            if entry is not None:
+                self.near_hits += 1
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        entry.hits += 1
+        self.hits += 1
+        self.saved_first_sentence_ms += entry.first_sentence_ms
+        self.saved_total_ms += entry.total_ms
+        return entry
+
+    def put(self, namespace: str, text: str, response: CachedResponse) -> None:
+        norm = normalize_text(text)
+        if not norm or not response.sentences:
+            return
+        key = (namespace, norm)
+        self._drop(key)
+        self._entries[key] = response
+        grams = self._grams[key] = _grams(norm)
+        for gram in grams:
+            self._index.setdefault((namespace, gram), set()).add(key)
+        self._evict()
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._grams.clear()
+        self._index.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "saved_first_sentence_ms": round(self.saved_first_sentence_ms),
+            "saved_total_ms": round(self.saved_total_ms),
+        }
+
+    def _fresh(self, key: tuple[str, str]) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry.created > self.ttl_s:
+            self._drop(key)
+            self.expired += 1
+            return None
+        return entry
+
+    def _nearest(self, namespace: str, norm: str) -> tuple[str, str] | None:
+        """按 bigram 重合度找最相近的已缓存问题，Dice 系数低于阈值或数字不同时返回 None。"""
+        grams = _grams(norm)
+        counts: dict[tuple[str, str], int] = {}
+        for gram in grams:
+            for key in self._index.get((namespace, gram), ()):
+                counts[key] = counts.get(key, 0) + 1
+        digits = _DIGITS.findall(norm)
+        best, best_score = None, self.similarity
+        for key, common in counts.items():
+            score = 2 * common / (len(grams) + len(self._grams[key]))
+            if score >= best_score and _DIGITS.findall(key[1]) == digits:
+                best, best_score = key, score
+        return best
+
+    def _evict(self) -> None:
+        while len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: tuple[str, str]) -> None:
+        if self._entries.pop(key, None) is None:
+            return
+        for gram in self._grams.pop(key, ()):
+            keys = self._index.get((key[0], gram))
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._index[(key[0], gram)]
@@ -0,0 +1,213 @@
+"""LLM 流式输出的分句器：尽早把第一段交给 TTS，同时避免碎片化。
+
+规则：
+- 句末标点（。！？!?、换行）处切分；短于 sentence_merge_min_chars 的碎句与后文合并
+- 分句（，、；：,;:）处也可切分：回复的第一段达到 sentence_first_min_chars 即切，
+  之后的段落需达到 sentence_clause_min_chars，避免 TTS 请求过多
+- 引号、括号内不切分（超过 sentence_max_chars 时例外）；紧随其后的右引号 / 右括号并入本段
+- 数字中的 , . :（如 1,000 / 3.14 / 12:30）不视为边界；位于缓冲末尾时等下一个字符再判断
+
+基准（在 backend 目录下）：
+    python -m pipeline.llm.segmenter [录制的 token 流.jsonl]
+按录制时间戳回放 token 流，比较仅按句末标点切分与本分句器的首段延迟和分段数。
+JSONL 每行为 {"tokens": [[毫秒时间戳, "文本"], ...]}；不给文件时使用内置样例。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+
+from config import OpenClawConfig
+
+_HARD = set("。！？!?\n")
+_CLAUSE = set("，、；：,;:")
+_OPEN = {"“": "”", "‘": "’", "「": "」", "『": "』", "（": "）", "(": ")", "《": "》", "【": "】"}
+_CLOSE = set(_OPEN.values())
+_SYMMETRIC = '"'
+# 数字中可能出现的分隔符
+_NUMERIC_SEP = set(",.:")
+
+
+class SentenceSegmenter:
+    """增量分句：feed() 追加文本并返回可以立即发出的段落，flush() 取出剩余内容。"""
+
+    def __init__(self, config: OpenClawConfig):
+        self.first_min = config.sentence_first_min_chars
+        self.clause_min = config.sentence_clause_min_chars
+        self.merge_min = config.sentence_merge_min_chars
+        self.max_chars = config.sentence_max_chars
+        self._buf = ""
+        self._scan = 0          # 已扫描到的位置
+        self._depth = 0         # 当前引号 / 括号嵌套深度
+        self._symmetric = False  # 英文双引号是否处于打开状态
+        self._emitted = 0       # 已发出的段数
+
+    def feed(self, text: str) -> list[str]:
+        self._buf += text
+        out: list[str] = []
+        i = self._scan
+        while i < len(self._buf):
+            ch = self._buf[i]
+            if ch in _OPEN:
+                self._depth += 1
+            elif ch in _CLOSE:
+                self._depth = max(0, self._depth - 1)
+            elif ch == _SYMMETRIC:
+                self._symmetric = not self._symmetric
+            elif ch in _HARD or ch in _CLAUSE:
+                if ch in _NUMERIC_SEP and i > 0 and self._buf[i - 1].isdigit():
+                    if i + 1 >= len(self._buf):
+                        break  # 等下一个字符确认是否为数字
+                    if self._buf[i + 1].isdigit():
+                        i += 1
+                        continue
+                boundary = self._boundary_end(i)
+                if boundary is None:
+                    break  # 右引号可能随后到达
+                end, still_open = boundary
+                if self._should_split(ch, end, still_open):
+                    out.append(self._cut(end))
+                    i = 0
+                    continue
+            i += 1
+        self._scan = i
+        return [s for s in out if s]
+
+    def flush(self) -> list[str]:
+        rest = self._buf.strip()
+        self._buf = ""
+        self._scan = 0
+        self._depth = 0
+        self._symmetric = False
+        if not rest:
+            return []
+        self._emitted += 1
+        return [rest]
+
+    def _boundary_end(self, i: int) -> tuple[int, bool] | None:
+        """边界字符之后紧跟的右引号 / 右括号并入本段。
+
+        返回 (段落结束位置, 结束处是否仍在引号内)；停在缓冲末尾且引号未闭合时返回 None，等待更多输入。
+        """
+        end = i + 1
+        depth, symmetric = self._depth, self._symmetric
+        while end < len(self._buf):
+            c = self._buf[end]
+            if c in _CLOSE and depth > 0:
+                depth -= 1
+            elif c == _SYMMETRIC and symmetric:
+                symmetric = False
+            elif c not in _HARD:
+                break
+            end += 1
+        still_open = depth > 0 or symmetric
+        if still_open and end >= len(self._buf):
+            return None
+        return end, still_open
+
+    def _should_split(self, ch: str, end: int, still_open: bool) -> bool:
+        if ch == "\n":
+            return True
+        length = len(self._buf[:end].strip())
+        if still_open and length < self.max_chars:
+            return False  # 引号内不切分，过长时例外
+        if ch in _HARD:
+            return length >= self.merge_min
+        return length >= (self.first_min if self._emitted == 0 else self.clause_min)
+
+    def _cut(self, end: int) -> str:
+        sentence = self._buf[:end].strip()
+        self._buf = self._buf[end:]
+        self._depth = 0
+        self._symmetric = False
+        if sentence:
+            self._emitted += 1
+        return sentence
+
+
+def split_sentences(text: str, config: OpenClawConfig) -> list[str]:
+    """一次性切分完整文本。"""
+    segmenter = SentenceSegmenter(config)
+    return segmenter.feed(text) + segmenter.flush()
+
+
+# ── 基准 ─────────────────────────────────────────────────────────────────────
+
+_SAMPLE_STREAMS = [
+    [[0, "好的"], [40, "，"], [80, "我"], [120, "来"], [160, "帮你"], [200, "查一下"], [240, "今天"],
+     [280, "的天气"], [320, "情况"], [360, "，"], [400, "北京"], [440, "今天"], [480, "晴"], [520, "，"],
+     [560, "最高"], [600, "气温"], [640, "25.5"], [680, "度"], [720, "，"], [760, "适合"], [800, "出门"],
+     [840, "散步"], [880, "。"], [920, "记得"], [960, "带水"], [1000, "哦！"]],
+    [[0, "嗯"], [40, "。"], [80, "这个"], [120, "问题"], [160, "很有"], [200, "意思"], [240, "，"],
+     [280, "他"], [320, "说"], [360, "：“"], [400, "你好"], [440, "，"], [480, "世界"], [520, "。”"],
+     [560, "然后"], [600, "就"], [640, "走了"], [680, "。"]],
+    [[0, "价格"], [40, "是"], [80, "1"], [120, ","], [160, "299"], [200, "元"], [240, "，"], [280, "优惠"],
+     [320, "后"], [360, "只要"], [400, "999"], [440, "元"], [480, "，"], [520, "非常"], [560, "划算"],
+     [600, "，"], [640, "赶紧"], [680, "下单"], [720, "吧"], [760, "！"]],
+]
+
+
+class _HardOnlySegmenter:
+    """基线：仅按句末标点切分（与原实现一致）。"""
+
+    def __init__(self):
+        self._buf = ""
+
+    def feed(self, text: str) -> list[str]:
+        self._buf += text
+        out = []
+        while True:
+            idx = next((i for i, c in enumerate(self._buf) if c in _HARD), None)
+            if idx is None:
+                return out
+            sentence, self._buf = self._buf[:idx + 1].strip(), self._buf[idx + 1:]
+            if sentence:
+                out.append(sentence)
+
+    def flush(self) -> list[str]:
+        rest, self._buf = self._buf.strip(), ""
+        return [rest] if rest else []
+
+
+def replay(tokens: list[list], segmenter) -> tuple[float, list[str]]:
+    """回放一条 token 流，返回 (首段发出时刻 ms, 全部段落)。"""
+    first_at = None
+    segments: list[str] = []
+    for t, text in tokens:
+        out = segmenter.feed(text)
+        if out and first_at is None:
+            first_at = t
+        segments.extend(out)
+    tail = segmenter.flush()
+    if tail and first_at is None:
+        first_at = tokens[-1][0]
+    segments.extend(tail)
+    return first_at or 0.0, segments
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="回放 token 流，比较首段延迟与分段数")
+    parser.add_argument("streams", type=Path, nargs="?", help="录制的 token 流 JSONL")
+    args = parser.parse_args()
+
+    if args.streams:
+        streams = [json.loads(line)["tokens"] for line in args.streams.read_text(encoding="utf-8").splitlines() if line.strip()]
+    else:
+        streams = _SAMPLE_STREAMS
+    from config import get_config
+    config = get_config().openclaw
+
+    totals = {"baseline": [0.0, 0], "clause": [0.0, 0]}
+    for n, tokens in enumerate(streams):
+        for label, segmenter in (("baseline", _HardOnlySegmenter()), ("clause", SentenceSegmenter(config))):
+            first_at, segments = replay(tokens, segmenter)
+            totals[label][0] += first_at
+            totals[label][1] += len(segments)
+            print(f"#{n} {label:<9} 首段 {first_at:>6.0f}ms  {len(segments)} 段  {segments}")
+    for label, (first_sum, count) in totals.items():
+        print(f"{label:<9} 平均首段 {first_sum / len(streams):.0f}ms，平均 {count / len(streams):.1f} 段")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from loguru import logger
+
+from config import TTSConfig
+
+DEFAULT_CACHE_DIR = Path(__file__).parent.parent.parent / "cache" / "tts"
+
+
+def tts_cache_key(text: str, emotion_params: dict, config: TTSConfig) -> str:
+    """内容寻址键：文本 + 音色 + 情感参数 + 编码 + 采样率完全一致才视为同一段音频。"""
+    raw = json.dumps(
+        [text, config.voice_type, emotion_params, config.codec, config.sample_rate],
+        ensure_ascii=False,
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSAudioCache:
+    """TTS 音频两级缓存：内存 LRU + 磁盘（mmap 只读映射，命中时零拷贝交给播放线程）。
+
+    每个条目保存 PCM 和口型时间线。磁盘目录下 <key>.pcm 为原始 PCM，
+    <key>.json 为时间线；先写时间线、后原子替换 PCM，PCM 文件存在即条目完整。
+    两级均按字节数限额，超出后淘汰最久未用的条目。
+    """
+
+    def __init__(self, directory: Path, memory_bytes: int, disk_bytes: int):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self._memory: OrderedDict[str, tuple[bytes | memoryview, list[dict]]] = OrderedDict()
+        self._memory_size = 0
+        self._disk: OrderedDict[str, int] = OrderedDict()  # key → PCM 字节数，按最近使用排序
+        self._disk_size = 0
+        self._lock = threading.Lock()  # 磁盘写入在线程池中执行
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._scan()
+
+    def _scan(self) -> None:
+        """启动时按修改时间重建磁盘索引，并清理残缺条目。"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        entries = []
+        for pcm_path in self.directory.glob("*.pcm"):
+            if not pcm_path.with_suffix(".json").exists():
+                pcm_path.unlink(missing_ok=True)
+                continue
+            stat = pcm_path.stat()
+            entries.append((stat.st_mtime, pcm_path.stem, stat.st_size))
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_size += size
+        self._evict_disk()
+
+    def get(self, key: str) -> tuple[bytes | memoryview, list[dict]] | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        entry = self._load(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.disk_hits += 1
+        self._remember(key, entry)
+        return entry
+
+    def put(self, key: str, pcm: bytes, timeline: list[dict]) -> None:
+        """写入内存层并同步落盘，可在线程池中调用。"""
+        self._remember(key, (pcm, timeline))
+        try:
+            self._store(key, pcm, timeline)
+        except OSError as e:
+            logger.warning(f"TTS 缓存写盘失败: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_size,
+            "disk_entries": len(self._disk),
+            "disk_bytes": self._disk_size,
+        }
+
+    def _remember(self, key: str, entry: tuple[bytes | memoryview, list[dict]]) -> None:
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_size -= len(old[0])
+            self._memory[key] = entry
+            self._memory_size += len(entry[0])
+            while self._memory_size > self.memory_bytes and self._memory:
+                _, (pcm, _) = self._memory.popitem(last=False)
+                self._memory_size -= len(pcm)
+                self.evictions += 1
+
+    def _load(self, key: str) -> tuple[memoryview, list[dict]] | None:
+        if key not in self._disk:
+            return None
+        pcm_path = self.directory / f"{key}.pcm"
+        try:
+            timeline = json.loads(pcm_path.with_suffix(".json").read_text(encoding="utf-8"))
+            with open(pcm_path, "rb") as f:
+                # 映射在文件关闭后依然有效；被淘汰删除的文件在映射释放前仍可读
+                pcm = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            os.utime(pcm_path)
+        except (OSError, ValueError) as e:
+            logger.warning(f"TTS 缓存读取失败，丢弃条目 {key[:8]}: {e}")
+            with self._lock:
+                self._drop_disk(key)
+            return None
+        with self._lock:
+            self._disk.move_to_end(key)
+        return pcm, timeline
+
+    def _store(self, key: str, pcm: bytes, timeline: list[dict]) -> None:
+        pcm_path = self.directory / f"{key}.pcm"
+        tmp_path = pcm_path.with_suffix(".tmp")
+        pcm_path.with_suffix(".json").write_text(json.dumps(timeline, ensure_ascii=False), encoding="utf-8")
+        tmp_path.write_bytes(pcm)
+        os.replace(tmp_path, pcm_path)
+        with self._lock:
+            self._disk_size -= self._disk.pop(key, 0)
+            self._disk[key] = len(pcm)
+            self._disk_size += len(pcm)
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        while self._disk_size > self.disk_bytes and self._disk:
+            key = next(iter(self._disk))
+            self._drop_disk(key)
+            self.evictions += 1
+
+    def _drop_disk(self, key: str) -> None:
+        self._disk_size -= self._disk.pop(key, 0)
+        for suffix in (".pcm", ".json"):
+            try:
+                (self.directory / f"{key}{suffix}").unlink(missing_ok=True)
+            except OSError:
+                pass
+
+
+# 按目录共享的缓存实例，预览接口临时创建的 pipeline 也能命中
+_caches: dict[str, TTSAudioCache] = {}
+
+
+def get_tts_cache(config: TTSConfig) -> TTSAudioCache | None:
+    """返回配置对应的共享缓存实例；未启用时返回 None。限额随配置热更新。"""
+    if not config.cache_enabled:
+        return None
+    memory_bytes = config.cache_memory_mb * 1024 * 1024
+    disk_bytes = config.cache_disk_mb * 1024 * 1024
+    cache = _caches.get(config.cache_dir)
+    if cache is None:
+        directory = Path(config.cache_dir) if config.cache_dir else DEFAULT_CACHE_DIR
+        cache = _caches[config.cache_dir] = TTSAudioCache(directory, memory_bytes, disk_bytes)
+    else:
+        cache.memory_bytes = memory_bytes
+        cache.disk_bytes = disk_bytes
+    return cache
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import numpy as np
+
+SILENCE_THRESHOLD = 0.02  # RMS 低于此值视为静音（相对满幅）
+
+
+class AmplitudeEnvelope:
+    """增量幅度时间线：PCM 帧边到边算，用于无字幕时的口型驱动。
+
+    每 chunk_ms 毫秒计算一次 RMS（整块 reshape 后一次性归约），仅保留幅度高于
+    静音阈值的窗口；与上一条目间隔不超过一个窗口的相邻窗口合并为一个条目，
+    格式与 TTS API 字幕格式兼容。不足一个窗口的尾部数据留待下次 feed。
+    """
+
+    def __init__(self, sample_rate: int, chunk_ms: int = 30):
+        self.chunk_ms = chunk_ms
+        self._chunk_bytes = int(sample_rate * chunk_ms / 1000) * 2  # 16-bit
+        # 以整数域比较均方值，省去开方和浮点归一化
+        self._threshold_ms = (SILENCE_THRESHOLD * 32768.0) ** 2
+        self._rest = b""
+        self._chunks = 0      # 已处理的窗口数
+        self._last = -3       # 最近一个有声窗口的序号
+        self.timeline: list[dict] = []
+
+    def feed(self, pcm: bytes | memoryview) -> bool:
+        """追加 PCM，返回时间线是否有变化。"""
+        data = self._rest + bytes(pcm) if self._rest else pcm
+        n = len(data) // self._chunk_bytes
+        used = n * self._chunk_bytes
+        self._rest = bytes(data[used:])
+        if n == 0:
+            return False
+
+        samples = np.frombuffer(data, dtype="<i2", count=used // 2).astype(np.int64)
+        mean_square = (samples * samples).reshape(n, -1).mean(axis=1)
+        active = np.flatnonzero(mean_square >= self._threshold_ms) + self._chunks
+        self._chunks += n
+        if active.size == 0:
+            return False
+
+        # 与前一有声窗口间隔超过一个静音窗口处开启新条目
+        starts = np.flatnonzero(np.diff(active, prepend=self._last) > 2)
+        bounds = np.append(starts, active.size)
+        if bounds[0] > 0:
+            # 开头几个窗口与上一批的末条目相连，延长之
+            self.timeline[-1]["endTime"] = (int(active[bounds[0] - 1]) + 1) * self.chunk_ms
+        for s, e in zip(bounds[:-1], bounds[1:]):
+            self.timeline.append({
+                "char": ".",
+                "beginTime": int(active[s]) * self.chunk_ms,
+                "endTime": (int(active[e - 1]) + 1) * self.chunk_ms,
+            })
+        self._last = int(active[-1])
+        return True
+
+
+def pcm_to_amplitude_timeline(pcm: bytes, sample_rate: int, chunk_ms: int = 30) -> list[dict]:
+    """将 PCM 16-bit 单声道数据一次性转换为幅度时间线。"""
+    envelope = AmplitudeEnvelope(sample_rate, chunk_ms)
+    envelope.feed(pcm)
+    return envelope.timeline
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+
+from loguru import logger
+
+from core.tracing import tracer
+from pipeline.tts.tencent_tts import TencentTTSPipeline, _Utterance
+
+
+class TTSScheduler:
+    """TTS 合成调度器：最多 lookahead 句并发合成，经重排缓冲按 LLM 顺序提交播放。
+
+    - submit() 在调用时同步记下当前 epoch，之后发生的打断一定能识别出这句是旧句子；
+      待合成队列以 max_pending 为界，满时丢弃最早的待合成句子（不阻塞上游，句子数受限）
+    - 每句分配递增序号；合成协程提交播放句柄时先进入重排缓冲，
+      只有序号连续的句柄才交给播放线程，保证播放顺序与生成顺序一致
+    - cancel() 递增 epoch 并取消所有在途合成，旧 epoch 的句子与句柄一律丢弃
+    """
+
+    def __init__(self, tts: TencentTTSPipeline, lookahead: int = 2, max_pending: int = 16):
+        self.tts = tts
+        self.lookahead = lookahead
+        self._queue: asyncio.Queue[tuple[int, str, str, str | None]] = asyncio.Queue(maxsize=max_pending)
+        self._inflight: set[asyncio.Task] = set()
+        self._slot_free = asyncio.Event()
+        self._epoch = 0
+        self._next_seq = 0        # 下一个待分配的序号
+        self._next_submit = 0     # 下一个允许提交播放的序号
+        self._ready: dict[int, _Utterance | None] = {}  # 重排缓冲：seq → 句柄（None 表示该句无音频）
+        self.dropped = 0  # 队列满而丢弃的句子数
+
+    def submit(self, text: str, emotion: str, trace: str | None = None) -> None:
+        """句子入队（不等待）。trace 为所属轮次的延迟追踪 id。
+
+        队列已满时丢弃最早的待合成句子，为新句子腾出位置。
+        """
+        if self._queue.full():
+            _, old_text, _, old_trace = self._queue.get_nowait()
+            self.dropped += 1
+            tracer.sentence_done(old_trace)  # 该句不会再合成，不会有播完通知
+            logger.warning(f"待合成句子超过 {self._queue.maxsize} 句，丢弃最早的一句: {old_text[:20]}")
+        self._queue.put_nowait((self._epoch, text, emotion, trace))
+
+    async def run(self) -> None:
+        """调度主循环：取句子、等空闲槽位、启动合成任务。"""
+        while True:
+            epoch, text, emotion, trace = await self._queue.get()
+            while len(self._inflight) >= max(1, self.lookahead):
+                self._slot_free.clear()
+                await self._slot_free.wait()
+            if epoch != self._epoch:
+                continue  # 打断前入队的旧句子
+            seq = self._next_seq
+            self._next_seq += 1
+            task = asyncio.create_task(self._synthesize(epoch, seq, text, emotion, trace))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_task_done)
+
+    def cancel(self) -> None:
+        """打断：丢弃待合成句子，取消在途合成，清空重排缓冲。"""
+        self._epoch += 1
+        while not self._queue.empty():
+            try:
+                self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+        for task in self._inflight:
+            task.cancel()
+        self._ready.clear()
+        self._next_submit = self._next_seq
+
+    async def _synthesize(self, epoch: int, seq: int, text: str, emotion: str, trace: str | None) -> None:
+        submitted = False
+
+        def submit(utt: _Utterance) -> None:
+            nonlocal submitted
+            submitted = True
+            self._offer(epoch, seq, utt)
+
+        try:
+            if self.tts.config.enabled:
+                await self.tts.synthesize(text, emotion, submit=submit, trace=trace)
+        except Exception as e:
+            logger.error(f"TTS 合成失败（第 {seq} 句）: {e}")
+        finally:
+            if not submitted:
+                tracer.sentence_done(trace)  # 该句没有音频，不会再有播完通知
+                self._offer(epoch, seq, None)
+
+    def _offer(self, epoch: int, seq: int, utt: _Utterance | None) -> None:
+        """句柄进入重排缓冲，并按序号连续地提交给播放线程。"""
+        if epoch != self._epoch:
+            return
+        self._ready[seq] = utt
+        while self._next_submit in self._ready:
+            ready = self._ready.pop(self._next_submit)
+            self._next_submit += 1
+            if ready is not None:
+                self.tts.play(ready)
+
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        self._slot_free.set()
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from loguru import logger
+
+from pipeline.tts.tencent_tts import (
+    SESSION_TTL_S,
+    TencentTTSPipeline,
+    _TTSSession,
+    _open_session,
+    _session_key,
+)
+
+# 会话在签名过期 / 空闲断开前提前多久轮换
+_REFRESH_MARGIN_S = 60
+# 维护循环的巡检间隔
+_CHECK_INTERVAL_S = 5.0
+# 预热失败后的重试间隔
+_RETRY_DELAY_S = 3.0
+# 默认始终保温的情感
+_DEFAULT_EMOTION = "平静"
+
+
+class TTSSessionPool:
+    """TTS 预热会话池：提前完成签名、握手和 READY 等待，合成时直接取用。
+
+    签名 URL 中带有音色、情感等参数，因此会话按 _session_key 分组；
+    每组保持 config.pool_size 条 READY 会话，只为默认情感和最近用过的情感保温。
+    会话存活接近 SESSION_TTL_S 时关闭并补新，配置变更后旧分组自然淘汰。
+    """
+
+    def __init__(self, tts: TencentTTSPipeline):
+        self.tts = tts
+        self._idle: dict[tuple, list[_TTSSession]] = {}
+        self._filling: dict[tuple, int] = {}              # key → 正在建立的会话数
+        self._wanted: dict[tuple, tuple[str, float]] = {}  # key → (情感, 最近使用时刻)
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._fills: set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def start(self) -> None:
+        self._want(_DEFAULT_EMOTION)
+        self._task = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        for task in self._fills:
+            task.cancel()
+        sessions = [s for group in self._idle.values() for s in group]
+        self._idle.clear()
+        await asyncio.gather(*(s.ws.close() for s in sessions), return_exceptions=True)
+
+    def acquire(self, emotion: str) -> _TTSSession | None:
+        """取一条可用的 READY 会话；池中没有时返回 None，由调用方现场建立。"""
+        key = self._want(emotion)
+        group = self._idle.get(key, [])
+        session = None
+        while group:
+            candidate = group.pop()
+            if candidate.alive and not self._expired(candidate):
+                session = candidate
+                break
+            asyncio.create_task(candidate.ws.close())
+        if session is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self._wake.set()  # 触发补位
+        return session
+
+    def _want(self, emotion: str) -> tuple:
+        key = _session_key(self.tts.config, emotion)
+        self._wanted[key] = (emotion, time.monotonic())
+        return key
+
+    def _expired(self, session: _TTSSession) -> bool:
+        return time.monotonic() - session.created_at > SESSION_TTL_S - _REFRESH_MARGIN_S
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                await self._evict()
+                self._refill()
+            except Exception as e:
+                logger.error(f"TTS 会话池维护失败: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=_CHECK_INTERVAL_S)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _evict(self) -> None:
+        """关闭已断开、即将过期或不再需要的会话，并淘汰长期未用的情感分组。"""
+        config = self.tts.config
+        now = time.monotonic()
+        for key, (emotion, last_used) in list(self._wanted.items()):
+            stale = key != _session_key(config, emotion)
+            idle_too_long = emotion != _DEFAULT_EMOTION and now - last_used > SESSION_TTL_S
+            if stale or idle_too_long:
+                del self._wanted[key]
+
+        dead: list[_TTSSession] = []
+        for key, group in list(self._idle.items()):
+            keep = [s for s in group if key in self._wanted and s.alive and not self._expired(s)]
+            dead.extend(s for s in group if s not in keep)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        if dead:
+            logger.debug(f"TTS 会话池：轮换 {len(dead)} 条会话")
+            await asyncio.gather(*(s.ws.close() for s in dead), return_exceptions=True)
+
+    def _refill(self) -> None:
+        config = self.tts.config
+        if not config.enabled or config.pool_size <= 0 or not config.secret_id:
+            return
+        for key, (emotion, _) in self._wanted.items():
+            missing = config.pool_size - len(self._idle.get(key, [])) - self._filling.get(key, 0)
+            for _ in range(missing):
+                self._filling[key] = self._filling.get(key, 0) + 1
+                task = asyncio.create_task(self._fill(key, emotion))
+                self._fills.add(task)
+                task.add_done_callback(self._fills.discard)
+
+    async def _fill(self, key: tuple, emotion: str) -> None:
+        try:
+            session = await _open_session(self.tts.config, emotion)
+        except Exception as e:
+            logger.warning(f"TTS 预热会话建立失败: {e}")
+            await asyncio.sleep(_RETRY_DELAY_S)
+        else:
+            if session.key in self._wanted:
+                self._idle.setdefault(session.key, []).append(session)
+            else:
+                await session.ws.close()
+        finally:
+            self._filling[key] -= 1
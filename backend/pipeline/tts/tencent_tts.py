@@ -5,19 +5,29 @@ import base64
 import hashlib
 import hmac
 import json
-import math
 import queue
-import struct
 import time
 import threading
 import uuid
-from urllib.parse import urlencode
+from typing import TYPE_CHECKING, Callable
+from urllib.parse import urlencode, urlsplit
 
 import websockets
 from loguru import logger
 
 from config import TTSConfig
 from core.event_bus import bus, Event
+from core.tracing import tracer
+from devices.echo import playback_reference
+from pipeline.tts.audio_cache import get_tts_cache, tts_cache_key
+from pipeline.tts.envelope import AmplitudeEnvelope
+
+if TYPE_CHECKING:
+    from pipeline.tts.session_pool import TTSSessionPool
+
+DEFAULT_ENDPOINT = "wss://tts.cloud.tencent.com/stream_wsv2"
+# 签名有效期；服务端另有 10 分钟无文本即断开的限制，预热会话需在此之前轮换
+SESSION_TTL_S = 600
 
 EMOTION_MAP = {
     "开心": {"EmotionCategory": "happy",   "EmotionIntensity": 150, "Speed": 1,  "Volume": 2},
@@ -27,51 +37,18 @@ EMOTION_MAP = {
     "惊讶": {"EmotionCategory": "fear",    "EmotionIntensity": 130, "Speed": 1,  "Volume": 2},
 }
 
-
-def _pcm_to_amplitude_timeline(pcm: bytes, sample_rate: int, chunk_ms: int = 30) -> list[dict]:
-    """将 PCM 16-bit 单声道数据转换为幅度时间线，用于口型驱动。
-
-    每 chunk_ms 毫秒计算一次 RMS，仅保留幅度高于静音阈值的窗口，
-    相邻窗口合并为一个 timeline 条目，格式与 TTS API 字幕格式兼容。
-    """
-    bytes_per_sample = 2  # 16-bit
-    samples_per_chunk = int(sample_rate * chunk_ms / 1000)
-    bytes_per_chunk = samples_per_chunk * bytes_per_sample
-    SILENCE_THRESHOLD = 0.02  # RMS 低于此值视为静音
-
-    timeline: list[dict] = []
-    n_chunks = len(pcm) // bytes_per_chunk
-
-    for i in range(n_chunks):
-        chunk = pcm[i * bytes_per_chunk: (i + 1) * bytes_per_chunk]
-        n = len(chunk) // bytes_per_sample
-        if n == 0:
-            continue
-        samples = struct.unpack(f"<{n}h", chunk[:n * bytes_per_sample])
-        rms = math.sqrt(sum(s * s for s in samples) / n) / 32768.0
-
-        if rms < SILENCE_THRESHOLD:
-            continue
-
-        begin_ms = i * chunk_ms
-        end_ms = begin_ms + chunk_ms
-
-        # 与上一条目相邻则合并（避免碎片化）
-        if timeline and timeline[-1]["endTime"] >= begin_ms - chunk_ms:
-            timeline[-1]["endTime"] = end_ms
-        else:
-            timeline.append({"char": ".", "beginTime": begin_ms, "endTime": end_ms})
-
-    return timeline
+# 预估的音频输出设备延迟（毫秒），随 lip_sync 下发给前端
+_AUDIO_DELAY_MS = 50
 
 
-def _sign_request(secret_id: str, secret_key: str, params: dict) -> str:
+def _sign_request(secret_id: str, secret_key: str, params: dict, endpoint: str = DEFAULT_ENDPOINT) -> str:
     """生成腾讯云 WebSocket TTS 鉴权 URL（HMAC-SHA1 + Base64）。"""
-    host = "tts.cloud.tencent.com"
-    path = "/stream_wsv2"
+    parts = urlsplit(endpoint)
+    host = parts.netloc
+    path = parts.path
     timestamp = int(time.time())
     params["Timestamp"] = timestamp
-    params["Expired"] = timestamp + 600
+    params["Expired"] = timestamp + SESSION_TTL_S
 
     # 签名原文：参数按 key 字典序排序，值不做 URL 编码
     query = "&".join(f"{k}={v}" for k, v in sorted(params.items()))
@@ -88,156 +65,367 @@ def _sign_request(secret_id: str, secret_key: str, params: dict) -> str:
 
     # Signature 是 Base64 字符串，交给 urlencode 统一编码，避免双重编码
     params["Signature"] = signature
-    return f"wss://{host}{path}?{urlencode(params)}"
+    return f"{parts.scheme}://{host}{path}?{urlencode(params)}"
+
+
+def _take_pcm(chunks: list[bytes | memoryview], size: int) -> bytes | memoryview:
+    """从待播块中取出前 size 字节，剩余部分留在 chunks；只有一块时直接切片，不拷贝。"""
+    if len(chunks) == 1:
+        view = memoryview(chunks[0])
+        data, rest = view[:size], view[size:]
+    else:
+        joined = b"".join(chunks)
+        data, rest = joined[:size], joined[size:]
+    chunks.clear()
+    if len(rest):
+        chunks.append(rest)
+    return data
+
+
+class _TTSSession:
+    """一条已完成握手并收到 READY 的合成会话，可直接发送文本。"""
+
+    def __init__(self, ws, session_id: str, key: tuple, created_at: float):
+        self.ws = ws
+        self.session_id = session_id
+        self.key = key
+        self.created_at = created_at  # time.monotonic()
+
+    @property
+    def alive(self) -> bool:
+        return self.ws.close_code is None
+
+    def make_msg(self, action: str, data: str) -> str:
+        return json.dumps({
+            "session_id": self.session_id,
+            "message_id": str(uuid.uuid4()),
+            "action": action,
+            "data": data,
+        })
+
+
+def _session_key(config: TTSConfig, emotion: str) -> tuple:
+    """会话参数指纹：签名 URL 中决定合成效果的参数完全相同的会话才能互换使用。"""
+    if emotion not in EMOTION_MAP:
+        emotion = "平静"
+    return (config.endpoint, config.app_id, config.secret_id, config.voice_type,
+            config.codec, config.sample_rate, emotion)
+
+
+async def _open_session(config: TTSConfig, emotion: str) -> _TTSSession:
+    """签名、建立 WebSocket 并等待服务端 READY（ready=1），失败时抛出异常。"""
+    emotion_params = EMOTION_MAP.get(emotion, EMOTION_MAP["平静"])
+    session_id = str(uuid.uuid4())
+
+    params = {
+        "Action": "TextToStreamAudioWSv2",
+        "AppId": config.app_id,
+        "SecretId": config.secret_id,
+        "SessionId": session_id,
+        "VoiceType": config.voice_type,
+        "Codec": config.codec,
+        "SampleRate": config.sample_rate,
+        "Speed": emotion_params["Speed"],
+        "Volume": emotion_params["Volume"],
+        "EmotionCategory": emotion_params["EmotionCategory"],
+        "EmotionIntensity": emotion_params["EmotionIntensity"],
+        "SubtitleType": 1,
+    }
+
+    url = _sign_request(config.secret_id, config.secret_key, params, config.endpoint)
+    created_at = time.monotonic()
+    ws = await websockets.connect(url)
+    try:
+        async for msg in ws:
+            if isinstance(msg, bytes):
+                continue
+            resp = json.loads(msg)
+            if resp.get("code", 0) != 0:
+                raise RuntimeError(f"TTS 错误: {resp}")
+            if resp.get("ready") == 1:
+                return _TTSSession(ws, session_id, _session_key(config, emotion), created_at)
+        raise RuntimeError("TTS 连接在 READY 之前被关闭")
+    except BaseException:
+        await ws.close()
+        raise
+
+
+class _Utterance:
+    """一句话的播放句柄：合成协程逐帧写入 PCM，播放线程按序读取。
+
+    timeline / envelope / t0 只在事件循环线程读写，播放线程仅通过 frames 队列交互。
+    """
+
+    def __init__(
+        self, text: str, emotion: str, sample_rate: int = 16000, trace: str | None = None, epoch: int = 0
+    ):
+        self.text = text
+        self.emotion = emotion
+        self.trace = trace  # 所属轮次的延迟追踪 id
+        self.epoch = epoch  # 创建时的打断代数，interrupt() 之后旧句柄即视为已取消
+        self.frames: queue.Queue[bytes | None] = queue.Queue()
+        self.timeline: list[dict] = []  # API 字幕时间线
+        self.envelope = AmplitudeEnvelope(sample_rate)  # 无字幕时的备用幅度时间线
+        self.t0: float | None = None  # 实际开始播放的时刻（秒），未开始为 None
+
+    def feed(self, pcm: bytes) -> None:
+        self.frames.put(pcm)
+
+    def close(self) -> None:
+        """写入结束标记，播放线程读到后播完剩余音频即结束。"""
+        self.frames.put(None)
 
 
 class TencentTTSPipeline:
     def __init__(self, config: TTSConfig):
         self.config = config
-        self._interrupt_flag = False
+        self._epoch = 0  # 打断代数：每次 interrupt() 加一，此前创建的句柄全部作废
         self._loop: asyncio.AbstractEventLoop | None = None
-        self._audio_queue: queue.Queue[bytes | None] = queue.Queue()
+        self._audio_queue: queue.Queue[_Utterance | None] = queue.Queue()
+        self.underruns = 0  # 流式播放中声道空转（数据未及时到达）的次数
+        self.sessions = 0  # 用于合成的会话数（含预热池取用）
+        self.bytes_received = 0  # 收到的 PCM 字节数
+        self.pool: TTSSessionPool | None = None  # 预热会话池，由 bot 挂载
         self._player_thread = threading.Thread(target=self._player_loop, daemon=True)
         self._player_thread.start()
 
+    def play(self, utt: _Utterance) -> None:
+        """提交播放句柄，播放线程按提交顺序逐句播放。"""
+        self._audio_queue.put(utt)
+
     def interrupt(self):
-        """清空播放队列，停止当前播放。"""
-        self._interrupt_flag = True
+        """作废此前创建的所有句柄（合成中、排队中、播放中），清空播放队列；播放线程随即停止当前播放。
+
+        新的合成在 interrupt() 之后创建句柄，属于新一代，不会让被打断的旧句柄继续播放。
+        """
+        self._epoch += 1
         while not self._audio_queue.empty():
             try:
                 self._audio_queue.get_nowait()
             except queue.Empty:
                 break
 
-    async def synthesize(self, text: str, emotion: str = "平静"):
-        """调用腾讯云流式 TTS，接收音频帧和时间戳，推送到播放队列和事件总线。"""
+    async def synthesize(
+        self,
+        text: str,
+        emotion: str = "平静",
+        submit: Callable[[_Utterance], None] | None = None,
+        trace: str | None = None,
+    ):
+        """调用腾讯云流式 TTS，接收音频帧和时间戳，推送到播放队列和事件总线。
+
+        流式模式（config.streaming）下收到第一帧即提交播放，后续帧边收边播；
+        否则等 FINAL 后整句提交。字幕与口型事件均在实际开始播放时发出。
+        submit 用于替换默认的提交方式（直接入播放队列），供调度器按序提交。
+        trace 为所属轮次的延迟追踪 id，记录首帧到达与开播 / 播完时刻。
+        启用缓存时，完全相同的合成请求直接回放缓存音频，不再建立连接。
+        """
+        submit = submit or self.play
         self._loop = asyncio.get_event_loop()
-        self._interrupt_flag = False
-        emotion_params = EMOTION_MAP.get(emotion, EMOTION_MAP["平静"])
-        session_id = str(uuid.uuid4())
-
-        params = {
-            "Action": "TextToStreamAudioWSv2",
-            "AppId": self.config.app_id,
-            "SecretId": self.config.secret_id,
-            "SessionId": session_id,
-            "VoiceType": self.config.voice_type,
-            "Codec": self.config.codec,
-            "SampleRate": self.config.sample_rate,
-            "Speed": emotion_params["Speed"],
-            "Volume": emotion_params["Volume"],
-            "EmotionCategory": emotion_params["EmotionCategory"],
-            "EmotionIntensity": emotion_params["EmotionIntensity"],
-            "SubtitleType": 1,
-        }
-
-        url = _sign_request(self.config.secret_id, self.config.secret_key, params)
-        timeline: list[dict] = []
+        streaming = self.config.streaming
+        utt = _Utterance(text, emotion, self.config.sample_rate, trace, self._epoch)
+        submitted = False
+        completed = False
         pcm_frames: list[bytes] = []
 
-        def _make_msg(action: str, data: str) -> str:
-            return json.dumps({
-                "session_id": session_id,
-                "message_id": str(uuid.uuid4()),
-                "action": action,
-                "data": data,
-            })
+        cache = get_tts_cache(self.config)
+        cache_key = ""
+        if cache is not None:
+            cache_key = tts_cache_key(text, EMOTION_MAP.get(emotion, EMOTION_MAP["平静"]), self.config)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                tracer.mark(trace, "tts_first_frame")
+                pcm, utt.timeline = cached[0], list(cached[1])
+                utt.feed(pcm)
+                utt.close()
+                submit(utt)
+                return
 
         try:
-            async with websockets.connect(url) as ws:
-                # 1. 等待服务端 READY（ready=1）再发文本
-                async for msg in ws:
-                    if self._interrupt_flag:
-                        return
-                    if isinstance(msg, bytes):
-                        continue
-                    resp = json.loads(msg)
-                    if resp.get("code", 0) != 0:
-                        logger.error(f"TTS 错误: {resp}")
+            try:
+                # 1. 取一条已 READY 的会话：优先用预热池，没有则现场握手
+                session = self.pool.acquire(emotion) if self.pool else None
+                if session is None:
+                    session = await _open_session(self.config, emotion)
+                self.sessions += 1
+                ws = session.ws
+                try:
+                    if self._cancelled(utt):
                         return
-                    if resp.get("ready") == 1:
-                        break
 
-                # 2. 发送文本 + 完成信号
-                await ws.send(_make_msg("ACTION_SYNTHESIS", text))
-                await ws.send(_make_msg("ACTION_COMPLETE", ""))
+                    # 2. 发送文本 + 完成信号
+                    await ws.send(session.make_msg("ACTION_SYNTHESIS", text))
+                    await ws.send(session.make_msg("ACTION_COMPLETE", ""))
 
-                # 3. 接收音频帧和字幕，直到 FINAL
-                try:
-                    async for msg in ws:
-                        if self._interrupt_flag:
-                            break
-                        if isinstance(msg, bytes):
-                            pcm_frames.append(msg)
-                        else:
-                            resp = json.loads(msg)
-                            subs_raw = (resp.get("result") or {}).get("subtitles")
-                            if resp.get("code", 0) != 0:
-                                logger.error(f"TTS 错误: {resp}")
+                    # 3. 接收音频帧和字幕，直到 FINAL
+                    try:
+                        async for msg in ws:
+                            if self._cancelled(utt):
                                 break
-                            for sub in subs_raw or []:
-                                timeline.append({
-                                    "char": sub.get("Text", ""),
-                                    "beginTime": sub.get("BeginTime", 0),
-                                    "endTime": sub.get("EndTime", 0),
-                                })
-                            if resp.get("final") == 1:
-                                break
-                except websockets.exceptions.ConnectionClosedError:
-                    # 腾讯云服务端发完数据后直接关闭 TCP，无 close frame，属正常结束
-                    pass
-
-        except websockets.exceptions.ConnectionClosedError:
-            # 腾讯云服务端发完数据后直接关闭 TCP，无 close frame，属正常结束
-            pass
-        except Exception as e:
-            logger.error(f"TTS WebSocket 错误: {e}")
-            return
-
-        if not pcm_frames or self._interrupt_flag:
+                            if isinstance(msg, bytes):
+                                if not pcm_frames:
+                                    tracer.mark(trace, "tts_first_frame")
+                                pcm_frames.append(msg)
+                                self.bytes_received += len(msg)
+                                if streaming:
+                                    if not submitted:
+                                        submit(utt)
+                                        submitted = True
+                                    utt.feed(msg)
+                                    if utt.envelope.feed(msg) and not utt.timeline and utt.t0 is not None:
+                                        # 尚无字幕：随音频到达逐段补发幅度口型
+                                        self._emit_lip_sync(utt)
+                            else:
+                                resp = json.loads(msg)
+                                subs_raw = (resp.get("result") or {}).get("subtitles")
+                                if resp.get("code", 0) != 0:
+                                    logger.error(f"TTS 错误: {resp}")
+                                    break
+                                for sub in subs_raw or []:
+                                    utt.timeline.append({
+                                        "char": sub.get("Text", ""),
+                                        "beginTime": sub.get("BeginTime", 0),
+                                        "endTime": sub.get("EndTime", 0),
+                                    })
+                                if subs_raw and utt.t0 is not None:
+                                    # 已开始播放：补发包含新字幕的完整时间线
+                                    self._emit_lip_sync(utt)
+                                if resp.get("final") == 1:
+                                    completed = True
+                                    break
+                    except websockets.exceptions.ConnectionClosedError:
+                        # 腾讯云服务端发完数据后直接关闭 TCP，无 close frame，属正常结束
+                        pass
+                finally:
+                    await ws.close()
+
+            except websockets.exceptions.ConnectionClosedError:
+                # 腾讯云服务端发完数据后直接关闭 TCP，无 close frame，属正常结束
+                pass
+            except Exception as e:
+                logger.error(f"TTS WebSocket 错误: {e}")
+                return
+
+            if not pcm_frames or self._cancelled(utt):
+                return
+
+            pcm = b"".join(pcm_frames)
+            # 若 API 未返回字幕时间线，使用 PCM 幅度生成的备用口型时间线
+            if not utt.timeline:
+                if not streaming:
+                    utt.envelope.feed(pcm)
+                utt.timeline = utt.envelope.timeline
+
+            if not submitted:
+                # 非流式：合并 PCM 整句加入播放队列
+                utt.feed(pcm)
+                submit(utt)
+            if cache is not None and completed:
+                await self._loop.run_in_executor(None, cache.put, cache_key, pcm, list(utt.timeline))
+        finally:
+            utt.close()
+
+    def _emit_lip_sync(self, utt: _Utterance) -> None:
+        """推送口型时间线。audioDelay 按实际开播时刻折算，开播后补发的时间线同样对齐。"""
+        timeline = utt.timeline or utt.envelope.timeline
+        if not timeline or utt.t0 is None:
             return
-
-        # 推送字幕事件
-        bus.emit(Event.TTS_SUBTITLE, {"text": text, "emotion": emotion})
-
-        # 合并 PCM，加入播放队列
-        pcm = b"".join(pcm_frames)
-        t0 = time.time() + 0.05  # 预留 50ms 缓冲
-        self._audio_queue.put(pcm)
-
-        # 若 API 未返回字幕时间线，从 PCM 幅度生成备用口型时间线
-        if not timeline:
-            timeline = _pcm_to_amplitude_timeline(pcm, self.config.sample_rate)
-
-        # 推送口型时间线
-        if timeline:
-            lip_sync_data = {"timeline": timeline, "t0": t0 * 1000, "audioDelay": 50}
-            logger.debug(f"TTS_LIP_SYNC: chars={len(timeline)}, first={timeline[0]}")
-            bus.emit(Event.TTS_LIP_SYNC, lip_sync_data)
+        elapsed_ms = (time.time() - utt.t0) * 1000
+        lip_sync_data = {
+            "timeline": list(timeline),
+            "t0": utt.t0 * 1000 + _AUDIO_DELAY_MS,
+            "audioDelay": round(_AUDIO_DELAY_MS - elapsed_ms),
+        }
+        logger.debug(f"TTS_LIP_SYNC: chars={len(timeline)}, first={timeline[0]}")
+        bus.emit(Event.TTS_LIP_SYNC, lip_sync_data)
+
+    def _on_playback_started(self, utt: _Utterance, t0: float, started: float) -> None:
+        """事件循环线程：某句实际开始出声，推送字幕、开播和口型事件。"""
+        utt.t0 = t0
+        tracer.mark(utt.trace, "playback_started", at=started)
+        bus.emit(Event.TTS_SUBTITLE, {"text": utt.text, "emotion": utt.emotion})
+        bus.emit(Event.PLAYBACK_STARTED, {"t0": t0 * 1000})
+        self._emit_lip_sync(utt)
+
+    def _on_playback_done(self, utt: _Utterance, finished: float, interrupted: bool) -> None:
+        """事件循环线程：某句播放结束（或被打断停止，该轮不再结算为完整轮次）。"""
+        if not interrupted:
+            tracer.sentence_done(utt.trace, played=True, at=finished)
+        bus.emit(Event.PLAYBACK_DONE, {})
+
+    def _cancelled(self, utt: _Utterance) -> bool:
+        """句柄创建后是否发生过打断；播放线程与事件循环线程均可调用（只读一个整数）。"""
+        return utt.epoch != self._epoch
+
+    def _notify(self, callback, *args) -> None:
+        if self._loop:
+            self._loop.call_soon_threadsafe(callback, *args)
 
     def _player_loop(self):
-        """后台线程：从队列取 PCM，用 pygame 播放。"""
+        """后台线程：从队列取播放句柄，用 pygame 播放。"""
         import pygame
         pygame.mixer.pre_init(frequency=self.config.sample_rate, size=-16, channels=1)
         pygame.mixer.init()
 
         while True:
-            pcm = self._audio_queue.get()
-            if pcm is None:
+            utt = self._audio_queue.get()
+            if utt is None:
                 break
-            if self._interrupt_flag:
+            if self._cancelled(utt):
                 continue
             try:
-                sound = pygame.mixer.Sound(buffer=pcm)
-                channel = sound.play()
-                if self._loop:
-                    self._loop.call_soon_threadsafe(bus.emit, Event.PLAYBACK_STARTED, {"t0": time.time() * 1000})
-                while channel.get_busy():
-                    if self._interrupt_flag:
-                        channel.stop()
-                        break
-                    time.sleep(0.02)
-                if self._loop:
-                    self._loop.call_soon_threadsafe(bus.emit, Event.PLAYBACK_DONE, {})
+                self._play(utt)
             except Exception as e:
                 logger.error(f"音频播放失败: {e}")
+
+    def _play(self, utt: _Utterance) -> None:
+        """边读边播：攒够 stream_prebuffer_ms 后开播，之后每当声道排队位空出就续上已到达的音频。"""
+        import pygame
+        prebuffer = self.config.sample_rate * 2 * self.config.stream_prebuffer_ms // 1000
+        pending: list[bytes | memoryview] = []
+        pending_len = 0
+        channel = None
+        closed = False
+
+        while not self._cancelled(utt):
+            if not closed:
+                try:
+                    frame = utt.frames.get(timeout=0.02)
+                except queue.Empty:
+                    frame = b""
+                if frame is None:
+                    closed = True
+                elif frame:
+                    pending.append(frame)
+                    pending_len += len(frame)
+            size = pending_len & ~1  # 按 16-bit 采样对齐
+            if not size:
+                if closed:
+                    break
+                continue
+            if channel is None:
+                if closed or size >= prebuffer:
+                    pcm = _take_pcm(pending, size)
+                    playback_reference.push(pcm, self.config.sample_rate)
+                    channel = pygame.mixer.Sound(buffer=pcm).play()
+                    pending_len -= size
+                    self._notify(self._on_playback_started, utt, time.time(), time.monotonic())
+            elif channel.get_queue() is None:
+                if not channel.get_busy():
+                    self.underruns += 1
+                pcm = _take_pcm(pending, size)
+                playback_reference.push(pcm, self.config.sample_rate)
+                channel.queue(pygame.mixer.Sound(buffer=pcm))
+                pending_len -= size
+            elif closed:
+                time.sleep(0.02)
+
+        if channel is None:
+            return
+        while channel.get_busy():
+            if self._cancelled(utt):
+                channel.stop()
+                playback_reference.stop()
+                break
+            time.sleep(0.02)
+        self._notify(self._on_playback_done, utt, time.monotonic(), self._cancelled(utt))
@@ -1,7 +1,8 @@
 /**
  * MessageBubble — 消息气泡组件
  * 使用 ai-elements MessageResponse 渲染 Markdown（含 GFM 表格、代码块、数学公式）
- * 支持 text（文字对话）和 voice（ASR 语音识别结果）两种用户消息形态
+ * 支持 text（文字对话）和 voice（ASR 语音识别结果）两种用户消息形态；
+ * streaming 的 voice 消息为尚在说话时的增量识别文本
  */
 import { memo } from 'react'
 import { MessageResponse } from '@/components/ai-elements/message'
@@ -99,6 +100,8 @@ const MessageBubble = memo(function MessageBubble({ msg }: MessageBubbleProps) {
           >
             {msg.text || ' '}
           </MessageResponse>
+        ) : msg.streaming ? (
+          <span className="opacity-60">{msg.text}…</span>
         ) : (
           <span>{msg.text}</span>
         )}
@@ -8,6 +8,7 @@ export type WsMessage =
   | { type: "subtitle"; text: string; emotion: string }
   | { type: "lip_sync"; timeline: { char: string; beginTime: number; endTime: number }[]; t0: number; audioDelay?: number }
   | { type: "playback_done" }
+  | { type: "asr_partial"; text: string; emotion: string; segment: number }
   | { type: "asr_result"; text: string; emotion: string }
   | { type: "llm_chunk"; text: string }
   | { type: "llm_sentence"; text: string; emotion: string }
@@ -13,11 +13,32 @@ export default function Chat() {
   const [messages, setMessages] = useState<BubbleMessage[]>([])
   const idRef = useRef(0)
   const streamingIdRef = useRef<number | null>(null)
+  const partialIdRef = useRef<number | null>(null)
 
   useEffect(() => {
     const ws = getWebSocket()
     const unsub = ws.onMessage((msg) => {
-      if (msg.type === 'asr_result') {
+      if (msg.type === 'asr_partial') {
+        // 用户仍在说话：增量识别文本实时刷新同一个语音气泡
+        const id = partialIdRef.current
+        if (id !== null) {
+          setMessages(prev => prev.map(m => m.id === id ? { ...m, text: msg.text } : m))
+        } else {
+          const partialId = ++idRef.current
+          partialIdRef.current = partialId
+          setMessages(prev => ([
+            ...prev,
+            { id: partialId, role: 'user' as const, type: 'voice' as const, text: msg.text, streaming: true, timestamp: new Date() },
+          ] as BubbleMessage[]).slice(-MAX_MESSAGES))
+        }
+      } else if (msg.type === 'asr_result') {
+        // 识别完成：增量气泡由最终结果取代；空结果（噪声段）不开启新一轮
+        const partialId = partialIdRef.current
+        partialIdRef.current = null
+        if (partialId !== null) {
+          setMessages(prev => prev.filter(m => m.id !== partialId))
+        }
+        if (!msg.text.trim()) return
         const userId = ++idRef.current
         const botId = ++idRef.current
         streamingIdRef.current = botId
@@ -5,7 +5,7 @@
  * 消息流架构：
  * - 文字模式：fetch POST /api/chat/stream → SSE token 级流式，直接更新 messages state
  * - 语音模式：WebSocket llm_chunk 事件（token 级）提供平滑流式显示
- * - WebSocket 保留用于：subtitle / lip_sync / asr_result / playback_done
+ * - WebSocket 保留用于：subtitle / lip_sync / asr_partial / asr_result / playback_done
  */
 import { useEffect, useRef, useState, useCallback } from 'react'
 import { Wifi, WifiOff, Mic, MicOff, GripVertical, Loader2, Trash2, MessageSquare, SlidersHorizontal } from 'lucide-react'
@@ -44,6 +44,7 @@ export default function Live2DView() {
   // 当前流式 bot 消息 ID（语音模式）
   const voiceStreamIdRef = useRef<number | null>(null)
   const loadingMsgIdRef = useRef<number | null>(null)
+  const partialMsgIdRef = useRef<number | null>(null)
   // 文字模式 SSE 流式消息 ID
   const textStreamIdRef = useRef<number | null>(null)
   const historyLoadedRef = useRef(false)
@@ -309,7 +310,27 @@ export default function Live2DView() {
           }
         }
 
+      } else if (msg.type === 'asr_partial') {
+        // 语音模式：用户仍在说话，增量识别文本实时刷新同一个语音气泡
+        const id = partialMsgIdRef.current
+        if (id !== null) {
+          setMessages(prev => prev.map(m => m.id === id ? { ...m, text: msg.text } : m))
+        } else {
+          const partialId = Date.now()
+          partialMsgIdRef.current = partialId
+          setMessages(prev => [...prev,
+            { id: partialId, role: 'user', type: 'voice', text: msg.text, streaming: true, timestamp: new Date() },
+          ])
+        }
+
       } else if (msg.type === 'asr_result') {
+        // 识别完成：增量气泡由最终结果取代；空结果（噪声段）不开启新一轮
+        if (partialMsgIdRef.current !== null) {
+          const id = partialMsgIdRef.current
+          setMessages(prev => prev.filter(m => m.id !== id))
+          partialMsgIdRef.current = null
+        }
+        if (!msg.text.trim()) return
         // 语音模式：用户开口 → 终结上一轮流式气泡，显示语音气泡 + loading
         if (voiceStreamIdRef.current !== null) {
           const id = voiceStreamIdRef.current